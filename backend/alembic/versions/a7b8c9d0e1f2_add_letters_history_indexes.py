@@ -0,0 +1,35 @@
+"""add_letters_history_indexes
+
+Revision ID: a7b8c9d0e1f2
+Revises: f6a7b8c9d0e1
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7b8c9d0e1f2'
+down_revision: Union[str, Sequence[str], None] = 'f6a7b8c9d0e1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Same expression as LETTER_SEARCH_DOCUMENT in app/repository/letter_repository.py
+SEARCH_DOCUMENT = (
+    "to_tsvector('simple'::regconfig, "
+    "coalesce(job_title, '') || ' ' || coalesce(company_name, '') || ' ' || letter_content)"
+)
+
+
+def upgrade() -> None:
+    """Indexes for letter history pages and full-text search."""
+    op.create_index('ix_letters_cv_id_created_at_id', 'letters', ['cv_id', 'created_at', 'id'], unique=False)
+    op.execute(f"CREATE INDEX ix_letters_search ON letters USING gin ({SEARCH_DOCUMENT})")
+
+
+def downgrade() -> None:
+    """Drop letter history indexes."""
+    op.execute("DROP INDEX IF EXISTS ix_letters_search")
+    op.drop_index('ix_letters_cv_id_created_at_id', table_name='letters')
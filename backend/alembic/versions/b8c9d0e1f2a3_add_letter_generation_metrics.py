@@ -0,0 +1,32 @@
+"""add_letter_generation_metrics
+
+Revision ID: b8c9d0e1f2a3
+Revises: a7b8c9d0e1f2
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b8c9d0e1f2a3'
+down_revision: Union[str, Sequence[str], None] = 'a7b8c9d0e1f2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Add generation timing and token usage columns to letters."""
+    op.add_column('letters', sa.Column('time_to_first_token_ms', sa.Integer(), nullable=True))
+    op.add_column('letters', sa.Column('prompt_tokens', sa.Integer(), nullable=True))
+    op.add_column('letters', sa.Column('completion_tokens', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    """Drop generation metrics columns."""
+    op.drop_column('letters', 'completion_tokens')
+    op.drop_column('letters', 'prompt_tokens')
+    op.drop_column('letters', 'time_to_first_token_ms')
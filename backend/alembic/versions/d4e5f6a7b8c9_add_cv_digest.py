@@ -0,0 +1,30 @@
+"""add_cv_digest
+
+Revision ID: d4e5f6a7b8c9
+Revises: 992d76276b2f
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4e5f6a7b8c9'
+down_revision: Union[str, Sequence[str], None] = '992d76276b2f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Add CV digest columns."""
+    op.add_column('cvs', sa.Column('digest', sa.Text(), nullable=True))
+    op.add_column('cvs', sa.Column('digest_hash', sa.String(length=64), nullable=True))
+
+
+def downgrade() -> None:
+    """Drop CV digest columns."""
+    op.drop_column('cvs', 'digest_hash')
+    op.drop_column('cvs', 'digest')
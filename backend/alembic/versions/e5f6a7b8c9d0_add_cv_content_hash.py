@@ -0,0 +1,30 @@
+"""add_cv_content_hash
+
+Revision ID: e5f6a7b8c9d0
+Revises: d4e5f6a7b8c9
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5f6a7b8c9d0'
+down_revision: Union[str, Sequence[str], None] = 'd4e5f6a7b8c9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Add SHA-256 content hash of the uploaded CV file."""
+    op.add_column('cvs', sa.Column('content_hash', sa.String(length=64), nullable=True))
+    op.create_index(op.f('ix_cvs_content_hash'), 'cvs', ['content_hash'], unique=False)
+
+
+def downgrade() -> None:
+    """Drop CV content hash."""
+    op.drop_index(op.f('ix_cvs_content_hash'), table_name='cvs')
+    op.drop_column('cvs', 'content_hash')
@@ -0,0 +1,27 @@
+"""add_cvs_user_keyset_index
+
+Revision ID: f6a7b8c9d0e1
+Revises: e5f6a7b8c9d0
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f6a7b8c9d0e1'
+down_revision: Union[str, Sequence[str], None] = 'e5f6a7b8c9d0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Composite index for keyset pagination of a user's CVs."""
+    op.create_index('ix_cvs_user_id_created_at_id', 'cvs', ['user_id', 'created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Drop keyset pagination index."""
+    op.drop_index('ix_cvs_user_id_created_at_id', table_name='cvs')
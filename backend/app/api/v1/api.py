@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from app.api.v1.endpoints import letter,auth,user,cv
+from app.api.v1.endpoints import letter,auth,user,cv,admin
 
 api_router = APIRouter()
 
@@ -23,4 +23,9 @@ api_router.include_router(
     cv.router,
     prefix="/cv",
     tags=["cv"]
+)
+api_router.include_router(
+    admin.router,
+    prefix="/admin",
+    tags=["admin"]
 )
\ No newline at end of file
@@ -0,0 +1,47 @@
+import asyncio
+import logging
+from typing import Literal
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import FileResponse
+
+from app.core.config import settings
+from app.core.loop_monitor import get_loop_monitor
+from app.core.profiling import list_profiles, profile_path
+from app.helper.user import AdminUser
+from app.schemas.letter import GeneralResponse
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+@router.get("/loop", response_model=GeneralResponse)
+async def get_loop_report(admin: AdminUser, top: int = Query(20, ge=1, le=100)):
+    """
+    Event loop lag and the app functions that blocked the loop (LOOP_MONITOR_ENABLED).
+    """
+    if not settings.LOOP_MONITOR_ENABLED:
+        return GeneralResponse(success=False, errors=["Loop monitor is disabled (LOOP_MONITOR_ENABLED=false)"])
+    return GeneralResponse(success=True, data=get_loop_monitor().snapshot(top=top))
+
+
+@router.get("/profiles", response_model=GeneralResponse)
+async def list_request_profiles(admin: AdminUser, limit: int = Query(50, ge=1, le=500)):
+    """Recent request profiles (PROFILING_ENABLED), newest first."""
+    profiles = await asyncio.to_thread(list_profiles, limit)
+    return GeneralResponse(success=True, data={"profiles": profiles})
+
+
+@router.get("/profiles/{profile_id}")
+async def get_request_profile(
+    profile_id: str,
+    admin: AdminUser,
+    format: Literal["html", "speedscope"] = Query("html", description="html or speedscope (https://speedscope.app)"),
+):
+    """Download a stored profile."""
+    path = profile_path(profile_id, format)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    media_type = "text/html" if format == "html" else "application/json"
+    return FileResponse(path, media_type=media_type, filename=path.name)
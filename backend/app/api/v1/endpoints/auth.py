@@ -1,5 +1,8 @@
 # api/v1/auth.py
-from fastapi import APIRouter, HTTPException, Depends, Request, status
+import asyncio
+import logging
+
+from fastapi import APIRouter, HTTPException, Depends, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel, EmailStr
 from sqlmodel import Session
@@ -10,7 +13,7 @@ from app.services.password import PasswordService
 from app.database import get_db
 from app.repository.user_repository import UserRepository
 from app.models.user import User
-from app.helper.user import CurrentUser, get_current_user, get_user_repository
+from app.helper.user import RequestUser, get_user_repository
 
 # Pydantic models
 class LoginRequest(BaseModel):
@@ -42,6 +45,7 @@ class UserResponse(BaseModel):
 
 # Router and services
 router = APIRouter()
+logger = logging.getLogger(__name__)
 jwt_service = JwtService()
 password_service = PasswordService()
 # security = HTTPBearer()
@@ -54,13 +58,14 @@ password_service = PasswordService()
 UserRepo = Annotated[UserRepository, Depends(get_user_repository)]
 
 @router.post("/register", response_model=TokenResponse, status_code=status.HTTP_201_CREATED)
-def register(
+async def register(
     register_data: RegisterRequest,
     user_repo: UserRepo
 ):
     """Register a new user"""
     # Check if user already exists
-    existing_user = user_repo.get_user_by_email(register_data.email)
+    # Синхронная сессия: запросы к БД — в потоке, чтобы не блокировать event loop
+    existing_user = await asyncio.to_thread(user_repo.get_user_by_email, register_data.email)
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -68,11 +73,12 @@ def register(
         )
 
     # Hash password
-    password_hash = password_service.hash_password(register_data.password)
+    password_hash = await password_service.hash_password_async(register_data.password)
 
     # Create user
     try:
-        user = user_repo.create_user(
+        user = await asyncio.to_thread(
+            user_repo.create_user,
             email=register_data.email,
             password_hash=password_hash,
             first_name=register_data.first_name,
@@ -85,8 +91,8 @@ def register(
         )
 
     # Generate tokens
-    access_token = jwt_service.create_access_token(user.email)
-    refresh_token = jwt_service.create_refresh_token(user.email)
+    access_token = jwt_service.create_access_token(user.email, user.id)
+    refresh_token = jwt_service.create_refresh_token(user.email, user.id)
 
     return TokenResponse(
         access_token=access_token,
@@ -94,13 +100,13 @@ def register(
     )
 
 @router.post("/login", response_model=TokenResponse)
-def login(
+async def login(
     login_data: LoginRequest,
     user_repo: UserRepo
 ):
     """Login user and return JWT tokens"""
     # Find user by email
-    user = user_repo.get_user_by_email(login_data.email)
+    user = await asyncio.to_thread(user_repo.get_user_by_email, login_data.email)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -116,16 +122,24 @@ def login(
         )
 
     # Verify password
-    if not password_service.verify_password(login_data.password, user.password_hash):
+    verified, new_hash = await password_service.verify_and_update(login_data.password, user.password_hash)
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid email or password",
             headers={"WWW-Authenticate": "Bearer"}
         )
 
+    # Hash was made with outdated parameters — store the rehashed one
+    if new_hash:
+        try:
+            await asyncio.to_thread(user_repo.update_user, user.id, password_hash=new_hash)
+        except Exception:
+            logger.warning("Failed to rehash password for user %s", user.id, exc_info=True)
+
     # Generate tokens
-    access_token = jwt_service.create_access_token(user.email)
-    refresh_token = jwt_service.create_refresh_token(user.email)
+    access_token = jwt_service.create_access_token(user.email, user.id)
+    refresh_token = jwt_service.create_refresh_token(user.email, user.id)
 
     return TokenResponse(
         access_token=access_token,
@@ -146,8 +160,9 @@ def refresh_token(refresh_data: RefreshTokenRequest):
                 headers={"WWW-Authenticate": "Bearer"}
             )
 
-        access_token = jwt_service.create_access_token(email)
-        refresh_token = jwt_service.create_refresh_token(email)
+        user_id = payload.get("user_id")
+        access_token = jwt_service.create_access_token(email, user_id)
+        refresh_token = jwt_service.create_refresh_token(email, user_id)
 
         return TokenResponse(
             access_token=access_token,
@@ -163,15 +178,8 @@ def refresh_token(refresh_data: RefreshTokenRequest):
         )
 
 @router.get("/me", response_model=UserResponse)
-def get_current_user_info(
-    request: Request,
-    user_repo: UserRepository = Depends(get_user_repository),
-):
+async def get_current_user_info(current_user: RequestUser):
     """Get current user information"""
-
-    user_email = request.state.user_email
-    current_user = _get_user_by_mail(user_email,user_repo)
-
     return UserResponse(
         id=current_user.id,
         email=current_user.email,
@@ -183,7 +191,7 @@ def get_current_user_info(
     )
 
 @router.post("/logout")
-def logout(current_user: CurrentUser):
+def logout(current_user: RequestUser):
     """Logout user (client should discard tokens)"""
     return {"message": "Logged out successfully"}
 
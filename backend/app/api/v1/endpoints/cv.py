@@ -7,7 +7,7 @@ from app.services.cv import CVService
 from app.schemas.letter import CVUploadResponse, GeneralResponse
 from app.helper.user import get_user_repository
 from app.repository.user_repository import UserRepository
-from validator.pdf import validate_pdf_and_get_path
+from validator.pdf import remove_temp_file, validate_pdf_and_get_path
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -28,8 +28,9 @@ async def update_cv(
             pdf_path=file_data["temp_file_path"],
             filename=file.filename,
             original_filename=file.filename,
-            file_size=len(file_data["file_content"]),
-            content_type=file.content_type or "application/pdf"
+            file_size=file_data["file_size"],
+            content_type=file.content_type or "application/pdf",
+            content_hash=file_data["content_hash"]
         )
 
         return CVUploadResponse(
@@ -38,15 +39,15 @@ async def update_cv(
             source_id=cv_id,
             data={
                 "filename": file.filename,
-                "file_size": len(file_data["file_content"]),
+                "file_size": file_data["file_size"],
                 "source_id": cv_id
             }
         )
+    except PermissionError as e:
+        raise HTTPException(status_code=403, detail=str(e))
     finally:
         # Clean up temporary file
-        import os
-        if os.path.exists(file_data["temp_file_path"]):
-            os.unlink(file_data["temp_file_path"])
+        remove_temp_file(file_data["temp_file_path"])
 
 
 @router.delete("/{cv_id}")
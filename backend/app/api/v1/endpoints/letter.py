@@ -1,36 +1,109 @@
 import logging
 import json
 import asyncio
-from typing import Annotated, AsyncGenerator, Optional
-from fastapi import APIRouter, Request, UploadFile, File, Form, HTTPException, Depends
+from typing import AsyncGenerator, Optional
+from fastapi import APIRouter, Request, UploadFile, File, Form, HTTPException, Depends, Query, status
 from fastapi.responses import StreamingResponse
 from pydantic import HttpUrl
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import Session
+from app.core import tracing
+from app.core.config import settings
+from app.core.metrics import STREAM_CANCELLED
+from app.core.preload import wait_preloaded
 from app.schemas.letter import (
     LetterResponse,
-    CVUploadResponse
+    CVUploadResponse,
+    GeneralResponse,
+    BatchLetterRequest
 )
+from app.helper.pagination import decode_cursor, encode_cursor
+from app.repository.letter_repository import LetterRepository
 from app.services.letter import LetterService
-from app.database import get_db
-from app.helper.user import CurrentUser, get_current_user, get_user_repository
-from app.models.user import User
+from app.services.variants import VariantRun, get_variant_registry
+from app.services.batch import BatchItem, BatchJob, get_batch_registry
+from app.database import get_db, engine
+from app.helper.user import RequestUser
 from app.repository.user_repository import UserRepository
+from validator.pdf import remove_temp_file, validate_pdf_and_get_path
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-def get_letter_service(db: AsyncSession = Depends(get_db)) -> LetterService:
+async def get_letter_service(db: AsyncSession = Depends(get_db)) -> LetterService:
     """Dependency to get LetterService instance with database session"""
+    # LLM/Qdrant-клиенты импортируются лениво: не импортировать их в event loop, пока идёт preload
+    await wait_preloaded()
     return LetterService(db)
 
 
+def get_letter_repository(db: AsyncSession = Depends(get_db)) -> LetterRepository:
+    """Dependency to get LetterRepository with database session"""
+    return LetterRepository(db)
+
+
+_STREAM_STATUSES = ("__PARSING__", "__READY__", "__DONE__", "__CANCELLED__", "__ERROR__")
+
+
+def _is_delta(item) -> bool:
+    delta = item[1] if isinstance(item, tuple) else item
+    return delta not in _STREAM_STATUSES
+
+
+async def _wait_for_disconnect(request: Request) -> None:
+    """Returns once the client has gone away (request body is already consumed)."""
+    while not await request.is_disconnected():
+        message = await request.receive()
+        if message["type"] == "http.disconnect":
+            return
+
+
+async def _until_disconnected(request: Request, generator: AsyncGenerator):
+    """
+    Re-yields items from generator and closes it as soon as the client disconnects,
+    so upstream LLM / web-search streams stop instead of running to completion.
+    """
+    disconnect = asyncio.create_task(_wait_for_disconnect(request))
+    step = None
+    tokens = 0
+    completed = False
+    try:
+        while True:
+            step = asyncio.ensure_future(generator.__anext__())
+            await asyncio.wait((step, disconnect), return_when=asyncio.FIRST_COMPLETED)
+            if disconnect.done():
+                break
+            try:
+                item = step.result()
+            except StopAsyncIteration:
+                completed = True
+                break
+            except BaseException:
+                completed = True
+                raise
+            if _is_delta(item):
+                tokens += 1
+            yield item
+    finally:
+        disconnect.cancel()
+        if step is not None and not step.done():
+            step.cancel()
+            await asyncio.gather(step, return_exceptions=True)
+        await generator.aclose()
+        if not completed:
+            endpoint = request.url.path
+            STREAM_CANCELLED.labels(endpoint=endpoint).inc()
+            logger.info("Client disconnected from %s after %d streamed deltas", endpoint, tokens)
+
+
 async def _sse_wrap(
+    request: Request,
     generator: AsyncGenerator[str, None],
 ) -> AsyncGenerator[str, None]:
     try:
-        async for delta in generator:
-            if delta in ("__PARSING__", "__READY__"):
+        async for delta in _until_disconnected(request, generator):
+            if delta in _STREAM_STATUSES:
                 yield f"data: {json.dumps({'status': delta})}\n\n"
             else:
                 yield f"data: {json.dumps({'delta': delta})}\n\n"
@@ -42,18 +115,57 @@ async def _sse_wrap(
         yield f"data: {json.dumps({'error': 'Internal streaming error'})}\n\n"
 
 
-CurrentUser = Annotated[User, Depends(get_current_user)]
+async def _sse_wrap_variants(
+    request: Request,
+    run: VariantRun,
+    generator: AsyncGenerator[tuple[int | None, str], None],
+) -> AsyncGenerator[str, None]:
+    # Регистрация — внутри генератора: если стрим так и не начался (клиент ушёл до первого
+    # кадра), finally не выполнится, и запись осталась бы в реестре навсегда
+    get_variant_registry().add(run)
+    try:
+        yield f"data: {json.dumps({'status': '__VARIANTS__', 'run_id': run.id, 'variants': run.count})}\n\n"
+        async for variant_id, delta in _until_disconnected(request, generator):
+            if delta in _STREAM_STATUSES:
+                yield f"data: {json.dumps({'variant': variant_id, 'status': delta})}\n\n"
+            else:
+                yield f"data: {json.dumps({'variant': variant_id, 'delta': delta})}\n\n"
+        yield "data: [DONE]\n\n"
+    except ValueError as exc:
+        yield f"data: {json.dumps({'error': str(exc)})}\n\n"
+    except Exception:
+        logger.exception("Streaming error")
+        yield f"data: {json.dumps({'error': 'Internal streaming error'})}\n\n"
+    finally:
+        get_variant_registry().discard(run.id)
+
+
+async def _run_batch_job(job: BatchJob) -> None:
+    # Батч живёт дольше запроса, поэтому у него своя сессия БД
+    # Задача создана из запроса и унаследовала его контекст: span батча — дочерний к HTTP-запросу
+    try:
+        with tracing.span("letter_batch", {"batch.id": job.id, "batch.items": len(job.items)}), Session(engine) as session:
+            await LetterService(session).generate_batch(job)
+    except asyncio.CancelledError:
+        # Отмена могла прийти до генерации (поиск CV, контекст резюме)
+        if job.finished_at is None:
+            job.finish("cancelled")
+        raise
+    except Exception:
+        logger.exception("Batch %s failed", job.id)
+        job.finish("error", "Internal batch error")
+
 
 async def fetch(name, delay):
-    print(f"{name}: начало")
+    logger.info("%s: начало", name)
     await asyncio.sleep(delay)  # имитация сетевого запроса
-    print(f"{name}: готово")
+    logger.info("%s: готово", name)
     return name
 
 @router.post("/async-test",response_model=CVUploadResponse)
 async def load_test(
     request: Request,
-    user_repo: UserRepository = Depends(get_user_repository),
+    current_user: RequestUser,
     file: UploadFile = File(..., description="PDF file containing the CV/resume"),
     source_id: str = Form(..., description="Unique identifier for the CV source"),
     
@@ -61,33 +173,19 @@ async def load_test(
     db: AsyncSession = Depends(get_db)
 ):
     try:
-        # Validate file type
-        if not file.filename.lower().endswith('.pdf'):
-            raise HTTPException(status_code=400, detail="Only PDF files are allowed")
-
-        # Validate file size (max 10MB)
-        file_content = await file.read()
-        if len(file_content) > 10 * 1024 * 1024:  # 10MB
-            raise HTTPException(status_code=400, detail="File size must be less than 10MB")
-
-        # Save file temporarily
-        import tempfile
-        import os
-
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_file:
-            temp_file.write(file_content)
-            temp_file_path = temp_file.name
+        # Validate type/size and stream the upload to a temp file
+        file_data = await validate_pdf_and_get_path(file)
+        temp_file_path = file_data["temp_file_path"]
+        file_size = file_data["file_size"]
 
         try:
-            user_email = request.state.user_email
-            current_user = _get_user_by_mail(user_email,user_repo)
             await letter_service.parse_cv(
                 user_id=current_user.id,
                 pdf_path=temp_file_path,
                 source_id=source_id,
                 filename=file.filename,
                 original_filename=file.filename,
-                file_size=len(file_content),
+                file_size=file_size,
                 content_type=file.content_type or "application/pdf"
             )
 
@@ -97,15 +195,14 @@ async def load_test(
                 source_id=source_id,
                 data={
                     "filename": file.filename,
-                    "file_size": len(file_content),
+                    "file_size": file_size,
                     "source_id": source_id
                 }
             )
 
         finally:
             # Clean up temporary file
-            if os.path.exists(temp_file_path):
-                os.unlink(temp_file_path)
+            remove_temp_file(temp_file_path)
 
     except HTTPException:
         raise
@@ -155,6 +252,7 @@ async def create_letter_from_url(
 
 @router.post("/url/stream")
 async def stream_letter_from_url(
+    request: Request,
     url: str = Form(...),
     source_id: int = Form(...),
     target_language: Optional[str] = Form(None),
@@ -162,7 +260,7 @@ async def stream_letter_from_url(
 ):
     http_url = HttpUrl(url)
     return StreamingResponse(
-        _sse_wrap(letter_service.stream_by_url(str(http_url), source_id, target_language)),
+        _sse_wrap(request, letter_service.stream_by_url(str(http_url), source_id, target_language)),
         media_type="text/event-stream",
         headers={
             "Cache-Control": "no-cache",
@@ -216,6 +314,7 @@ async def create_letter_from_text(
 
 @router.post("/text/stream")
 async def stream_letter_from_text(
+    request: Request,
     name: str = Form(..., min_length=1, max_length=100),
     description: str = Form(..., min_length=1),
     source_id: int = Form(...),
@@ -224,7 +323,59 @@ async def stream_letter_from_text(
 ):
     job_requirements = f"{name}\n{description}"
     return StreamingResponse(
-        _sse_wrap(letter_service.stream_cover_letter(job_requirements, source_id, target_language)),
+        _sse_wrap(request, letter_service.stream_cover_letter(job_requirements, source_id, target_language, job_title=name)),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+        },
+    )
+
+
+@router.post("/text/variants/stream")
+async def stream_letter_variants_from_text(
+    request: Request,
+    name: str = Form(..., min_length=1, max_length=100),
+    description: str = Form(..., min_length=1),
+    source_id: int = Form(...),
+    variants: int = Form(2, ge=2, le=settings.LETTER_MAX_VARIANTS, description="Number of drafts to generate"),
+    target_language: Optional[str] = Form(None),
+    letter_service: LetterService = Depends(get_letter_service),
+):
+    """
+    Generate several drafts concurrently over one SSE stream.
+
+    Frames are tagged with `variant`; the first frame carries `run_id`,
+    which is used to pick a draft via `/variants/{run_id}/select`.
+    """
+    job_requirements = f"{name}\n{description}"
+    run = VariantRun(owner=request.state.user_email, count=variants)
+    return StreamingResponse(
+        _sse_wrap_variants(request, run, letter_service.stream_variants(
+            job_requirements, source_id, run, target_language, job_title=name
+        )),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+        },
+    )
+
+
+@router.post("/url/variants/stream")
+async def stream_letter_variants_from_url(
+    request: Request,
+    url: str = Form(...),
+    source_id: int = Form(...),
+    variants: int = Form(2, ge=2, le=settings.LETTER_MAX_VARIANTS, description="Number of drafts to generate"),
+    target_language: Optional[str] = Form(None),
+    letter_service: LetterService = Depends(get_letter_service),
+):
+    """Same as `/text/variants/stream`, requirements are extracted from the URL once."""
+    http_url = HttpUrl(url)
+    run = VariantRun(owner=request.state.user_email, count=variants)
+    return StreamingResponse(
+        _sse_wrap_variants(request, run, letter_service.stream_variants_by_url(str(http_url), source_id, run, target_language)),
         media_type="text/event-stream",
         headers={
             "Cache-Control": "no-cache",
@@ -233,15 +384,132 @@ async def stream_letter_from_text(
     )
 
 
+@router.post("/variants/{run_id}/select", response_model=GeneralResponse)
+async def select_letter_variant(
+    run_id: str,
+    request: Request,
+    variant_id: int = Form(..., ge=0, description="Variant to keep; the others are cancelled"),
+):
+    """Pick a draft from a running variants stream and cancel the others."""
+    run = get_variant_registry().get(run_id)
+    if run is None or run.owner != request.state.user_email:
+        raise HTTPException(status_code=404, detail="Variants run not found")
+    try:
+        run.select(variant_id)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return GeneralResponse(
+        success=True,
+        data={"run_id": run_id, "variant_id": variant_id}
+    )
+
+
+@router.post("/batch", response_model=GeneralResponse, status_code=status.HTTP_202_ACCEPTED)
+async def create_letter_batch(
+    request: Request,
+    batch: BatchLetterRequest,
+    current_user: RequestUser,
+):
+    """
+    Generate cover letters for many job postings with one CV.
+
+    Runs in the background; poll `/batch/{batch_id}` for progress and results.
+    """
+    items = [
+        BatchItem(
+            index=i,
+            url=str(item.url) if item.url else None,
+            name=item.name,
+            description=item.description,
+        )
+        for i, item in enumerate(batch.items)
+    ]
+    job = get_batch_registry().add(BatchJob(
+        owner=request.state.user_email,
+        user_id=current_user.id,
+        source_id=batch.source_id,
+        items=items,
+        target_language=batch.target_language,
+    ))
+    job.task = asyncio.create_task(_run_batch_job(job))
+    return GeneralResponse(
+        success=True,
+        data={"batch_id": job.id, "total": len(items)}
+    )
+
+
+@router.get("/batch/{batch_id}", response_model=GeneralResponse)
+async def get_letter_batch(batch_id: str, request: Request):
+    """Batch progress and per-item results"""
+    job = get_batch_registry().get(batch_id)
+    if job is None or job.owner != request.state.user_email:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return GeneralResponse(success=True, data=job.to_dict())
+
+
+@router.delete("/batch/{batch_id}", response_model=GeneralResponse)
+async def cancel_letter_batch(batch_id: str, request: Request):
+    """Cancel a running batch; letters already generated are kept"""
+    job = get_batch_registry().get(batch_id)
+    if job is None or job.owner != request.state.user_email:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    if job.task is not None and not job.task.done():
+        job.task.cancel()
+    return GeneralResponse(success=True, data={"batch_id": job.id})
+
+
+@router.get("/history", response_model=GeneralResponse)
+async def get_letter_history(
+    current_user: RequestUser,
+    cv_id: Optional[int] = Query(None, description="Only letters generated for this CV"),
+    q: Optional[str] = Query(None, min_length=1, max_length=200, description="Full-text search query"),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    letter_repo: LetterRepository = Depends(get_letter_repository),
+):
+    """
+    Page of previously generated letters, newest first.
+    Items carry a short preview; full text is fetched via /history/{letter_id}.
+    """
+    letters, next_key = await letter_repo.get_letter_summaries(
+        user_id=current_user.id,
+        limit=limit,
+        after=decode_cursor(cursor),
+        cv_id=cv_id,
+        query=q,
+    )
+    return GeneralResponse(
+        success=True,
+        data={
+            "letters": letters,
+            "next_cursor": encode_cursor(*next_key) if next_key else None,
+        },
+    )
+
+
+@router.get("/history/{letter_id}", response_model=GeneralResponse)
+async def get_letter_from_history(
+    letter_id: int,
+    current_user: RequestUser,
+    letter_repo: LetterRepository = Depends(get_letter_repository),
+):
+    """Full content of a previously generated letter"""
+    letter = await letter_repo.get_user_letter(current_user.id, letter_id)
+    if letter is None:
+        raise HTTPException(status_code=404, detail="Letter not found")
+    return GeneralResponse(success=True, data={"letter": letter})
+
+
 @router.post("/translate/stream")
 async def stream_translate_letter(
-    current_user: CurrentUser,
+    request: Request,
+    current_user: RequestUser,
     text: str = Form(..., max_length=10_000, description="Letter content to translate"),
     target_language: str = Form(..., max_length=50, description="Target language, e.g. 'Russian'"),
     letter_service: LetterService = Depends(get_letter_service),
 ):
     return StreamingResponse(
-        _sse_wrap(letter_service.stream_translate_letter(text, target_language)),
+        _sse_wrap(request, letter_service.stream_translate_letter(text, target_language)),
         media_type="text/event-stream",
         headers={
             "Cache-Control": "no-cache",
@@ -253,7 +521,7 @@ async def stream_translate_letter(
 @router.post("/upload-cv", response_model=CVUploadResponse)
 async def upload_cv(
     request: Request,
-    user_repo: UserRepository = Depends(get_user_repository),
+    current_user: RequestUser,
     file: UploadFile = File(..., description="PDF file containing the CV/resume"),
     source_id: str = Form(..., description="Unique identifier for the CV source"),
     
@@ -267,34 +535,21 @@ async def upload_cv(
     - **source_id**: Unique identifier for the CV source (used for later retrieval)
     """
     try:
-        # Validate file type
-        if not file.filename.lower().endswith('.pdf'):
-            raise HTTPException(status_code=400, detail="Only PDF files are allowed")
-
-        # Validate file size (max 10MB)
-        file_content = await file.read()
-        if len(file_content) > 10 * 1024 * 1024:  # 10MB
-            raise HTTPException(status_code=400, detail="File size must be less than 10MB")
-
-        # Save file temporarily
-        import tempfile
-        import os
-
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_file:
-            temp_file.write(file_content)
-            temp_file_path = temp_file.name
+        # Validate type/size and stream the upload to a temp file
+        file_data = await validate_pdf_and_get_path(file)
+        temp_file_path = file_data["temp_file_path"]
+        file_size = file_data["file_size"]
 
         try:
-            user_email = request.state.user_email
-            current_user = _get_user_by_mail(user_email,user_repo)
-            await letter_service.add_cv(
+            deduplicated = await letter_service.add_cv(
                 user_id=current_user.id,
                 pdf_path=temp_file_path,
                 source_id=source_id,
                 filename=file.filename,
                 original_filename=file.filename,
-                file_size=len(file_content),
-                content_type=file.content_type or "application/pdf"
+                file_size=file_size,
+                content_type=file.content_type or "application/pdf",
+                content_hash=file_data["content_hash"]
             )
 
             return CVUploadResponse(
@@ -303,18 +558,20 @@ async def upload_cv(
                 source_id=source_id,
                 data={
                     "filename": file.filename,
-                    "file_size": len(file_content),
-                    "source_id": source_id
+                    "file_size": file_size,
+                    "source_id": source_id,
+                    "deduplicated": deduplicated
                 }
             )
 
         finally:
             # Clean up temporary file
-            if os.path.exists(temp_file_path):
-                os.unlink(temp_file_path)
+            remove_temp_file(temp_file_path)
 
     except HTTPException:
         raise
+    except PermissionError as e:
+        raise HTTPException(status_code=403, detail=str(e))
     except Exception as e:
         logging.error("Error uploading CV", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Error uploading CV: {str(e)}")
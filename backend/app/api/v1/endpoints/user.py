@@ -1,11 +1,12 @@
 import logging
-from typing import List
+from typing import Optional
 
-from fastapi import APIRouter, Depends, Request
+from fastapi import APIRouter, Depends, Query, Request, Response, status
 from fastapi.exceptions import HTTPException
 
 from app.database import get_db
-from app.helper.user import get_user_repository
+from app.helper.pagination import is_not_modified
+from app.helper.user import RequestUser, get_user_repository
 from app.repository.user_repository import UserRepository
 from app.services.user import UserService
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -13,7 +14,6 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.repository.cv_repository import CVRepository
 from app.services.cv import CVService
-from app.schemas.general import Option
 from app.schemas.letter import GeneralResponse
 
 logger = logging.getLogger(__name__)
@@ -41,41 +41,52 @@ def get_cv_service(
 @router.get("/cvs")
 async def get_all_cvs(
     request: Request,
-    user_service:UserService = Depends(get_user_service),
+    response: Response,
+    user: RequestUser,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
     cv_service:CVService = Depends(get_cv_service)
 ):
-    user_email = request.state.user_email
+    """Get a page of the user's CVs, newest first"""
+    etag = await cv_service.get_listing_etag(user.id, "cvs", cursor, limit)
+    if is_not_modified(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
     try:
-        user = user_service.get_user_by_email(user_email)
-        cvs = await cv_service.get_by_user(user.id)
+        cvs, next_cursor = await cv_service.get_by_user(user.id, limit, cursor)
         result = {
-            "cvs": cvs
+            "cvs": cvs,
+            "next_cursor": next_cursor
         }
+        response.headers["ETag"] = etag
         return GeneralResponse(
             success=True,
             data=result
         )
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error("Error retrieving CVs", exc_info=True)
         raise HTTPException(status_code=500, detail="Error retrieving CVs")     
 
 @router.get("/cvs/options")
 async def get_cvs_by_user(
-    request:Request,
-    user_service:UserService = Depends(get_user_service),
+    request: Request,
+    response: Response,
+    user: RequestUser,
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
     cv_service:CVService = Depends(get_cv_service)
 ):
     """Get cvs options by user """
-    user_email = request.state.user_email
-    try:
-        user = user_service.get_user_by_email(user_email)
-    except Exception as e:
-        logging.error("Error finding user", exc_info=True)
-        raise HTTPException(status_code=404, detail="User Not found")
-    options:List[Option] = await cv_service.get_cvs_by_user(user_id=user.id)
+    etag = await cv_service.get_listing_etag(user.id, "options", cursor, limit)
+    if is_not_modified(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    options, next_cursor = await cv_service.get_cvs_by_user(user_id=user.id, limit=limit, cursor=cursor)
     result = {
-        "options":options
+        "options":options,
+        "next_cursor": next_cursor
     }
+    response.headers["ETag"] = etag
     return GeneralResponse(
         success=True,
         data=result
@@ -0,0 +1,72 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Hashable, Optional
+
+from app.core.config import settings
+from app.core.metrics import CACHE_REQUESTS
+
+
+class TTLCache:
+    """
+    Small bounded in-process cache with per-entry expiry (LRU eviction).
+
+    Entries expire after ttl seconds or at an explicit wall-clock
+    timestamp (e.g. a JWT "exp"), whichever comes first.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, name: str = "default"):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = Lock()
+        self._hits = CACHE_REQUESTS.labels(cache=name, result="hit")
+        self._misses = CACHE_REQUESTS.labels(cache=name, result="miss")
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self._misses.inc()
+                return default
+            expires_at, value = entry
+            if expires_at <= time.time():
+                del self._data[key]
+                self._misses.inc()
+                return default
+            self._data.move_to_end(key)
+            self._hits.inc()
+            return value
+
+    def set(self, key: Hashable, value: Any, expires_at: Optional[float] = None) -> None:
+        deadline = time.time() + self.ttl
+        if expires_at is not None:
+            deadline = min(deadline, expires_at)
+        with self._lock:
+            self._data[key] = (deadline, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+# Идентичность текущего пользователя: ключи ("id", user_id) и ("email", email)
+user_cache = TTLCache(maxsize=settings.USER_CACHE_SIZE, ttl=settings.USER_CACHE_TTL, name="user")
+
+
+def invalidate_user(user_id: Optional[int], *emails: str) -> None:
+    """Drops cached identity entries for a user after it was changed."""
+    if user_id is not None:
+        user_cache.pop(("id", user_id))
+    for email in emails:
+        user_cache.pop(("email", email))
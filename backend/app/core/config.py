@@ -10,7 +10,56 @@ class Settings:
     DESCRIPTION: str = "AI-powered cover letter generator using RAG"
     SECRET_KEY: str = os.getenv("SECRET_KEY", "your-secret-key-here-change-in-production")
     ALGORITHM="HS256"
+    AUTH_TOKEN_CACHE_SIZE: int = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "4096"))
+    AUTH_TOKEN_CACHE_TTL: int = int(os.getenv("AUTH_TOKEN_CACHE_TTL", "300"))
+    USER_CACHE_SIZE: int = int(os.getenv("USER_CACHE_SIZE", "4096"))
+    USER_CACHE_TTL: int = int(os.getenv("USER_CACHE_TTL", "30"))
     API_V1_STR: str = "/api/v1"
+    # Дополнительные пути без авторизации, через запятую (например, /api/v1/metrics для scrape)
+    EXTRA_UNPROTECTED_ROUTES: List[str] = [
+        route.strip() for route in os.getenv("EXTRA_UNPROTECTED_ROUTES", "").split(",") if route.strip()
+    ]
+
+    # Prometheus
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+    METRICS_PATH: str = os.getenv("METRICS_PATH", "/metrics")
+
+    # OpenTelemetry (pip install '.[tracing]'). Экспорт: otlp (OTEL_EXPORTER_OTLP_ENDPOINT),
+    # file (JSON lines в TRACING_FILE) или console
+    TRACING_ENABLED: bool = os.getenv("TRACING_ENABLED", "false").lower() == "true"
+    TRACING_EXPORTER: str = os.getenv("TRACING_EXPORTER", "otlp")
+    TRACING_FILE: str = os.getenv("TRACING_FILE", "traces.jsonl")
+    TRACING_SERVICE_NAME: str = os.getenv("TRACING_SERVICE_NAME", "cover-letter-api")
+    TRACING_SAMPLE_RATIO: float = float(os.getenv("TRACING_SAMPLE_RATIO", "1.0"))
+
+    # Детектор блокировок event loop (диагностика): heartbeat, порог и частота сэмплов стека, сек
+    LOOP_MONITOR_ENABLED: bool = os.getenv("LOOP_MONITOR_ENABLED", "false").lower() == "true"
+    LOOP_MONITOR_INTERVAL: float = float(os.getenv("LOOP_MONITOR_INTERVAL", "0.05"))
+    LOOP_MONITOR_THRESHOLD: float = float(os.getenv("LOOP_MONITOR_THRESHOLD", "0.1"))
+    LOOP_MONITOR_SAMPLE_INTERVAL: float = float(os.getenv("LOOP_MONITOR_SAMPLE_INTERVAL", "0.01"))
+
+    # Профилирование запросов pyinstrument (pip install '.[profiling]'): по заголовку
+    # PROFILE_HEADER от админа или случайная доля PROFILE_SAMPLE_RATE; интервал сэмплов, сек
+    PROFILING_ENABLED: bool = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+    PROFILE_HEADER: str = os.getenv("PROFILE_HEADER", "X-Profile")
+    PROFILE_SAMPLE_RATE: float = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+    PROFILE_INTERVAL: float = float(os.getenv("PROFILE_INTERVAL", "0.001"))
+    PROFILE_DIR: str = os.getenv("PROFILE_DIR", "profiles")
+    PROFILE_KEEP: int = int(os.getenv("PROFILE_KEEP", "100"))
+
+    # Тяжёлые библиотеки импортируются при первом использовании. Эти модули догружаются
+    # в фоновом потоке после старта, чтобы первый запрос их не ждал; "" — не догружать.
+    # llama_index (разбор PDF, чанкинг) по умолчанию не догружается: нужен только при загрузке CV
+    PRELOAD_MODULES: List[str] = [
+        name.strip() for name in os.getenv(
+            "PRELOAD_MODULES", "qdrant_client,openai,langchain_core.prompts,langchain_ollama,langchain_openai"
+        ).split(",") if name.strip()
+    ]
+
+    # Доступ к диагностическим /api/v1/admin/* эндпоинтам, через запятую
+    ADMIN_EMAILS: List[str] = [
+        email.strip().lower() for email in os.getenv("ADMIN_EMAILS", "").split(",") if email.strip()
+    ]
 
     # CORS
     CORS_ORIGINS: List[str] = [
@@ -36,9 +85,67 @@ class Settings:
     # OpenAI
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY", "")
 
+    # CV upload
+    CV_MAX_UPLOAD_BYTES: int = int(os.getenv("CV_MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+    CV_UPLOAD_CHUNK_SIZE: int = int(os.getenv("CV_UPLOAD_CHUNK_SIZE", str(256 * 1024)))
+
     # Qdrant
     QDRANT_URL: str = os.getenv("QDRANT_URL", "http://localhost:6333")
     QDRANT_API_KEY: str = os.getenv("QDRANT_API_KEY", "")
+    QDRANT_PREFER_GRPC: bool = os.getenv("QDRANT_PREFER_GRPC", "false").lower() == "true"
+    QDRANT_GRPC_PORT: int = int(os.getenv("QDRANT_GRPC_PORT", "6334"))
+    # Bulk upsert: размер пачки точек; PARALLEL > 1 — процессы upload_collection (для переиндексации)
+    QDRANT_UPSERT_BATCH_SIZE: int = int(os.getenv("QDRANT_UPSERT_BATCH_SIZE", "256"))
+    QDRANT_UPSERT_PARALLEL: int = int(os.getenv("QDRANT_UPSERT_PARALLEL", "1"))
+    # Общий AsyncQdrantClient: размер пула соединений и таймаут запросов (сек)
+    QDRANT_POOL_SIZE: int = int(os.getenv("QDRANT_POOL_SIZE", "20"))
+    QDRANT_TIMEOUT: int = int(os.getenv("QDRANT_TIMEOUT", "10"))
+    QDRANT_ASYNC_UPSERT_CONCURRENCY: int = int(os.getenv("QDRANT_ASYNC_UPSERT_CONCURRENCY", "4"))
+    # Создание коллекций и payload-индексов при старте; false — схема ведётся отдельно
+    QDRANT_BOOTSTRAP_ON_STARTUP: bool = os.getenv("QDRANT_BOOTSTRAP_ON_STARTUP", "true").lower() == "true"
+
+    # Чанкинг по коллекциям: "strategy:size:overlap", strategy — section | sentence.
+    # Коллекции skills/projects получают только чанки своего раздела (нужна стратегия section).
+    # Подбор значений: python -m benchmarks.chunking
+    CHUNKING: dict = {
+        "cvs": os.getenv("CHUNKING_CVS", "section:400:40"),
+        "skills": os.getenv("CHUNKING_SKILLS", "section:400:40"),
+        "projects": os.getenv("CHUNKING_PROJECTS", "section:400:40"),
+    }
+
+    # Embeddings: "openai" (text-embedding-3-large, 3072) | "ollama" (nomic-embed-text, 768)
+    EMBEDDING_PROVIDER: str = os.getenv("EMBEDDING_PROVIDER", "openai")
+
+    # Ollama
+    OLLAMA_HOST: str = os.getenv("OLLAMA_HOST", "http://localhost:11434")
+    OLLAMA_MODEL: str = os.getenv("OLLAMA_MODEL", "mistral:7b")
+    OLLAMA_KEEP_ALIVE: str = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+    # Бюджет промпта в токенах: инструкции ~0.3k + резюме + вакансия ~1.5k + ответ (OLLAMA_NUM_PREDICT).
+    # Резюме — профиль CV (LETTER_RESUME_CONTEXT=digest), обычно 0.5-1k; без профиля — поиск по чанкам:
+    # до 23 чанков section:400:40 (_RESUME_QUERIES в app.services.letter), ~9k символов ≈ 3k.
+    # Худший случай ~6k — 8192 с запасом
+    OLLAMA_NUM_CTX: int = int(os.getenv("OLLAMA_NUM_CTX", "8192"))
+    OLLAMA_NUM_PREDICT: int = int(os.getenv("OLLAMA_NUM_PREDICT", "1024"))
+
+    # CV digest (compact profile built at ingestion)
+    CV_DIGEST_MODEL: str = os.getenv("CV_DIGEST_MODEL", "gpt-4o-mini")
+    CV_DIGEST_MAX_INPUT_CHARS: int = int(os.getenv("CV_DIGEST_MAX_INPUT_CHARS", "24000"))
+    # digest — профиль CV по умолчанию, chunks — всегда векторный поиск по чанкам
+    LETTER_RESUME_CONTEXT: str = os.getenv("LETTER_RESUME_CONTEXT", "digest")
+
+    # Letter generation
+    LETTER_MAX_VARIANTS: int = int(os.getenv("LETTER_MAX_VARIANTS", "4"))
+    LETTER_BATCH_MAX_ITEMS: int = int(os.getenv("LETTER_BATCH_MAX_ITEMS", "50"))
+    LETTER_BATCH_CONCURRENCY: int = int(os.getenv("LETTER_BATCH_CONCURRENCY", "2"))
+    LETTER_BATCH_EXTRACT_CONCURRENCY: int = int(os.getenv("LETTER_BATCH_EXTRACT_CONCURRENCY", "8"))
+    # Write-behind сохранение стриминговых писем
+    LETTER_WRITE_BATCH_SIZE: int = int(os.getenv("LETTER_WRITE_BATCH_SIZE", "50"))
+    LETTER_WRITE_FLUSH_INTERVAL: float = float(os.getenv("LETTER_WRITE_FLUSH_INTERVAL", "1.0"))
+    LETTER_WRITE_QUEUE_SIZE: int = int(os.getenv("LETTER_WRITE_QUEUE_SIZE", "10000"))
+
+    # Password hashing (pbkdf2_sha256); при смене ROUNDS хэши обновляются при логине
+    PASSWORD_HASH_ROUNDS: int = int(os.getenv("PASSWORD_HASH_ROUNDS", "29000"))
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
 
     # Database settings
     DATABASE_ECHO: bool = os.getenv("DATABASE_ECHO", "false").lower() == "true"
@@ -0,0 +1,179 @@
+"""
+Event loop blocking detector (opt-in: LOOP_MONITOR_ENABLED=true).
+
+A heartbeat task on the loop measures lag continuously. A watchdog thread
+checks the heartbeat and, while the loop is stalled longer than the threshold,
+samples the loop thread's stack. Every sample is attributed to the innermost
+frame inside the app package (e.g. app.services.pdf:_load_pdf_text), so a sync
+call deep in a library is reported at the app code that made it.
+Results: /metrics (event_loop_*) and GET /api/v1/admin/loop.
+"""
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+from app.core.config import settings
+from app.core.metrics import EVENT_LOOP_BLOCKED_SECONDS, EVENT_LOOP_BLOCKS, EVENT_LOOP_LAG_SECONDS
+
+logger = logging.getLogger(__name__)
+
+_APP_DIR = Path(__file__).resolve().parent.parent
+_STACK_LIMIT = 30
+OUTSIDE_APP = "<outside app>"
+
+
+def app_site(stack: traceback.StackSummary) -> str:
+    """'module:function' of the innermost frame inside the app package."""
+    for frame in reversed(stack):
+        path = Path(frame.filename)
+        if path.is_relative_to(_APP_DIR):
+            module = ".".join(path.relative_to(_APP_DIR.parent).with_suffix("").parts)
+            return f"{module}:{frame.name}"
+    return OUTSIDE_APP
+
+
+@dataclass
+class _Episode:
+    """Один эпизод блокировки loop: от пропущенного heartbeat до следующего"""
+    blocked_since: float
+    started_at: datetime
+    samples: Counter = field(default_factory=Counter)
+    stacks: dict = field(default_factory=dict)  # site -> стек первого сэмпла
+
+
+class LoopMonitor:
+    def __init__(self, interval: float = settings.LOOP_MONITOR_INTERVAL,
+                 threshold: float = settings.LOOP_MONITOR_THRESHOLD,
+                 sample_interval: float = settings.LOOP_MONITOR_SAMPLE_INTERVAL,
+                 history: int = 100):
+        self.interval = interval
+        self.threshold = threshold
+        self.sample_interval = sample_interval
+        self._lags: deque[float] = deque(maxlen=1000)
+        self._blocks: deque[dict] = deque(maxlen=history)
+        self._sites: Counter = Counter()  # site -> секунды блокировки
+        self._site_stacks: dict[str, list[str]] = {}
+        self._lock = threading.Lock()
+        self._last_beat = time.monotonic()
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def start(self) -> None:
+        if self._task is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._heartbeat(), name="loop-monitor")
+        self._thread = threading.Thread(target=self._watch, name="loop-monitor-watchdog", daemon=True)
+        self._thread.start()
+        logger.info("Event loop monitor started: threshold %.0f ms", self.threshold * 1000)
+
+    async def stop(self) -> None:
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._thread is not None:
+            await asyncio.to_thread(self._thread.join)
+            self._thread = None
+
+    async def _heartbeat(self) -> None:
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self._last_beat = now
+            lag = max(0.0, now - expected)
+            EVENT_LOOP_LAG_SECONDS.observe(lag)
+            with self._lock:
+                self._lags.append(lag)
+
+    def _watch(self) -> None:
+        episode: Optional[_Episode] = None
+        while not self._stop.wait(self.sample_interval):
+            last_beat = self._last_beat
+            blocked_since = last_beat + self.interval
+            if time.monotonic() - blocked_since >= self.threshold:
+                if episode is None or episode.blocked_since != blocked_since:
+                    if episode is not None:
+                        self._finish(episode, blocked_since - self.interval)
+                    episode = _Episode(blocked_since=blocked_since, started_at=datetime.now(timezone.utc))
+                self._sample(episode)
+            elif episode is not None:
+                self._finish(episode, last_beat)
+                episode = None
+
+    def _sample(self, episode: _Episode) -> None:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return
+        stack = traceback.extract_stack(frame, limit=_STACK_LIMIT)
+        site = app_site(stack)
+        episode.samples[site] += 1
+        if site not in episode.stacks:
+            episode.stacks[site] = [f"{f.filename}:{f.lineno} {f.name}" for f in stack]
+        EVENT_LOOP_BLOCKED_SECONDS.labels(site=site).inc(self.sample_interval)
+
+    def _finish(self, episode: _Episode, resumed_at: float) -> None:
+        if not episode.samples:
+            return
+        duration = max(resumed_at - episode.blocked_since, 0.0)
+        site, _ = episode.samples.most_common(1)[0]
+        EVENT_LOOP_BLOCKS.labels(site=site).inc()
+        total = sum(episode.samples.values())
+        with self._lock:
+            for sampled_site, count in episode.samples.items():
+                self._sites[sampled_site] += duration * count / total
+                self._site_stacks.setdefault(sampled_site, episode.stacks[sampled_site])
+            self._blocks.append({
+                "started_at": episode.started_at.isoformat(),
+                "duration_ms": round(duration * 1000, 1),
+                "site": site,
+                "samples": dict(episode.samples),
+                "stack": episode.stacks[site],
+            })
+        logger.warning("Event loop blocked for %.0f ms in %s", duration * 1000, site)
+
+    def snapshot(self, top: int = 20) -> dict:
+        with self._lock:
+            lags = sorted(self._lags)
+            sites = self._sites.most_common(top)
+            blocks = list(self._blocks)
+            stacks = dict(self._site_stacks)
+
+        def _pct(pct: float) -> float:
+            return round(lags[min(len(lags) - 1, int(pct / 100 * len(lags)))] * 1000, 1) if lags else 0.0
+
+        return {
+            "running": self._task is not None,
+            "interval_ms": self.interval * 1000,
+            "threshold_ms": self.threshold * 1000,
+            "lag_ms": {"p50": _pct(50), "p99": _pct(99), "max": round(lags[-1] * 1000, 1) if lags else 0.0},
+            "blocking_sites": [
+                {"site": site, "blocked_ms": round(seconds * 1000, 1), "stack": stacks.get(site)}
+                for site, seconds in sites
+            ],
+            "recent_blocks": blocks[::-1],
+        }
+
+
+_loop_monitor: Optional[LoopMonitor] = None
+
+
+def get_loop_monitor() -> LoopMonitor:
+    global _loop_monitor
+    if _loop_monitor is None:
+        _loop_monitor = LoopMonitor()
+    return _loop_monitor
@@ -0,0 +1,153 @@
+from contextlib import contextmanager
+from typing import Optional
+
+from prometheus_client import REGISTRY, Counter, Gauge, Histogram
+from prometheus_client.core import GaugeMetricFamily
+
+from app.core import tracing
+
+# Секунды: от быстрых вызовов (поиск в Qdrant, кэш) до генерации письма целиком
+_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+# Stages of letter generation and CV ingestion
+STAGE_SECONDS = Histogram(
+    "app_stage_seconds",
+    "Duration of one pipeline stage",
+    ["stage"],  # job_extraction, resume_context, embedding, vector_*, llm_*, pdf_parse, chunking, digest
+    buckets=_LATENCY_BUCKETS,
+)
+
+
+@contextmanager
+def stage_timer(stage: str, attributes: Optional[dict] = None):
+    """
+    Context manager (sync or async code) recording the block's duration into
+    STAGE_SECONDS and wrapping it in a tracing span of the same name.
+    """
+    with tracing.span(stage, attributes), STAGE_SECONDS.labels(stage=stage).time():
+        yield
+
+
+# LLM
+LLM_TIME_TO_FIRST_TOKEN = Histogram(
+    "llm_time_to_first_token_seconds",
+    "Time from sending the prompt to the first streamed token (prefill + queueing)",
+    ["model"],
+    buckets=_LATENCY_BUCKETS,
+)
+LLM_STREAMED_CHUNKS = Counter(
+    "llm_streamed_chunks_total",
+    "Non-empty text chunks streamed from the LLM",
+    ["model"],
+)
+LLM_USAGE_TOKENS = Counter(
+    "llm_usage_tokens_total",
+    "Tokens reported by the provider's usage metadata",
+    ["model", "kind"],  # prompt, completion
+)
+
+# Embeddings
+EMBEDDED_TEXTS = Counter(
+    "embedding_texts_total",
+    "Texts sent to the embedding model",
+    ["provider"],
+)
+
+# In-process caches
+CACHE_REQUESTS = Counter(
+    "app_cache_requests_total",
+    "Lookups in in-process caches",
+    ["cache", "result"],  # result: hit, miss
+)
+
+# Time work items spend waiting before they are processed
+QUEUE_WAIT_SECONDS = Histogram(
+    "app_queue_wait_seconds",
+    "Time a work item waited in a queue or for a concurrency slot",
+    ["queue"],  # letter_write, password_hash, batch_generate
+    buckets=_LATENCY_BUCKETS,
+)
+
+# Streaming
+STREAM_CANCELLED = Counter(
+    "letter_stream_cancelled_total",
+    "SSE streams closed because the client disconnected before completion",
+    ["endpoint"],
+)
+STREAM_WASTED_CHUNKS = Histogram(
+    "llm_stream_wasted_chunks",
+    "Text chunks pulled from an upstream LLM stream that was closed early because its consumer went away",
+    ["model"],
+    buckets=(0, 10, 50, 100, 250, 500, 1000, 2000, 4000),
+)
+
+# CV ingestion
+CV_UPLOAD_DEDUP = Counter(
+    "cv_upload_dedup_total",
+    "CV uploads checked against existing files of the same user by content hash",
+    ["result"],  # hit, miss
+)
+CV_UPLOAD_DEDUP_CHUNKS = Counter(
+    "cv_upload_dedup_reused_chunks_total",
+    "Chunk vectors copied from an identical CV instead of being re-embedded",
+)
+
+# Letter write-behind
+LETTER_WRITES = Counter(
+    "letter_write_behind_total",
+    "Generated letters handled by the write-behind buffer",
+    ["result"],  # written, dropped, failed
+)
+LETTER_WRITE_QUEUE = Gauge(
+    "letter_write_behind_queue_size",
+    "Generated letters waiting in the write-behind buffer",
+)
+LETTER_WRITE_BATCH_SECONDS = Histogram(
+    "letter_write_behind_batch_seconds",
+    "Time to insert one batch of buffered letters",
+)
+
+# Event loop monitor (LOOP_MONITOR_ENABLED)
+EVENT_LOOP_LAG_SECONDS = Histogram(
+    "event_loop_lag_seconds",
+    "Delay of the loop monitor heartbeat beyond its interval",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+EVENT_LOOP_BLOCKED_SECONDS = Counter(
+    "event_loop_blocked_seconds_total",
+    "Sampled time the event loop was blocked, by app function on the stack",
+    ["site"],  # module:function of the innermost app frame
+)
+EVENT_LOOP_BLOCKS = Counter(
+    "event_loop_blocks_total",
+    "Event loop stalls longer than the threshold, by dominant app function",
+    ["site"],
+)
+
+
+class _DBPoolCollector:
+    """Состояние пула соединений SQLAlchemy, читается в момент scrape (без накладных расходов на запросы)."""
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    def collect(self):
+        pool = self.engine.pool
+        for name, help_text, method in (
+            ("db_pool_size", "Configured size of the DB connection pool", "size"),
+            ("db_pool_checked_out", "DB connections currently checked out", "checkedout"),
+            ("db_pool_checked_in", "Idle DB connections in the pool", "checkedin"),
+            ("db_pool_overflow", "DB connections opened above the pool size", "overflow"),
+        ):
+            # Не у всех пулов (SingletonThreadPool, NullPool) есть эти методы
+            if hasattr(pool, method):
+                yield GaugeMetricFamily(name, help_text, value=getattr(pool, method)())
+
+
+_db_pool_collector = None
+
+def register_db_pool_collector(engine) -> None:
+    global _db_pool_collector
+    if _db_pool_collector is None:
+        _db_pool_collector = _DBPoolCollector(engine)
+        REGISTRY.register(_db_pool_collector)
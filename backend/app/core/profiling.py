@@ -0,0 +1,83 @@
+"""
+Per-request sampling profiles (optional): pip install '.[profiling]' and PROFILING_ENABLED=true.
+
+ProfilingMiddleware profiles a request when an admin sends the PROFILE_HEADER
+header or the request falls into PROFILE_SAMPLE_RATE. pyinstrument runs in
+async mode, so awaits (LLM stream, Qdrant, thread pool) show up in the
+pipeline instead of being lost. Every profile is saved to PROFILE_DIR as
+HTML and speedscope JSON plus a small metadata file; only the newest
+PROFILE_KEEP profiles are kept. Listing and download: /api/v1/admin/profiles.
+"""
+import json
+import logging
+import re
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+from uuid import uuid4
+
+from app.core.config import settings
+
+try:
+    from pyinstrument import Profiler
+    from pyinstrument.renderers import HTMLRenderer, SpeedscopeRenderer
+except ImportError:  # pyinstrument не установлен — профилирование недоступно
+    Profiler = None
+
+logger = logging.getLogger(__name__)
+
+FORMATS = {"html": ".html", "speedscope": ".speedscope.json"}
+_PROFILE_ID = re.compile(r"^[0-9]{8}T[0-9]{12}-[0-9a-f]{8}$")
+
+
+def profiling_available() -> bool:
+    return Profiler is not None
+
+
+def new_profile_id() -> str:
+    # Время с микросекундами в начале: сортировка имён = сортировка по времени
+    return f"{datetime.now(timezone.utc):%Y%m%dT%H%M%S%f}-{uuid4().hex[:8]}"
+
+
+def save_profile(profile_id: str, session, meta: dict) -> None:
+    """Writes HTML, speedscope and metadata of a finished profiler session (blocking: call in a thread)."""
+    directory = Path(settings.PROFILE_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    (directory / f"{profile_id}{FORMATS['html']}").write_text(HTMLRenderer().render(session), encoding="utf-8")
+    (directory / f"{profile_id}{FORMATS['speedscope']}").write_text(
+        SpeedscopeRenderer().render(session), encoding="utf-8"
+    )
+    (directory / f"{profile_id}.json").write_text(json.dumps({"id": profile_id, **meta}), encoding="utf-8")
+    _prune(directory)
+
+
+def list_profiles(limit: int = 50) -> list[dict]:
+    """Metadata of the newest profiles, newest first."""
+    directory = Path(settings.PROFILE_DIR)
+    if not directory.is_dir():
+        return []
+    profiles = []
+    for path in sorted(_meta_files(directory), reverse=True)[:limit]:
+        try:
+            profiles.append(json.loads(path.read_text(encoding="utf-8")))
+        except (OSError, ValueError):
+            logger.warning("Skipping unreadable profile metadata %s", path)
+    return profiles
+
+
+def profile_path(profile_id: str, fmt: str) -> Optional[Path]:
+    """Path of a stored profile artifact; None for unknown ids/formats."""
+    if fmt not in FORMATS or not _PROFILE_ID.match(profile_id):
+        return None
+    path = Path(settings.PROFILE_DIR) / f"{profile_id}{FORMATS[fmt]}"
+    return path if path.is_file() else None
+
+
+def _meta_files(directory: Path) -> list[Path]:
+    return [path for path in directory.glob("*.json") if _PROFILE_ID.match(path.stem)]
+
+
+def _prune(directory: Path) -> None:
+    for meta in sorted(_meta_files(directory), reverse=True)[settings.PROFILE_KEEP:]:
+        for suffix in (".json", *FORMATS.values()):
+            (directory / f"{meta.stem}{suffix}").unlink(missing_ok=True)
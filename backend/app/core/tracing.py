@@ -0,0 +1,133 @@
+"""
+OpenTelemetry tracing (optional): pip install '.[tracing]' and TRACING_ENABLED=true.
+
+HTTP requests and SQL queries are traced by the FastAPI/SQLAlchemy
+instrumentations, pipeline stages — by stage_timer() (app.core.metrics), which
+opens a span of the same name. Without the opentelemetry packages, or with
+tracing disabled, span()/start_span() are no-ops.
+"""
+import logging
+from contextlib import nullcontext
+from typing import Optional
+
+from app.core.config import settings
+
+try:
+    from opentelemetry import trace
+except ImportError:  # opentelemetry-api не установлен — трассировка отключена
+    trace = None
+
+logger = logging.getLogger(__name__)
+
+_TRACER_NAME = "cover-letter-rag"
+_provider = None
+
+
+class _NoopSpan:
+    def set_attribute(self, key, value) -> None:
+        pass
+
+    def set_attributes(self, attributes) -> None:
+        pass
+
+    def add_event(self, name, attributes=None) -> None:
+        pass
+
+    def record_exception(self, exception) -> None:
+        pass
+
+    def end(self) -> None:
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def span(name: str, attributes: Optional[dict] = None, links: Optional[list] = None):
+    """
+    Context manager: span that is current for the block, so nested spans
+    (including ones in asyncio.to_thread) become its children.
+    """
+    if trace is None:
+        return nullcontext(_NOOP_SPAN)
+    return trace.get_tracer(_TRACER_NAME).start_as_current_span(name, attributes=attributes, links=links)
+
+
+def start_span(name: str, attributes: Optional[dict] = None):
+    """
+    Span that is NOT made current; the caller must end() it. For async
+    generators: their body runs in the consumer's context between yields,
+    so a current span would leak into it.
+    """
+    if trace is None:
+        return _NOOP_SPAN
+    return trace.get_tracer(_TRACER_NAME).start_span(name, attributes=attributes)
+
+
+def current_link():
+    """Link to the current span, for work finished later outside the request (write-behind)."""
+    if trace is None:
+        return None
+    context = trace.get_current_span().get_span_context()
+    return trace.Link(context) if context.is_valid else None
+
+
+def setup_tracing(app, engine) -> bool:
+    """Configures the tracer provider and instrumentations; False if tracing stays off."""
+    global _provider
+    if not settings.TRACING_ENABLED or _provider is not None:
+        return _provider is not None
+    try:
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+        from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+    except ImportError:
+        logger.warning("TRACING_ENABLED is set, but opentelemetry-sdk is not installed (pip install '.[tracing]')")
+        return False
+
+    _provider = TracerProvider(
+        resource=Resource.create({"service.name": settings.TRACING_SERVICE_NAME}),
+        sampler=ParentBased(TraceIdRatioBased(settings.TRACING_SAMPLE_RATIO)),
+    )
+    _provider.add_span_processor(BatchSpanProcessor(_make_exporter(settings.TRACING_EXPORTER)))
+    trace.set_tracer_provider(_provider)
+    _instrument(app, engine)
+    logger.info("Tracing enabled, exporter: %s", settings.TRACING_EXPORTER)
+    return True
+
+
+def shutdown_tracing() -> None:
+    """Flushes buffered spans."""
+    global _provider
+    if _provider is not None:
+        _provider.shutdown()
+        _provider = None
+
+
+def _make_exporter(name: str):
+    if name == "otlp":
+        # Адрес коллектора — стандартные OTEL_EXPORTER_OTLP_(TRACES_)ENDPOINT, по умолчанию localhost:4318
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        return OTLPSpanExporter()
+    if name in ("file", "console"):
+        from opentelemetry.sdk.trace.export import ConsoleSpanExporter
+        if name == "console":
+            return ConsoleSpanExporter()
+        # JSON lines: один span на строку, для офлайн-анализа (jq, pandas)
+        out = open(settings.TRACING_FILE, "a", encoding="utf-8")
+        return ConsoleSpanExporter(out=out, formatter=lambda s: s.to_json(indent=None) + "\n")
+    raise ValueError(f"Unknown TRACING_EXPORTER {name!r}, expected 'otlp', 'file' or 'console'")
+
+
+def _instrument(app, engine) -> None:
+    try:
+        from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
+        FastAPIInstrumentor.instrument_app(app, excluded_urls=f"/health,{settings.METRICS_PATH}")
+    except ImportError:
+        logger.warning("opentelemetry-instrumentation-fastapi is not installed, HTTP requests are not traced")
+    try:
+        from opentelemetry.instrumentation.sqlalchemy import SQLAlchemyInstrumentor
+        SQLAlchemyInstrumentor().instrument(engine=engine)
+    except ImportError:
+        logger.warning("opentelemetry-instrumentation-sqlalchemy is not installed, DB queries are not traced")
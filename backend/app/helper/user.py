@@ -1,15 +1,22 @@
-from fastapi import APIRouter, HTTPException, Depends, status
+import asyncio
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from fastapi import APIRouter, HTTPException, Depends, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel, EmailStr, HttpUrl
 from sqlmodel import Session
-from typing import Annotated
+from typing import Annotated, Optional
 
 from app.services.jwt import JwtService
 from app.services.password import PasswordService
 from app.database import get_db
 from app.repository.user_repository import UserRepository
+from app.core.cache import user_cache
+from app.core.config import settings
 from app.models.user import User
 
+logger = logging.getLogger(__name__)
 
 security = HTTPBearer()
 
@@ -26,45 +33,78 @@ def get_user_repository(session: Session = Depends(get_db)) -> UserRepository:
 def get_security()->HTTPAuthorizationCredentials:
     return HTTPBearer()
 
-def get_current_user(
-    jwt_service: JwtService = Depends(get_jwt_service),
+@dataclass(frozen=True)
+class UserIdentity:
+    """Snapshot of the current user kept in the in-process user cache"""
+    id: int
+    email: str
+    first_name: Optional[str]
+    last_name: Optional[str]
+    is_active: bool
+    is_verified: bool
+    created_at: datetime
+
+    @classmethod
+    def from_user(cls, user: User) -> "UserIdentity":
+        return cls(
+            id=user.id,
+            email=user.email,
+            first_name=user.first_name,
+            last_name=user.last_name,
+            is_active=user.is_active,
+            is_verified=user.is_verified,
+            created_at=user.created_at,
+        )
+
+
+async def get_request_user(
+    request: Request,
     user_repo: UserRepository = Depends(get_user_repository),
-) -> User:
-    """Get current user from JWT token"""
-    try:
-        payload = jwt_service.decode_jwt(security.credentials)
-        email = payload.get("email")
-        if not email:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid token payload",
-                headers={"WWW-Authenticate": "Bearer"}
-            )
-        
-        user = user_repo.get_user_by_email(email)
+) -> UserIdentity:
+    """
+    Current user from the token the middleware already verified.
+    Served from a short-TTL cache; the DB is queried only on a miss.
+    """
+    user_id = getattr(request.state, "user_id", None)
+    email = getattr(request.state, "user_email", None)
+    # Старые токены без user_id — ищем по email
+    key = ("id", user_id) if user_id is not None else ("email", email)
+
+    identity = user_cache.get(key)
+    if identity is None:
+        # Синхронная сессия: запрос к БД — в потоке, попадание в кэш обходится без него
+        if user_id is not None:
+            user = await asyncio.to_thread(user_repo.get_user_by_id, user_id)
+        else:
+            user = await asyncio.to_thread(user_repo.get_user_by_email, email)
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="User not found",
                 headers={"WWW-Authenticate": "Bearer"}
             )
-        
-        if not user.is_active:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Account is deactivated"
-            )
-        
-        return user
-    except HTTPException:
-        raise
-    except Exception as e:
-        print("error",e)
+        identity = UserIdentity.from_user(user)
+        user_cache.set(key, identity)
+
+    if not identity.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Account is deactivated"
+        )
+    return identity
+
+
+RequestUser = Annotated[UserIdentity, Depends(get_request_user)]
+
+
+async def get_admin_user(user: RequestUser) -> UserIdentity:
+    """Current user, if listed in ADMIN_EMAILS (diagnostic endpoints)."""
+    if user.email.lower() not in settings.ADMIN_EMAILS:
         raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid or expired token",
-            headers={"WWW-Authenticate": "Bearer"}
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
         )
+    return user
 
 
-CurrentUser = Annotated[User, Depends(get_current_user)]
\ No newline at end of file
+AdminUser = Annotated[UserIdentity, Depends(get_admin_user)]
@@ -1,10 +1,21 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 from app.api.v1.api import api_router
 from app.core.config import settings
 from app.middleware.auth import AuthMiddleware
-from app.database import init_db, check_db_connection
+from app.middleware.profiling import ProfilingMiddleware
+from app.database import engine, init_db, check_db_connection
+from app.core.metrics import register_db_pool_collector
+from app.core.tracing import setup_tracing, shutdown_tracing
+from app.core.loop_monitor import get_loop_monitor
+from app.core.preload import start_preload, stop_preload
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from app.services.password import shutdown_hash_executor
+from app.services.letter_writer import get_letter_writer
+from app.services.batch import get_batch_registry
+from app.storage.repository.qdrant import close_async_qdrant_client, ensure_collections
+from app.services.embeddings import get_embedder
 import logging
 
 logging.basicConfig(level=logging.INFO)
@@ -28,11 +39,36 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.error(f"Failed to initialize database: {e}")
         raise
+
+    # Схема Qdrant: коллекции, payload-индексы и проверка размерности эмбеддера
+    if settings.QDRANT_BOOTSTRAP_ON_STARTUP:
+        await ensure_collections(get_embedder().dimensions)
+        logger.info("Qdrant collections are ready")
+
+    # Write-behind сохранение стриминговых писем
+    letter_writer = get_letter_writer()
+    letter_writer.start()
+
+    # Библиотеки пути генерации письма — в фоновом потоке, процесс уже принимает запросы
+    start_preload(settings.PRELOAD_MODULES)
+
+    # Диагностика блокировок event loop (opt-in)
+    if settings.LOOP_MONITOR_ENABLED:
+        get_loop_monitor().start()
     
     yield
     
     # Shutdown
     logger.info("Shutting down application...")
+    await stop_preload()
+    if settings.LOOP_MONITOR_ENABLED:
+        await get_loop_monitor().stop()
+    # Незавершённые батчи отменяем и дожидаемся: элементы помечаются cancelled, сессии БД закрываются
+    await get_batch_registry().cancel_all()
+    await letter_writer.stop()
+    shutdown_hash_executor()
+    await close_async_qdrant_client()
+    shutdown_tracing()
 
 
 app = FastAPI(
@@ -42,6 +78,8 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Профилирование — внутри AuthMiddleware: проверка админа берёт пользователя из scope["state"]
+app.add_middleware(ProfilingMiddleware)
 app.add_middleware(AuthMiddleware)
 
 # CORS middleware
@@ -57,6 +95,18 @@ app.add_middleware(
 # Include API router
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
+# OpenTelemetry: HTTP-запросы, SQL и этапы генерации (TRACING_ENABLED)
+setup_tracing(app, engine)
+
+if settings.METRICS_ENABLED:
+    register_db_pool_collector(engine)
+
+    # Вне /api/v1 — без авторизации; путь внутри /api/v1 нужно добавить в EXTRA_UNPROTECTED_ROUTES
+    @app.get(settings.METRICS_PATH, include_in_schema=False)
+    async def metrics():
+        return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
 @app.get("/health")
 async def health_check():
     return {"status": "healthy", "message": "API is running"}
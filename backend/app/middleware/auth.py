@@ -1,44 +1,92 @@
-from fastapi import Request
+from typing import Optional
+
 from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.types import ASGIApp, Receive, Scope, Send
 
+from app.core.cache import TTLCache
+from app.core.config import settings
 from app.services.jwt import JwtService
 
 jwt_service = JwtService()
-UNPROTECTED_ROUTES=[
+UNPROTECTED_ROUTES = frozenset({
     "/health", "/docs", "/redoc",
     "/openapi.json", "/api/v1/auth/register",
     "/api/v1/auth/login",
     # "/api/v1/letter/async-test"
-]
-class AuthMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
+    *settings.EXTRA_UNPROTECTED_ROUTES,
+})
+PROTECTED_PREFIX = f"{settings.API_V1_STR}/"
+
+# Проверенные токены: повторная проверка подписи HS256 на каждый запрос не нужна
+token_cache = TTLCache(maxsize=settings.AUTH_TOKEN_CACHE_SIZE, ttl=settings.AUTH_TOKEN_CACHE_TTL, name="auth_token")
+
+
+class AuthMiddleware:
+    """
+    Pure ASGI auth middleware: checks the Bearer token for API routes and puts
+    the token payload on request.state. Responses (including SSE streams) are
+    passed through untouched.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
         # Пропускаем health check и некоторые другие эндпоинты
-        if request.url.path in UNPROTECTED_ROUTES:
-            return await call_next(request)
+        path = scope["path"]
+        if path in UNPROTECTED_ROUTES or not path.startswith(PROTECTED_PREFIX):
+            await self.app(scope, receive, send)
+            return
 
         # Проверяем авторизацию для API эндпоинтов
-        if request.url.path.startswith("/api/v1/"):
-            auth_header = request.headers.get("Authorization")
-
-            if not auth_header or not auth_header.startswith("Bearer "):
-                return JSONResponse(
-                    status_code=401,
-                    content={"detail": "Authorization header missing or invalid"}
-                )
-
-            token = auth_header.split(" ")[1]
-
-            try:
-                # Декодируем токен (здесь можно добавить дополнительную логику)
-                payload = jwt_service.decode_jwt(token)
-                # Можно добавить payload в request.state для использования в эндпоинтах
-                request.state.user_email = payload.get("email")
-            except Exception as e:
-                return JSONResponse(
-                    status_code=401,
-                    content={"detail": "Invalid or expired token"}
-                )
-
-        response = await call_next(request)
-        return response
\ No newline at end of file
+        token = _get_bearer_token(scope)
+        if token is None:
+            response = JSONResponse(
+                status_code=401,
+                content={"detail": "Authorization header missing or invalid"}
+            )
+            await response(scope, receive, send)
+            return
+
+        payload = _verify_token(token)
+        if payload is None:
+            response = JSONResponse(
+                status_code=401,
+                content={"detail": "Invalid or expired token"}
+            )
+            await response(scope, receive, send)
+            return
+
+        state = scope.setdefault("state", {})
+        state["user_email"] = payload.get("email")
+        state["user_id"] = payload.get("user_id")
+        await self.app(scope, receive, send)
+
+
+def _get_bearer_token(scope: Scope) -> Optional[str]:
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            auth_header = value.decode("latin-1")
+            if not auth_header.startswith("Bearer "):
+                return None
+            return auth_header.split(" ")[1] or None
+    return None
+
+
+def _verify_token(token: str) -> Optional[dict]:
+    payload = token_cache.get(token)
+    if payload is not None:
+        return payload
+    try:
+        payload = jwt_service.decode_jwt(token)
+    except Exception:
+        return None
+    if not payload:
+        return None
+    # Кэшируем не дольше, чем живёт сам токен
+    token_cache.set(token, payload, expires_at=payload.get("exp"))
+    return payload
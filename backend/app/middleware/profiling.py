@@ -0,0 +1,85 @@
+import asyncio
+import logging
+import random
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.profiling import Profiler, new_profile_id, profiling_available, save_profile
+
+logger = logging.getLogger(__name__)
+
+PROFILE_ID_HEADER = b"x-profile-id"
+# Ссылки на задачи сохранения, чтобы их не собрал GC до завершения
+_pending_saves: set[asyncio.Task] = set()
+
+
+class ProfilingMiddleware:
+    """
+    Pure ASGI middleware: profiles selected API requests with pyinstrument
+    from the first byte to the end of the response body, so SSE streams are
+    profiled through the whole generation. Must run inside AuthMiddleware —
+    the admin check uses the user it puts into scope["state"].
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self.header = settings.PROFILE_HEADER.lower().encode("latin-1")
+        if settings.PROFILING_ENABLED and not profiling_available():
+            logger.warning("PROFILING_ENABLED is set, but pyinstrument is not installed (pip install '.[profiling]')")
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self._should_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = new_profile_id()
+        status_code = None
+
+        async def send_with_id(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message["headers"] = [*message.get("headers", []), (PROFILE_ID_HEADER, profile_id.encode("latin-1"))]
+            await send(message)
+
+        profiler = Profiler(interval=settings.PROFILE_INTERVAL, async_mode="enabled")
+        started = time.monotonic()
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            session = profiler.stop()
+            meta = {
+                "method": scope["method"],
+                "path": scope["path"],
+                "status": status_code,
+                "duration_ms": round((time.monotonic() - started) * 1000, 1),
+                "user": scope.get("state", {}).get("user_email"),
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            }
+            # Рендер HTML/speedscope — заметная CPU-работа, не в event loop
+            task = asyncio.create_task(asyncio.to_thread(save_profile, profile_id, session, meta))
+            _pending_saves.add(task)
+            task.add_done_callback(_on_saved)
+
+    def _should_profile(self, scope: Scope) -> bool:
+        if not settings.PROFILING_ENABLED or not profiling_available():
+            return False
+        path = scope["path"]
+        if not path.startswith(f"{settings.API_V1_STR}/") or path.startswith(f"{settings.API_V1_STR}/admin/"):
+            return False
+        user = scope.get("state", {}).get("user_email")
+        if user and user.lower() in settings.ADMIN_EMAILS and self._has_header(scope):
+            return True
+        return settings.PROFILE_SAMPLE_RATE > 0 and random.random() < settings.PROFILE_SAMPLE_RATE
+
+    def _has_header(self, scope: Scope) -> bool:
+        return any(name == self.header and value not in (b"", b"0") for name, value in scope["headers"])
+
+
+def _on_saved(task: asyncio.Task) -> None:
+    _pending_saves.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("Failed to save request profile", exc_info=task.exception())
@@ -1,12 +1,17 @@
 # models/cv.py
 from datetime import datetime
 from typing import Optional, List
+from sqlalchemy import Index
 from sqlmodel import Field, Relationship, SQLModel
 
 
 class CV(SQLModel, table=True):
     """CV/Resume model"""
     __tablename__ = "cvs"
+    # Keyset pagination of a user's CVs: WHERE user_id = ? AND (created_at, id) < (?, ?)
+    __table_args__ = (
+        Index("ix_cvs_user_id_created_at_id", "user_id", "created_at", "id"),
+    )
 
     id: Optional[int] = Field(default=None, primary_key=True)
     user_id: int = Field(foreign_key="users.id", nullable=False, index=True)
@@ -17,6 +22,12 @@ class CV(SQLModel, table=True):
     file_size: int = Field(nullable=False)
     content_type: str = Field(nullable=False, max_length=100)
     status: str = Field(default="uploaded", max_length=50)  # uploaded, processed, error
+    # SHA-256 of the uploaded file: identical re-uploads reuse existing vectors
+    content_hash: Optional[str] = Field(default=None, max_length=64, index=True)
+
+    # Compact profile (CVDigest JSON) and hash of the text it was built from
+    digest: Optional[str] = Field(default=None)
+    digest_hash: Optional[str] = Field(default=None, max_length=64)
 
     # Metadata
     upload_ip: Optional[str] = Field(default=None, max_length=45)
@@ -1,12 +1,18 @@
 # models/letter.py
 from datetime import datetime
 from typing import Optional
+from sqlalchemy import Index
 from sqlmodel import Field, Relationship, SQLModel
 
 
 class Letter(SQLModel, table=True):
     """Generated cover letter model"""
     __tablename__ = "letters"
+    # History pages per CV: WHERE cv_id = ? AND (created_at, id) < (?, ?).
+    # GIN-индекс полнотекстового поиска — выражение, создаётся только миграцией (PostgreSQL)
+    __table_args__ = (
+        Index("ix_letters_cv_id_created_at_id", "cv_id", "created_at", "id"),
+    )
 
     id: Optional[int] = Field(default=None, primary_key=True)
     cv_id: int = Field(foreign_key="cvs.id", nullable=False, index=True)
@@ -24,6 +30,9 @@ class Letter(SQLModel, table=True):
 
     # Generation metadata
     generation_time: Optional[int] = Field(default=None)  # Time in seconds
+    time_to_first_token_ms: Optional[int] = Field(default=None)
+    prompt_tokens: Optional[int] = Field(default=None)
+    completion_tokens: Optional[int] = Field(default=None)
     model_used: str = Field(default="gpt-4o", max_length=100)
     status: str = Field(default="generated", max_length=50)  # generated, error
 
@@ -1,7 +1,10 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from datetime import datetime
+from sqlalchemy import func, select, tuple_
 from typing import Optional
 
+from app.helper.pagination import Cursor
+from app.schemas.cv import CVListItem
 from app.schemas.general import Option
 from ..models.cv import CV
 
@@ -13,8 +16,9 @@ class CVRepository:
 
     async def create_cv(self, user_id: int, source_id: int, filename: str, original_filename: str,
                        file_size: int, content_type: str, file_path: Optional[str] = None,
-                       upload_ip: Optional[str] = None, user_agent: Optional[str] = None) -> CV:
-        """Create a new CV record"""
+                       upload_ip: Optional[str] = None, user_agent: Optional[str] = None,
+                       content_hash: Optional[str] = None) -> CV:
+        """Create a new CV record (flushed to get an id; the caller commits)"""
         cv = CV(
             user_id=user_id,
             source_id=source_id,
@@ -23,12 +27,12 @@ class CVRepository:
             file_path=file_path,
             file_size=file_size,
             content_type=content_type,
+            content_hash=content_hash,
             upload_ip=upload_ip,
             user_agent=user_agent
         )
         self.session.add(cv)
-        self.session.commit()
-        self.session.refresh(cv)
+        self.session.flush()
         return cv
     async def update_cv(self, cv: CV,data: dict) -> CV:
         """Update an existing CV record"""
@@ -41,33 +45,65 @@ class CVRepository:
         result = self.session.execute(stmt)
         return result.scalar_one_or_none()
 
+    async def get_cv_by_content_hash(self, user_id: int, content_hash: str) -> Optional[CV]:
+        """Get the latest CV of a user uploaded from an identical file"""
+        stmt = (
+            select(CV)
+            .where(CV.user_id == user_id, CV.content_hash == content_hash)
+            .order_by(CV.created_at.desc())
+            .limit(1)
+        )
+        result = self.session.execute(stmt)
+        return result.scalar_one_or_none()
+
     async def get_cv_by_id(self, cv_id: int) -> Optional[CV]:
         """Get CV by ID"""
         stmt = select(CV).where(CV.id == cv_id)
         result = self.session.execute(stmt)
         return result.scalar_one_or_none()
 
-    async def get_cvs_options_by_user_id(self, user_id: int) -> list[Option]:
-        """Get all CV options for a user"""
-        stmt = select(CV.source_id, CV.filename).where(CV.user_id == user_id)
-        result = self.session.execute(stmt)
-        
-        return [
-            {"name": row.filename, "value": row.source_id}
-            for row in result.all()
-        ]
-    async def get_cvs_by_user_id(self, user_id: int) -> list[CV]:
-        """Get all CVs for a user"""
-        stmt = select(CV).where(CV.user_id == user_id)
-        result = self.session.execute(stmt)
-        return list(result.scalars().all())
+    async def get_cvs_options_by_user_id(self, user_id: int, limit: int,
+                                         after: Optional[Cursor] = None) -> tuple[list[Option], Optional[Cursor]]:
+        """Get a page of CV options for a user, newest first"""
+        stmt = self._user_page_stmt(select(CV.id, CV.created_at, CV.source_id, CV.filename), user_id, limit, after)
+        rows, next_cursor = self._split_page(self.session.execute(stmt).all(), limit)
+        return [{"name": row.filename, "value": row.source_id} for row in rows], next_cursor
+
+    async def get_cvs_by_user_id(self, user_id: int, limit: int,
+                                 after: Optional[Cursor] = None) -> tuple[list[CVListItem], Optional[Cursor]]:
+        """Get a page of CVs for a user, newest first (listing columns only)"""
+        columns = [getattr(CV, name) for name in CVListItem.model_fields]
+        stmt = self._user_page_stmt(select(*columns), user_id, limit, after)
+        rows, next_cursor = self._split_page(self.session.execute(stmt).all(), limit)
+        return [CVListItem.model_validate(row._asdict()) for row in rows], next_cursor
+
+    async def get_cvs_version(self, user_id: int) -> tuple[int, Optional[datetime]]:
+        """Count and last update of a user's CVs: changes whenever any listing page may change"""
+        stmt = select(func.count(CV.id), func.max(CV.updated_at)).where(CV.user_id == user_id)
+        count, last_updated = self.session.execute(stmt).one()
+        return count, last_updated
+
+    @staticmethod
+    def _user_page_stmt(stmt, user_id: int, limit: int, after: Optional[Cursor]):
+        stmt = stmt.where(CV.user_id == user_id)
+        if after is not None:
+            stmt = stmt.where(tuple_(CV.created_at, CV.id) < tuple_(*after))
+        # +1 строка — чтобы понять, есть ли следующая страница
+        return stmt.order_by(CV.created_at.desc(), CV.id.desc()).limit(limit + 1)
+
+    @staticmethod
+    def _split_page(rows: list, limit: int) -> tuple[list, Optional[Cursor]]:
+        if len(rows) <= limit:
+            return rows, None
+        rows = rows[:limit]
+        return rows, (rows[-1].created_at, rows[-1].id)
 
     async def update_cv_status(self, cv_id: int, status: str) -> bool:
         """Update CV status"""
         cv = await self.get_cv_by_id(cv_id)
         if cv:
             cv.status = status
-            await self.session.commit()
+            self.session.commit()
             return True
         return False
     def delete_cv(self, cv: CV):
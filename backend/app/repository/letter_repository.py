@@ -1,8 +1,19 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import func, literal_column, or_, select, tuple_
 from typing import List, Optional
+
+from app.helper.pagination import Cursor
+from app.schemas.letter import LetterDetail, LetterSummary
+from ..models.cv import CV
 from ..models.letter import Letter
 
+# Должно совпадать с выражением GIN-индекса ix_letters_search (миграция), иначе индекс не используется
+LETTER_SEARCH_DOCUMENT = literal_column(
+    "to_tsvector('simple'::regconfig, "
+    "coalesce(letters.job_title, '') || ' ' || coalesce(letters.company_name, '') || ' ' || letters.letter_content)"
+)
+LETTER_PREVIEW_LENGTH = 200
+
 
 class LetterRepository:
     def __init__(self, session: AsyncSession):
@@ -12,7 +23,9 @@ class LetterRepository:
                            letter_content: str, job_description: Optional[str] = None,
                            company_name: Optional[str] = None, job_url: Optional[str] = None,
                            job_requirements: Optional[str] = None, generation_time: Optional[int] = None,
-                           model_used: str = "gpt-4o", status: str = "generated") -> Letter:
+                           model_used: str = "gpt-4o", status: str = "generated",
+                           time_to_first_token_ms: Optional[int] = None, prompt_tokens: Optional[int] = None,
+                           completion_tokens: Optional[int] = None) -> Letter:
         """Create a new letter record"""
         letter = Letter(
             cv_id=cv_id,
@@ -24,28 +37,84 @@ class LetterRepository:
             letter_content=letter_content,
             job_requirements=job_requirements,
             generation_time=generation_time,
+            time_to_first_token_ms=time_to_first_token_ms,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
             model_used=model_used,
             status=status
         )
         self.session.add(letter)
-        await self.session.commit()
-        await self.session.refresh(letter)
+        self.session.commit()
+        self.session.refresh(letter)
         return letter
 
     async def get_letters_by_source_id(self, source_id: int) -> List[Letter]:
         """Get all letters for a source_id"""
         stmt = select(Letter).where(Letter.source_id == source_id)
-        result = await self.session.execute(stmt)
+        result = self.session.execute(stmt)
         return list(result.scalars().all())
 
     async def get_letter_by_id(self, letter_id: int) -> Optional[Letter]:
         """Get letter by ID"""
         stmt = select(Letter).where(Letter.id == letter_id)
-        result = await self.session.execute(stmt)
+        result = self.session.execute(stmt)
         return result.scalar_one_or_none()
 
     async def get_letters_by_cv_id(self, cv_id: int) -> List[Letter]:
         """Get all letters for a CV"""
         stmt = select(Letter).where(Letter.cv_id == cv_id)
-        result = await self.session.execute(stmt)
+        result = self.session.execute(stmt)
         return list(result.scalars().all())
+
+    async def get_letter_summaries(self, user_id: int, limit: int, after: Optional[Cursor] = None,
+                                   cv_id: Optional[int] = None,
+                                   query: Optional[str] = None) -> tuple[list[LetterSummary], Optional[Cursor]]:
+        """
+        Get a page of a user's letters, newest first, without full content.
+        query — full-text search over job title, company and letter text.
+        """
+        stmt = (
+            select(
+                Letter.id, Letter.cv_id, Letter.source_id, Letter.job_title, Letter.company_name,
+                Letter.job_url, Letter.status, Letter.model_used, Letter.created_at,
+                func.substr(Letter.letter_content, 1, LETTER_PREVIEW_LENGTH).label("preview"),
+            )
+            .join(CV, CV.id == Letter.cv_id)
+            .where(CV.user_id == user_id)
+        )
+        if cv_id is not None:
+            stmt = stmt.where(Letter.cv_id == cv_id)
+        if query:
+            stmt = stmt.where(self._search_clause(query))
+        if after is not None:
+            stmt = stmt.where(tuple_(Letter.created_at, Letter.id) < tuple_(*after))
+        stmt = stmt.order_by(Letter.created_at.desc(), Letter.id.desc()).limit(limit + 1)
+
+        rows = self.session.execute(stmt).all()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = (rows[-1].created_at, rows[-1].id)
+        return [LetterSummary.model_validate(row._asdict()) for row in rows], next_cursor
+
+    async def get_user_letter(self, user_id: int, letter_id: int) -> Optional[LetterDetail]:
+        """Get full letter if it belongs to one of the user's CVs"""
+        columns = [getattr(Letter, name) for name in LetterDetail.model_fields]
+        stmt = (
+            select(*columns)
+            .join(CV, CV.id == Letter.cv_id)
+            .where(Letter.id == letter_id, CV.user_id == user_id)
+        )
+        row = self.session.execute(stmt).one_or_none()
+        return LetterDetail.model_validate(row._asdict()) if row else None
+
+    def _search_clause(self, query: str):
+        if self.session.get_bind().dialect.name == "postgresql":
+            return LETTER_SEARCH_DOCUMENT.op("@@")(func.websearch_to_tsquery(literal_column("'simple'::regconfig"), query))
+        # Без PostgreSQL (SQLite в бенчмарках) — простой поиск подстроки
+        pattern = f"%{query}%"
+        return or_(
+            Letter.job_title.ilike(pattern),
+            Letter.company_name.ilike(pattern),
+            Letter.letter_content.ilike(pattern),
+        )
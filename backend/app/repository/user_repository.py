@@ -3,6 +3,7 @@ from sqlmodel import Session, select
 from typing import Optional
 from datetime import datetime
 
+from app.core.cache import invalidate_user
 from app.models.user import User
 
 
@@ -42,6 +43,7 @@ class UserRepository:
         """Update user fields"""
         user = self.get_user_by_id(user_id)
         if user:
+            previous_email = user.email
             for key, value in kwargs.items():
                 if hasattr(user, key):
                     setattr(user, key, value)
@@ -52,6 +54,7 @@ class UserRepository:
             self.session.add(user)
             self.session.commit()
             self.session.refresh(user)
+            invalidate_user(user.id, previous_email, user.email)
             return user
         return None
 
@@ -61,6 +64,7 @@ class UserRepository:
         if user:
             self.session.delete(user)
             self.session.commit()
+            invalidate_user(user_id, user.email)
             return True
         return False
 
@@ -0,0 +1,51 @@
+from datetime import datetime
+from typing import Optional
+from pydantic import BaseModel, Field
+
+
+class CVRole(BaseModel):
+    """Position from the CV with measurable achievements"""
+    title: str = Field(..., description="Job title")
+    company: Optional[str] = Field(None, description="Company name")
+    period: Optional[str] = Field(None, description="Employment period, e.g. '2021–2024'")
+    achievements: list[str] = Field(default_factory=list, description="Achievements, with metrics where present")
+
+
+class CVDigest(BaseModel):
+    """Compact CV profile built once at ingestion and used as resume context"""
+    summary: Optional[str] = Field(None, description="One or two sentence profile summary")
+    skills: list[str] = Field(default_factory=list, description="Professional skills")
+    technologies: list[str] = Field(default_factory=list, description="Languages, frameworks, tools")
+    roles: list[CVRole] = Field(default_factory=list, description="Work experience, most recent first")
+
+    def to_context(self) -> str:
+        """Renders the digest as prompt context."""
+        lines = []
+        if self.summary:
+            lines.append(self.summary)
+        if self.skills:
+            lines.append("Навыки: " + ", ".join(self.skills))
+        if self.technologies:
+            lines.append("Технологии: " + ", ".join(self.technologies))
+        if self.roles:
+            lines.append("Опыт:")
+            for role in self.roles:
+                header = ", ".join(part for part in (role.title, role.company) if part)
+                if role.period:
+                    header += f" ({role.period})"
+                lines.append(f"- {header}")
+                lines.extend(f"  • {achievement}" for achievement in role.achievements)
+        return "\n".join(lines)
+
+
+class CVListItem(BaseModel):
+    """CV row as shown in listings (no file paths, digests or client metadata)"""
+    id: int
+    source_id: str
+    filename: str
+    original_filename: str
+    file_size: int
+    content_type: str
+    status: str
+    created_at: datetime
+    updated_at: datetime
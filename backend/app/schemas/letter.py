@@ -1,7 +1,10 @@
-from pydantic import BaseModel, HttpUrl, Field
+from datetime import datetime
+from pydantic import BaseModel, HttpUrl, Field, model_validator
 from typing import Optional
 from fastapi import UploadFile
 
+from app.core.config import settings
+
 
 
 
@@ -54,4 +57,57 @@ class TranslateLetterRequest(BaseModel):
         min_length=2,
         max_length=50,
         description="Target language name in English, e.g. 'Russian', 'German'",
-    )
\ No newline at end of file
+    )
+
+
+class BatchLetterItem(BaseModel):
+    """One job posting in a batch: either a URL or a title with description"""
+    url: Optional[HttpUrl] = Field(None, description="Job posting URL")
+    name: Optional[str] = Field(None, min_length=1, max_length=100, description="Job title")
+    description: Optional[str] = Field(None, min_length=1, description="Job description")
+
+    @model_validator(mode="after")
+    def check_source(self):
+        if self.url is None and not (self.name and self.description):
+            raise ValueError("Either url or name and description must be provided")
+        # letters.job_url — VARCHAR(500)
+        if self.url is not None and len(str(self.url)) > 500:
+            raise ValueError("Job posting URL must be at most 500 characters")
+        return self
+
+
+class BatchLetterRequest(BaseModel):
+    """Request schema for generating letters for many job postings with one CV"""
+    source_id: int = Field(..., description="Source ID of the CV in the database")
+    items: list[BatchLetterItem] = Field(..., min_length=1, max_length=settings.LETTER_BATCH_MAX_ITEMS)
+    target_language: Optional[str] = Field(None, max_length=50, description="Target language, e.g. 'Russian'")
+
+
+class LetterSummary(BaseModel):
+    """Letter as shown in history listings: metadata and a short preview"""
+    id: int
+    cv_id: int
+    source_id: int
+    job_title: str
+    company_name: Optional[str] = None
+    job_url: Optional[str] = None
+    status: str
+    model_used: str
+    preview: str
+    created_at: datetime
+
+
+class LetterDetail(BaseModel):
+    """Full letter, fetched on demand from the history"""
+    id: int
+    cv_id: int
+    source_id: int
+    job_title: str
+    company_name: Optional[str] = None
+    job_url: Optional[str] = None
+    job_description: Optional[str] = None
+    letter_content: str
+    status: str
+    model_used: str
+    generation_time: Optional[int] = None
+    created_at: datetime
@@ -0,0 +1,120 @@
+import asyncio
+import time
+from typing import Optional
+from uuid import uuid4
+
+# Как долго держим завершённые батчи в памяти, чтобы клиент успел забрать результат
+_FINISHED_RETENTION_SECONDS = 60 * 60
+
+
+class BatchItem:
+    """Одна вакансия в батче: URL или название + описание."""
+
+    def __init__(self, index: int, url: Optional[str] = None,
+                 name: Optional[str] = None, description: Optional[str] = None):
+        self.index = index
+        self.url = url
+        self.name = name
+        self.description = description
+        self.status = "pending"  # pending, extracting, queued, generating, done, error, cancelled
+        self.job_title: Optional[str] = name
+        self.letter_id: Optional[int] = None
+        self.letter_content: Optional[str] = None
+        self.error: Optional[str] = None
+
+    def to_dict(self) -> dict:
+        return {
+            "index": self.index,
+            "status": self.status,
+            "job_title": self.job_title,
+            "job_url": self.url,
+            "letter_id": self.letter_id,
+            "letter_content": self.letter_content,
+            "error": self.error,
+        }
+
+
+class BatchJob:
+    """Пакетная генерация писем по нескольким вакансиям для одного CV."""
+
+    def __init__(self, owner: str, user_id: int, source_id: int, items: list[BatchItem],
+                 target_language: Optional[str] = None):
+        self.id = uuid4().hex
+        self.owner = owner
+        self.user_id = user_id
+        self.source_id = source_id
+        self.items = items
+        self.target_language = target_language
+        self.status = "pending"  # pending, running, done, error, cancelled
+        self.error: Optional[str] = None
+        self.task: Optional[asyncio.Task] = None
+        self.finished_at: Optional[float] = None
+
+    @property
+    def completed(self) -> int:
+        return sum(1 for item in self.items if item.status == "done")
+
+    @property
+    def failed(self) -> int:
+        return sum(1 for item in self.items if item.status == "error")
+
+    def finish(self, status: str, error: Optional[str] = None) -> None:
+        if status == "cancelled":
+            for item in self.items:
+                if item.status not in ("done", "error"):
+                    item.status = "cancelled"
+        self.status = status
+        self.error = error
+        self.finished_at = time.monotonic()
+
+    def to_dict(self) -> dict:
+        return {
+            "batch_id": self.id,
+            "source_id": self.source_id,
+            "status": self.status,
+            "error": self.error,
+            "total": len(self.items),
+            "completed": self.completed,
+            "failed": self.failed,
+            "items": [item.to_dict() for item in self.items],
+        }
+
+
+class BatchRegistry:
+    """In-process registry of batch jobs (per worker)."""
+
+    def __init__(self):
+        self._jobs: dict[str, BatchJob] = {}
+
+    def add(self, job: BatchJob) -> BatchJob:
+        self._purge_finished()
+        self._jobs[job.id] = job
+        return job
+
+    def get(self, batch_id: str) -> Optional[BatchJob]:
+        return self._jobs.get(batch_id)
+
+    async def cancel_all(self) -> None:
+        """Cancels unfinished batches and waits for them (shutdown): their sessions get closed."""
+        tasks = [job.task for job in self._jobs.values() if job.task is not None and not job.task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _purge_finished(self) -> None:
+        now = time.monotonic()
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished_at is not None and now - job.finished_at > _FINISHED_RETENTION_SECONDS
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+
+_batch_registry = None
+
+def get_batch_registry() -> BatchRegistry:
+    global _batch_registry
+    if _batch_registry is None:
+        _batch_registry = BatchRegistry()
+    return _batch_registry
@@ -0,0 +1,163 @@
+import re
+from dataclasses import dataclass
+
+from app.core.config import settings
+
+# Разделы резюме. "summary" — всё до первого распознанного заголовка
+SUMMARY = "summary"
+EXPERIENCE = "experience"
+PROJECTS = "projects"
+SKILLS = "skills"
+EDUCATION = "education"
+
+# Заголовки разделов (EN/RU); строка-заголовок должна совпасть целиком
+_SECTION_HEADINGS = {
+    EXPERIENCE: (
+        r"(work|professional|relevant)?\s*experience", r"employment(\s+history)?", r"work\s+history", r"career",
+        r"опыт(\s+работы)?", r"профессиональный\s+опыт", r"трудовая\s+деятельность", r"места\s+работы",
+    ),
+    PROJECTS: (
+        r"(key|selected|personal|pet|side)?\s*projects", r"portfolio",
+        r"проекты", r"(ключевые|личные|пет)[\s-]*проекты", r"портфолио",
+    ),
+    SKILLS: (
+        r"(technical|key|core|hard|soft)?\s*skills(\s*(&|and)\s*\w+)?", r"tech(nology)?\s+stack", r"technologies",
+        r"competencies", r"навыки", r"(ключевые|профессиональные|технические)\s+навыки", r"технологии",
+        r"стек(\s+технологий)?", r"компетенции",
+    ),
+    EDUCATION: (
+        r"education", r"courses", r"certifications?", r"training",
+        r"образование", r"курсы", r"сертификаты", r"повышение\s+квалификации",
+    ),
+    SUMMARY: (
+        r"summary", r"(professional\s+)?profile", r"about(\s+me)?", r"objective",
+        r"о\s+себе", r"обо\s+мне", r"цель", r"резюме",
+    ),
+}
+
+_HEADING_PATTERNS = [
+    (section, re.compile(rf"^(?:{'|'.join(patterns)})$", re.IGNORECASE))
+    for section, patterns in _SECTION_HEADINGS.items()
+]
+
+# Маркеры списков, нумерация и двоеточие вокруг заголовка: "• SKILLS:", "2. Опыт работы"
+_HEADING_NOISE = re.compile(r"^[\s#*•\-–—\d.)]+|[\s:：.\-–—]+$")
+_MAX_HEADING_LENGTH = 48
+
+
+SECTION = "section"
+SENTENCE = "sentence"
+
+
+@dataclass
+class Chunk:
+    text: str
+    # None у стратегии sentence: разделы не распознаются
+    section: str | None
+
+
+@dataclass(frozen=True)
+class ChunkingConfig:
+    """Настройки чанкинга коллекции: стратегия, размер и перекрытие чанка (в токенах)."""
+    strategy: str = SECTION
+    chunk_size: int = 400
+    chunk_overlap: int = 40
+
+    @classmethod
+    def parse(cls, spec: str) -> "ChunkingConfig":
+        """'section:400:40' -> ChunkingConfig(section, 400, 40); пропущенные поля — по умолчанию."""
+        parts = [part.strip() for part in spec.split(":")]
+        defaults = cls()
+        try:
+            config = cls(
+                strategy=parts[0] or defaults.strategy,
+                chunk_size=int(parts[1]) if len(parts) > 1 and parts[1] else defaults.chunk_size,
+                chunk_overlap=int(parts[2]) if len(parts) > 2 and parts[2] else defaults.chunk_overlap,
+            )
+        except ValueError:
+            raise ValueError(f"Invalid chunking spec {spec!r}, expected 'strategy:size:overlap'")
+        if config.strategy not in (SECTION, SENTENCE):
+            raise ValueError(f"Unknown chunking strategy {config.strategy!r}, expected {SECTION!r} or {SENTENCE!r}")
+        if config.chunk_overlap >= config.chunk_size:
+            raise ValueError(f"Chunk overlap must be smaller than chunk size: {spec!r}")
+        return config
+
+    def __str__(self) -> str:
+        return f"{self.strategy}:{self.chunk_size}:{self.chunk_overlap}"
+
+
+def detect_heading(line: str) -> str | None:
+    """Section name if the line is a CV section heading, otherwise None."""
+    candidate = _HEADING_NOISE.sub("", line.strip())
+    if not candidate or len(candidate) > _MAX_HEADING_LENGTH:
+        return None
+    candidate = re.sub(r"\s+", " ", candidate)
+    for section, pattern in _HEADING_PATTERNS:
+        if pattern.match(candidate):
+            return section
+    return None
+
+
+def split_sections(text: str) -> list[tuple[str, str]]:
+    """
+    Делит текст резюме на разделы по строкам-заголовкам.
+    Возвращает пары (section, text) в порядке документа; пустые разделы пропускаются.
+    """
+    sections: list[tuple[str, list[str]]] = [(SUMMARY, [])]
+    for line in text.splitlines():
+        section = detect_heading(line)
+        if section is not None:
+            sections.append((section, []))
+        else:
+            sections[-1][1].append(line)
+    return [
+        (section, body)
+        for section, lines in sections
+        if (body := "\n".join(lines).strip())
+    ]
+
+
+def _sentence_splitter(chunk_size: int, chunk_overlap: int):
+    # llama_index импортируется при первом чанкинге, а не при старте API;
+    # чанкинг CV идёт в потоке (PdfService.build_points), так что импорт не блокирует event loop
+    from llama_index.core.node_parser import SentenceSplitter
+    return SentenceSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+
+
+class SectionChunker:
+    """
+    Структурный чанкер резюме: сначала разделы (опыт, проекты, навыки,
+    образование), затем SentenceSplitter внутри раздела. Чанк никогда не
+    пересекает границу раздела и несёт его имя в метаданных.
+    """
+
+    def __init__(self, chunk_size: int = 400, chunk_overlap: int = 40):
+        self.splitter = _sentence_splitter(chunk_size, chunk_overlap)
+
+    def chunk(self, text: str) -> list[Chunk]:
+        return [
+            Chunk(text=piece, section=section)
+            for section, body in split_sections(text)
+            for piece in self.splitter.split_text(body)
+        ]
+
+
+class SentenceChunker:
+    """Разбиение всего текста SentenceSplitter-ом без учёта разделов (прежнее поведение)."""
+
+    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 0):
+        self.splitter = _sentence_splitter(chunk_size, chunk_overlap)
+
+    def chunk(self, text: str) -> list[Chunk]:
+        return [Chunk(text=piece, section=None) for piece in self.splitter.split_text(text)]
+
+
+def make_chunker(config: ChunkingConfig) -> SectionChunker | SentenceChunker:
+    chunker_cls = SectionChunker if config.strategy == SECTION else SentenceChunker
+    return chunker_cls(chunk_size=config.chunk_size, chunk_overlap=config.chunk_overlap)
+
+
+def get_chunking_config(collection: str) -> ChunkingConfig:
+    """Chunking settings of a collection (settings.CHUNKING), default config when not set."""
+    spec = settings.CHUNKING.get(collection)
+    return ChunkingConfig.parse(spec) if spec else ChunkingConfig()
@@ -1,34 +1,41 @@
 import logging
 from datetime import datetime
+from typing import Optional
 
-from requests import session
+from app.helper.pagination import decode_cursor, encode_cursor, make_etag
 from app.repository.cv_repository import CVRepository
-from app.storage.repository.qdrant import get_vector_storage
-from qdrant_client.models import PointStruct
+from app.storage.repository.qdrant import get_async_vector_storage
 
-from app.services.pdf import PdfService
+from app.services.pdf import PdfService, new_cv_version
+from app.services.unit_of_work import UnitOfWork
 
 logger = logging.getLogger(__name__)
 
 class CVService():
     def __init__(self,repo:CVRepository):
         self.repo = repo
-        self.storage = get_vector_storage()
+        self.storage = get_async_vector_storage()
         self.pdf_service = PdfService(repo.session)
     
 
-    async def get_cvs_by_user(self,user_id:int):
+    async def get_cvs_by_user(self, user_id: int, limit: int, cursor: Optional[str] = None):
         """
-        Get all CVs as options for a user.
+        Get a page of CVs as options for a user.
         :param user_id: id of user
         :type user_id: int
+        :return: options and the cursor of the next page (None on the last page)
         """
-        result = await self.repo.get_cvs_options_by_user_id(user_id)
-        return result
+        options, next_key = await self.repo.get_cvs_options_by_user_id(user_id, limit, decode_cursor(cursor))
+        return options, encode_cursor(*next_key) if next_key else None
+
+    async def get_listing_etag(self, user_id: int, *parts) -> str:
+        """ETag of a user's CV listing page; parts identify the page (endpoint, cursor, limit)."""
+        count, last_updated = await self.repo.get_cvs_version(user_id)
+        return make_etag(user_id, count, last_updated, *parts)
     
     async def update_cv(self,cv_id:int, pdf_path: str, source_id: str, filename: str = None,
                     original_filename: str = None, file_size: int = 0, content_type: str = "application/pdf",
-                    upload_ip: str = None, user_agent: str = None) -> None:
+                    upload_ip: str = None, user_agent: str = None, content_hash: str = None) -> None:
         """
         Обновляет метаданные CV в базе данных
 
@@ -42,43 +49,51 @@ class CVService():
             content_type: MIME тип файла
             upload_ip: IP адрес загрузки
             user_agent: User agent браузера
+            content_hash: SHA-256 загруженного файла
         """
         cv = await self.repo.get_cv_by_id(cv_id)
         if not cv:
             raise ValueError(f"CV with id {cv_id} not found")
         current_source_id = cv.source_id
-        backup_points = self._get_points_by_source_id(current_source_id)
+        if source_id != current_source_id:
+            taken = await self.repo.get_cv_by_source_id(source_id=source_id)
+            if taken is not None and taken.user_id != cv.user_id:
+                raise PermissionError(f"source_id {source_id} belongs to another user")
+        cv_version = new_cv_version()
+        data = {
+            "source_id": source_id,
+            "filename": filename or cv.filename,
+            "original_filename": original_filename or cv.original_filename,
+            "file_path": pdf_path or cv.file_path,
+            "file_size": file_size or cv.file_size,
+            "content_type": content_type or cv.content_type,
+            "upload_ip": upload_ip or cv.upload_ip,
+            "user_agent": user_agent or cv.user_agent,
+            "content_hash": content_hash,
+            "updated_at": datetime.now(),
+        }
         try:
-            self._delete_points_by_source_id(current_source_id)
-            data = {
-                "source_id": source_id,
-                "filename": filename or cv.filename,
-                "original_filename": original_filename or cv.original_filename,
-                "file_path": pdf_path or cv.file_path,
-                "file_size": file_size or cv.file_size,
-                "content_type": content_type or cv.content_type,
-                "upload_ip": upload_ip or cv.upload_ip,
-                "user_agent": user_agent or cv.user_agent,
-                "updated_at": datetime.now(),
-            }
-            await self.repo.update_cv(cv, data)
-            self._upsert_points(pdf_path, original_filename or filename, source_id, cv.user_id)
-            self.repo.session.commit()
-        except Exception as e:
+            async with UnitOfWork(self.repo.session) as uow:
+                await self.repo.update_cv(cv, data)
+                text_chunks, vectors = await self.pdf_service.stage_vectors(uow, pdf_path, source_id, cv.user_id, cv_version)
+                await self.pdf_service.refresh_digest(uow, cv, text_chunks, vectors, cv_version)
+                if current_source_id != source_id:
+                    # source_id сменился — точки старого source_id удаляются целиком
+                    self._stage_delete_points(uow, current_source_id)
+                await uow.commit()
+        except Exception:
             logger.error("Error updating CV", exc_info=True)
-            # Откатываем БД
-            await self.repo.session.rollback()
-            # Восстанавливаем данные в Qdrant
-            self._restore_points(backup_points)
+            raise
     
-    async def get_by_user(self,user_id:int):
+    async def get_by_user(self, user_id: int, limit: int, cursor: Optional[str] = None):
         """
-        Get all CVs for a user.
+        Get a page of CVs for a user.
         :param user_id: id of user
         :type user_id: int
+        :return: CVs and the cursor of the next page (None on the last page)
         """
-        result = await self.repo.get_cvs_by_user_id(user_id)
-        return result
+        cvs, next_key = await self.repo.get_cvs_by_user_id(user_id, limit, decode_cursor(cursor))
+        return cvs, encode_cursor(*next_key) if next_key else None
     
     async def delete_cv(self, cv_id: int):
         """
@@ -90,55 +105,20 @@ class CVService():
         cv = await self.repo.get_cv_by_id(cv_id)
         if not cv:
             raise ValueError(f"CV with id {cv_id} not found")
-        
-        source_id = cv.source_id
-        
-        # Сохраняем данные из Qdrant для возможного отката
-        backup_points = self._get_points_by_source_id(source_id)
-        
+
         try:
-            # 1. Удаляем из Qdrant
-            self._delete_points_by_source_id(source_id)
-            
-            # 2. Удаляем из БД
-            self.repo.delete_cv(cv)
-            
-            # 3. Коммитим транзакцию БД
-            self.repo.session.commit()
-            
+            async with UnitOfWork(self.repo.session) as uow:
+                self.repo.delete_cv(cv)
+                # Точки удаляются только после коммита БД
+                self._stage_delete_points(uow, cv.source_id)
+                await uow.commit()
         except Exception as e:
             logger.error("Error deleting CVs", exc_info=True)
-            # Откатываем БД
-            self.repo.session.rollback()
-            
-            # Восстанавливаем данные в Qdrant
-            self._restore_points(backup_points)
-            
             raise Exception(f"Failed to delete CV: {str(e)}")
-        
-
-    def _delete_points_by_source_id(self, source_id: int):
-        """Delete all points with given source_id"""
-        self.storage.delete_by_source_id(source_id)
-
-    def _upsert_points(self, pdf_path:str,original_filename: str,source_id:str,user_id:int):
-        self.pdf_service.upsert_vectors(pdf_path=pdf_path,original_filename=original_filename,source_id=source_id,user_id=user_id)
 
-    def _get_points_by_source_id(self, source_id: int):
-        """Get all points for potential rollback"""
-        return self.storage.get_points_by_source_id(source_id)
-    def _restore_points(self, points):
-        """Restore points in Qdrant from backup"""
-        if points:
-            restored_points = [
-                PointStruct(
-                    id=point.id,
-                    vector=point.vector,
-                    payload=point.payload
-                )
-                for point in points
-            ]
-            self.storage.client.upsert(
-                collection_name=self.storage.collection,
-                points=restored_points
-            )
+    def _stage_delete_points(self, uow: UnitOfWork, source_id: str):
+        """Delete all points with given source_id after commit"""
+        uow.stage_delete_by_source_id(self.storage, source_id)
+        for storage in self.pdf_service.section_storages.values():
+            uow.stage_delete_by_source_id(storage, source_id)
+        uow.stage_delete_by_source_id(self.pdf_service.digest_storage, source_id)
@@ -1,5 +1,26 @@
+from app.core.config import settings
 from app.services.embeddings.base import BaseEmbedder
 from app.services.embeddings.openai_embedder import OpenAIEmbedder
 from app.services.embeddings.local_mistral_embedder import LocalMistralEmbedder
 
-__all__ = ["BaseEmbedder", "OpenAIEmbedder", "LocalMistralEmbedder"]
+__all__ = ["BaseEmbedder", "OpenAIEmbedder", "LocalMistralEmbedder", "get_embedder"]
+
+_EMBEDDERS = {
+    "openai": OpenAIEmbedder,
+    "ollama": LocalMistralEmbedder,
+}
+
+_embedder = None
+
+def get_embedder() -> BaseEmbedder:
+    """Эмбеддер, выбранный через EMBEDDING_PROVIDER (один на процесс)."""
+    global _embedder
+    if _embedder is None:
+        try:
+            embedder_cls = _EMBEDDERS[settings.EMBEDDING_PROVIDER]
+        except KeyError:
+            raise ValueError(
+                f"Unknown EMBEDDING_PROVIDER {settings.EMBEDDING_PROVIDER!r}, expected one of {sorted(_EMBEDDERS)}"
+            )
+        _embedder = embedder_cls()
+    return _embedder
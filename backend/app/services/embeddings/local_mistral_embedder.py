@@ -1,5 +1,5 @@
 import os
-from langchain_ollama import OllamaEmbeddings
+from app.core.metrics import EMBEDDED_TEXTS, stage_timer
 from app.services.embeddings.base import BaseEmbedder
 
 # Модель должна быть предварительно загружена через `ollama pull nomic-embed-text`.
@@ -12,12 +12,20 @@ _DIMENSIONS = 768
 class LocalMistralEmbedder(BaseEmbedder):
     def __init__(self, model: str = _MODEL):
         self._model = model
-        base_url = os.getenv("OLLAMA_HOST", "http://localhost:11434")
-        self._embedder = OllamaEmbeddings(model=model, base_url=base_url)
+        self._embedder = None
 
     @property
     def dimensions(self) -> int:
         return _DIMENSIONS
 
+    def _get_embedder(self):
+        if self._embedder is None:
+            from langchain_ollama import OllamaEmbeddings
+            base_url = os.getenv("OLLAMA_HOST", "http://localhost:11434")
+            self._embedder = OllamaEmbeddings(model=self._model, base_url=base_url)
+        return self._embedder
+
     def embed_texts(self, texts: list[str]) -> list[list[float]]:
-        return self._embedder.embed_documents(texts)
+        EMBEDDED_TEXTS.labels(provider="ollama").inc(len(texts))
+        with stage_timer("embedding", {"embedding.texts": len(texts)}):
+            return self._get_embedder().embed_documents(texts)
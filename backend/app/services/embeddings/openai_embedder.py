@@ -1,4 +1,4 @@
-from openai import OpenAI
+from app.core.metrics import EMBEDDED_TEXTS, stage_timer
 from app.services.embeddings.base import BaseEmbedder
 
 _MODEL = "text-embedding-3-large"
@@ -9,16 +9,25 @@ class OpenAIEmbedder(BaseEmbedder):
     def __init__(self, model: str = _MODEL, dimensions: int = _DIMENSIONS):
         self._model = model
         self._dimensions = dimensions
-        self._client = OpenAI()
+        self._client = None
 
     @property
     def dimensions(self) -> int:
         return self._dimensions
 
+    def _get_client(self):
+        # Клиент (и пакет openai) — при первом эмбеддинге: dimensions нужен уже на старте
+        if self._client is None:
+            from openai import OpenAI
+            self._client = OpenAI()
+        return self._client
+
     def embed_texts(self, texts: list[str]) -> list[list[float]]:
-        response = self._client.embeddings.create(
-            model=self._model,
-            dimensions=self._dimensions,
-            input=texts,
-        )
+        EMBEDDED_TEXTS.labels(provider="openai").inc(len(texts))
+        with stage_timer("embedding", {"embedding.texts": len(texts)}):
+            response = self._get_client().embeddings.create(
+                model=self._model,
+                dimensions=self._dimensions,
+                input=texts,
+            )
         return [item.embedding for item in response.data]
@@ -1,15 +1,20 @@
+import logging
 from datetime import timedelta, datetime, timezone
+from typing import Optional
 import jwt
 from app.core.config import settings
 
+logger = logging.getLogger(__name__)
+
 
 
 class JwtService:
 
-    def create_access_token(self,email: str) -> str:
+    def create_access_token(self,email: str, user_id: Optional[int] = None) -> str:
         expire = datetime.now(timezone.utc) + timedelta(minutes=24*60)
         to_encode = {
             "email": email,
+            "user_id": user_id,
             "exp": expire
         }
         return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
@@ -21,10 +26,11 @@ class JwtService:
         return payload["email"]
         
 
-    def create_refresh_token(self,email: str) -> str:
+    def create_refresh_token(self,email: str, user_id: Optional[int] = None) -> str:
         expire = datetime.now(timezone.utc) + timedelta(weeks=1)
         to_encode = {
             "email": email,
+            "user_id": user_id,
             "exp": expire
         }
         return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
@@ -34,7 +40,7 @@ class JwtService:
             payload = jwt.decode(encoded_jwt, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
             return payload
         except jwt.ExpiredSignatureError:
-            print("Token has expired")
+            logger.debug("Token has expired")
         except jwt.InvalidTokenError:
-            print("Invalid token")
+            logger.debug("Invalid token")
 
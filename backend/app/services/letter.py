@@ -1,28 +1,84 @@
-from openai import OpenAI, AsyncOpenAI
+import asyncio
+import logging
+import time
+from contextlib import aclosing
+from app.core.config import settings
+from app.core import tracing
+from app.core.metrics import QUEUE_WAIT_SECONDS, stage_timer
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.services.pdf import PdfService
 from app.schemas.rag import RAGSearchResult
-from app.storage.repository.qdrant import QdrantStorage
+from app.schemas.cv import CVDigest
+from app.models.cv import CV
+from app.storage.repository.qdrant import AsyncQdrantStorage, get_async_vector_storage
 from app.repository.cv_repository import CVRepository
 from app.repository.letter_repository import LetterRepository
-from typing import AsyncGenerator
+from typing import TYPE_CHECKING, AsyncGenerator
 from app.services.llm.open_ai import OpenAiClient
 from app.services.llm.mistral import MistralClient
+from app.services.llm.general import GeneralLLMClient, GenerationStats
+from app.services.letter_writer import LetterRecord, get_letter_writer
+from app.services.variants import VariantRun
+from app.services.batch import BatchItem, BatchJob
+from app.services.chunking import EXPERIENCE, PROJECTS, SKILLS
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI, OpenAI
+
+logger = logging.getLogger(__name__)
+
+# Запросы контекста резюме: (раздел, запрос, top_k). Общий запрос идёт по всей коллекции cvs
+# (в том числе по точкам без поля section, проиндексированным до разбиения по разделам),
+# skills/projects — по своим коллекциям, остальные разделы — по cvs с фильтром section
+_RESUME_QUERIES = (
+    (None, "ключевые навыки опыт образование достижения", 8),
+    (SKILLS, "технические навыки технологии инструменты фреймворки", 5),
+    (PROJECTS, "проекты результаты метрики достижения", 5),
+    (EXPERIENCE, "опыт работы должности обязанности результаты", 5),
+)
+
+_openai_client = None
+_async_openai_client = None
+
+
+def get_openai_client() -> "OpenAI":
+    """Общий OpenAI клиент (web search, chat); openai импортируется при первом вызове"""
+    global _openai_client
+    if _openai_client is None:
+        from openai import OpenAI
+        _openai_client = OpenAI()
+    return _openai_client
+
+
+def get_async_openai_client() -> "AsyncOpenAI":
+    global _async_openai_client
+    if _async_openai_client is None:
+        from openai import AsyncOpenAI
+        _async_openai_client = AsyncOpenAI()
+    return _async_openai_client
 
 
 class LetterService():
-    def __init__(self, session: AsyncSession = None):
-        self.client = OpenAI()
+    def __init__(self, session: AsyncSession = None, llm: GeneralLLMClient = None,
+                 storage: AsyncQdrantStorage = None, pdf_service: PdfService = None):
+        """llm, storage и pdf_service можно подменить (бенчмарки, локальные заглушки)"""
         # self.llm = OpenAiClient()
-        self.llm = MistralClient()
-        self.async_client = AsyncOpenAI()
-        self.storage = QdrantStorage()
+        self.llm = llm or MistralClient()
+        self.storage = storage or get_async_vector_storage()
         
         self.session = session
-        self.pdf_service = PdfService(session)
+        self.pdf_service = pdf_service or PdfService(session)
         self.cv_repository = CVRepository(session) if session else None
         self.letter_repository = LetterRepository(session) if session else None
 
+    @property
+    def client(self) -> "OpenAI":
+        return get_openai_client()
+
+    @property
+    def async_client(self) -> "AsyncOpenAI":
+        return get_async_openai_client()
+
     async def search_job_requirements(self, job_title: str, company: str = None) -> str:
         """
         Ищет требования для вакансии используя OpenAI с web_search_preview tool
@@ -72,16 +128,11 @@ class LetterService():
         
 
         # Получаем ключевые навыки и опыт из резюме
-        skills_query = "ключевые навыки опыт образование достижения"
-        resume_data = self.__search_resume_data(skills_query,source_id=source_id)
-        
-
-        if not resume_data.contexts:
+        try:
+            resume_context = await self._get_resume_context(source_id)
+        except ValueError:
             return "Не найдены данные резюме в базе данных. Сначала загрузите свое резюме."
 
-        # Формируем контекст из резюме
-        resume_context = "\n\n".join(f"- {c}" for c in resume_data.contexts)
-
         prompt = f"""
        Ты - помощник по созданию профессиональных сопроводительных писем.
 
@@ -113,36 +164,25 @@ class LetterService():
             return f"Ошибка при генерации сопроводительного письма: {str(e)}" 
 
     async def stream_cover_letter(
-        self, job_requirements: str, source_id: int, target_language: str | None = None
+        self, job_requirements: str, source_id: int, target_language: str | None = None,
+        job_title: str | None = None, job_url: str | None = None
     ) -> AsyncGenerator[str, None]:
         """
         Streams cover letter tokens.
         Yields raw text deltas (caller wraps in SSE frame).
+        A fully streamed letter is handed to the write-behind buffer.
         Raises ValueError if no resume data found.
         """
 
-        skills_query = "ключевые навыки опыт образование достижения"
-        resume_data = self.__search_resume_data(skills_query,source_id=source_id)
-
-        if not resume_data.contexts:
-            raise ValueError("Не найдены данные резюме в базе данных.")
-
-        resume_context = "\n\n".join(f"- {c}" for c in resume_data.contexts)
-
-        language_instruction = (
-            f"Письмо должно быть написано строго на {target_language}."
-            if target_language
-            else "Письмо должно быть русском языке."
-        )
-
-        body = {
-            "job_requirements":job_requirements,
-            "resume_context":resume_context,
-            "language_instruction":language_instruction
-        }
+        body = await self._build_letter_body(job_requirements, source_id, target_language)
 
-        async for delta in self.llm.get_stream_response(body):
-            yield delta
+        stats = GenerationStats()
+        parts: list[str] = []
+        async with aclosing(self.llm.get_stream_response(body, stats)) as stream:
+            async for delta in stream:
+                parts.append(delta)
+                yield delta
+        self._record_letter(source_id, job_requirements, parts, stats, job_title, job_url)
         # prompt = self.__get_letter_prompt(job_requirements,resume_context,language_instruction)
         # async with self.async_client.responses.stream(
         #     model="gpt-4o",
@@ -196,39 +236,169 @@ class LetterService():
         """
         yield "__PARSING__"
 
-        prompt = f"""
-        Проанализируй страницу вакансии по URL: {job_url}
-        Затем пиши на том языке, на котором информация на странице вакансии.
-        Извлеки и суммируй следующую информацию:
-        - Название вакансии
-        - Основные обязанности
-        - Требуемые навыки и компетенции
-        - Требуемый опыт работы
-        - Образование и квалификация
-        - Дополнительные требования
+        job_requirements = await self._extract_job_requirements(job_url)
 
-        Представь информацию в структурированном виде.
+        yield "__READY__"
+
+        async with aclosing(self.stream_cover_letter(
+            job_requirements, source_id, target_language, job_url=job_url
+        )) as stream:
+            async for delta in stream:
+                yield delta
+        
+    async def stream_variants(
+        self, job_requirements: str, source_id: int, run: VariantRun,
+        target_language: str | None = None, job_title: str | None = None,
+        job_url: str | None = None
+    ) -> AsyncGenerator[tuple[int, str], None]:
+        """
+        Streams run.count letter variants concurrently over one retrieval pass.
+        Yields (variant_id, delta) pairs; a variant ends with "__DONE__",
+        "__CANCELLED__" or "__ERROR__". Every completed variant is recorded.
+        Raises ValueError if no resume data found.
+        """
+        body = await self._build_letter_body(job_requirements, source_id, target_language)
+        queue: asyncio.Queue[tuple[int, str]] = asyncio.Queue()
+
+        async def _produce(variant_id: int) -> None:
+            stats = GenerationStats()
+            parts: list[str] = []
+            async with aclosing(self.llm.get_stream_response(body, stats)) as stream:
+                async for delta in stream:
+                    parts.append(delta)
+                    queue.put_nowait((variant_id, delta))
+            self._record_letter(source_id, job_requirements, parts, stats, job_title, job_url)
+
+        def _on_done(task: asyncio.Task, variant_id: int) -> None:
+            # Колбэк срабатывает и для задач, отменённых до первого шага
+            if task.cancelled():
+                marker = "__CANCELLED__"
+            elif task.exception() is not None:
+                logger.error("Variant %s generation failed", variant_id, exc_info=task.exception())
+                marker = "__ERROR__"
+            else:
+                marker = "__DONE__"
+            queue.put_nowait((variant_id, marker))
+
+        for variant_id in range(run.count):
+            task = asyncio.create_task(_produce(variant_id))
+            task.add_done_callback(lambda t, vid=variant_id: _on_done(t, vid))
+            run.tasks[variant_id] = task
+        if run.selected is not None:
+            run.select(run.selected)
+
+        pending = run.count
+        try:
+            while pending:
+                variant_id, delta = await queue.get()
+                if delta in ("__DONE__", "__CANCELLED__", "__ERROR__"):
+                    pending -= 1
+                yield variant_id, delta
+        finally:
+            # Клиент отключился или выбрал вариант — останавливаем всё, что ещё генерируется
+            run.cancel()
+            await asyncio.gather(*run.tasks.values(), return_exceptions=True)
+
+    async def stream_variants_by_url(
+        self, job_url: str, source_id: int, run: VariantRun,
+        target_language: str | None = None
+    ) -> AsyncGenerator[tuple[int | None, str], None]:
+        """
+        Extracts job requirements from URL once, then streams run.count variants.
+        Status sentinels are yielded with variant_id None.
         """
+        yield None, "__PARSING__"
 
-        requirements_parts: list[str] = []
-        async with self.async_client.responses.stream(
-            model="gpt-4.1-mini",
-            tools=[{"type": "web_search_preview"}],
-            input=prompt,
-        ) as stream:
-            async for event in stream:
-                if event.type == "response.output_text.delta":
-                    requirements_parts.append(event.delta)
+        job_requirements = await self._extract_job_requirements(job_url)
 
-        job_requirements = "".join(requirements_parts)
-        if not job_requirements:
-            raise ValueError("Не удалось извлечь требования из URL.")
+        yield None, "__READY__"
 
-        yield "__READY__"
+        async with aclosing(self.stream_variants(
+            job_requirements, source_id, run, target_language, job_url=job_url
+        )) as stream:
+            async for variant_id, delta in stream:
+                yield variant_id, delta
+
+    async def generate_batch(self, job: BatchJob) -> None:
+        """
+        Генерирует письма для всех вакансий батча по одному CV.
+
+        Резюме ищется один раз; требования по URL извлекаются параллельно,
+        генерация идёт через ограниченный пул, каждое письмо сохраняется в БД.
+        Прогресс и результаты пишутся в job.
+        """
+        job.status = "running"
+        try:
+            cv = await self.cv_repository.get_cv_by_source_id(source_id=str(job.source_id))
+            if cv is None or cv.user_id != job.user_id:
+                raise ValueError("CV not found")
+            resume_context = await self._get_resume_context(job.source_id, cv)
+        except ValueError as e:
+            job.finish("error", str(e))
+            return
+
+        cv_id = cv.id
+        language_instruction = self._get_language_instruction(job.target_language)
+        extract_slots = asyncio.Semaphore(settings.LETTER_BATCH_EXTRACT_CONCURRENCY)
+        generate_slots = asyncio.Semaphore(settings.LETTER_BATCH_CONCURRENCY)
+
+        async def _process(item: BatchItem) -> None:
+            with tracing.span("batch_item", {"batch.id": job.id, "batch.item": item.index}) as span:
+                try:
+                    if item.url:
+                        item.status = "extracting"
+                        async with extract_slots:
+                            job_requirements = await self._extract_job_requirements(item.url)
+                        item.job_title = self._guess_job_title(job_requirements) or item.url
+                    else:
+                        job_requirements = f"{item.name}\n{item.description}"
+
+                    item.status = "queued"
+                    queued_at = time.monotonic()
+                    async with generate_slots:
+                        QUEUE_WAIT_SECONDS.labels(queue="batch_generate").observe(time.monotonic() - queued_at)
+                        item.status = "generating"
+                        body = {
+                            "job_requirements": job_requirements,
+                            "resume_context": resume_context,
+                            "language_instruction": language_instruction,
+                        }
+                        stats = GenerationStats()
+                        parts = [delta async for delta in self.llm.get_stream_response(body, stats)]
+
+                    letter = await self.letter_repository.create_letter(
+                        cv_id=cv_id,
+                        source_id=job.source_id,
+                        job_title=item.job_title[:200],
+                        job_description=item.description,
+                        job_url=item.url[:500] if item.url else None,
+                        letter_content="".join(parts),
+                        job_requirements=job_requirements,
+                        generation_time=stats.generation_time,
+                        time_to_first_token_ms=stats.time_to_first_token_ms,
+                        prompt_tokens=stats.prompt_tokens,
+                        completion_tokens=stats.completion_tokens,
+                        model_used=stats.model,
+                    )
+                    item.letter_id = letter.id
+                    item.letter_content = letter.letter_content
+                    item.status = "done"
+                except Exception as e:
+                    logger.error("Batch %s item %s failed", job.id, item.index, exc_info=True)
+                    # Сессия общая для всех элементов: без отката после ошибки вставки
+                    # следующие падают с PendingRollbackError
+                    self.session.rollback()
+                    span.record_exception(e)
+                    item.error = str(e)
+                    item.status = "error"
+
+        try:
+            await asyncio.gather(*(_process(item) for item in job.items))
+        except asyncio.CancelledError:
+            job.finish("cancelled")
+            raise
+        job.finish("done")
 
-        async for delta in self.stream_cover_letter(job_requirements, source_id, target_language):
-            yield delta
-        
     async def parse_cv(self,user_id: int,pdf_path: str, source_id: str, filename: str = None,
                     original_filename: str = None,
                     file_size: int = 0, content_type: str = "application/pdf",
@@ -247,7 +417,7 @@ class LetterService():
 
     async def add_cv(self, user_id: int, pdf_path: str, source_id: str, filename: str = None,
                     original_filename: str = None, file_size: int = 0, content_type: str = "application/pdf",
-                    upload_ip: str = None, user_agent: str = None):
+                    upload_ip: str = None, user_agent: str = None, content_hash: str = None) -> bool:
         """
         Загружает CV в векторную базу данных и сохраняет метаданные в PostgreSQL
 
@@ -261,8 +431,12 @@ class LetterService():
             content_type: MIME тип файла
             upload_ip: IP адрес загрузки
             user_agent: User agent браузера
+            content_hash: SHA-256 файла для дедупликации повторных загрузок
+
+        Returns:
+            True, если векторы скопированы из идентичного CV пользователя
         """
-        await self.pdf_service.add_cv(
+        return await self.pdf_service.add_cv(
             user_id=user_id,
             pdf_path=pdf_path,
             source_id=source_id,
@@ -271,7 +445,8 @@ class LetterService():
             file_size=file_size,
             content_type=content_type,
             upload_ip=upload_ip,
-            user_agent=user_agent
+            user_agent=user_agent,
+            content_hash=content_hash
         )
     
 
@@ -294,6 +469,111 @@ class LetterService():
         # Шаг 2: Получаем данные из резюме и генерируем письмо
         return await self.generate_cover_letter(job_requirements, source_id)
 
+    def _record_letter(
+        self, source_id: int, job_requirements: str, parts: list[str], stats: GenerationStats,
+        job_title: str | None = None, job_url: str | None = None
+    ) -> None:
+        """Отдаёт готовое письмо в write-behind буфер; запрос не ждёт записи в БД."""
+        letter_content = "".join(parts)
+        if not letter_content:
+            return
+        get_letter_writer().submit(LetterRecord(
+            source_id=source_id,
+            job_title=job_title or self._guess_job_title(job_requirements) or job_url or "Untitled",
+            letter_content=letter_content,
+            model_used=stats.model,
+            job_url=job_url,
+            job_requirements=job_requirements,
+            generation_time=stats.generation_time,
+            time_to_first_token_ms=stats.time_to_first_token_ms,
+            prompt_tokens=stats.prompt_tokens,
+            completion_tokens=stats.completion_tokens,
+        ))
+
+    async def _build_letter_body(
+        self, job_requirements: str, source_id: int, target_language: str | None = None
+    ) -> dict:
+        """
+        Собирает переменные промпта письма: требования, контекст резюме, язык.
+        Raises ValueError if no resume data found.
+        """
+        return {
+            "job_requirements":job_requirements,
+            "resume_context":await self._get_resume_context(source_id),
+            "language_instruction":self._get_language_instruction(target_language)
+        }
+
+    async def _get_resume_context(self, source_id: int, cv: CV | None = None) -> str:
+        """
+        Контекст резюме для промпта: готовый профиль CV (digest), если он есть,
+        иначе — векторный поиск по чанкам резюме.
+        Raises ValueError if no resume data found.
+        """
+        with stage_timer("resume_context"):
+            if settings.LETTER_RESUME_CONTEXT == "digest":
+                if cv is None and self.cv_repository:
+                    cv = await self.cv_repository.get_cv_by_source_id(source_id=str(source_id))
+                if cv is not None and cv.digest:
+                    return CVDigest.model_validate_json(cv.digest).to_context()
+
+            resume_data = await self.__search_resume_data(_RESUME_QUERIES, source_id=source_id)
+
+        if not resume_data.contexts:
+            raise ValueError("Не найдены данные резюме в базе данных.")
+
+        return "\n\n".join(f"- {c}" for c in resume_data.contexts)
+
+    def _get_language_instruction(self, target_language: str | None = None) -> str:
+        return (
+            f"Письмо должно быть написано строго на {target_language}."
+            if target_language
+            else "Письмо должно быть русском языке."
+        )
+
+    async def _extract_job_requirements(self, job_url: str) -> str:
+        """
+        Извлекает требования вакансии по URL через web search (стриминг без вывода).
+        Raises ValueError if nothing was extracted.
+        """
+        prompt = f"""
+        Проанализируй страницу вакансии по URL: {job_url}
+        Затем пиши на том языке, на котором информация на странице вакансии.
+        Извлеки и суммируй следующую информацию:
+        - Название вакансии
+        - Основные обязанности
+        - Требуемые навыки и компетенции
+        - Требуемый опыт работы
+        - Образование и квалификация
+        - Дополнительные требования
+
+        Представь информацию в структурированном виде.
+        """
+
+        requirements_parts: list[str] = []
+        with stage_timer("job_extraction"):
+            async with self.async_client.responses.stream(
+                model="gpt-4.1-mini",
+                tools=[{"type": "web_search_preview"}],
+                input=prompt,
+            ) as stream:
+                async for event in stream:
+                    if event.type == "response.output_text.delta":
+                        requirements_parts.append(event.delta)
+
+        job_requirements = "".join(requirements_parts)
+        if not job_requirements:
+            raise ValueError("Не удалось извлечь требования из URL.")
+        return job_requirements
+
+    @staticmethod
+    def _guess_job_title(job_requirements: str) -> str | None:
+        """Первая непустая строка извлечённых требований — как правило, название вакансии."""
+        for line in job_requirements.splitlines():
+            title = line.strip().strip("#*-: ").strip()
+            if title:
+                return title
+        return None
+
     def __get_letter_prompt(self,job_requirements:str,resume_context:str,language_instruction:str)->str:
         prompt = f"""
         Ты - помощник по созданию профессиональных сопроводительных писем.
@@ -311,20 +591,33 @@ class LetterService():
         """
         return prompt
 
-    def __search_resume_data(self,query: str,source_id, top_k: int = 10)->RAGSearchResult:
+    async def __search_resume_data(self, queries, source_id) -> RAGSearchResult:
             """
-            Ищем релевантные данные из резюме в векторной базе
+            Ищем релевантные данные из резюме в векторной базе по запросам (раздел, запрос, top_k).
+            Фильтр по source_id выполняется в Qdrant. Для skills/projects поиск идёт по
+            отдельной, меньшей коллекции раздела, для прочих разделов — по cvs с фильтром section.
+            Одинаковые чанки из разных запросов попадают в результат один раз.
             """
-            
-            query_vec = self.pdf_service.embed_texts([query])[0]
-            found = self.storage.search(query_vector=query_vec, top_k=top_k)
-            filtered_contexts = []
-            filtered_sources = []
-            for context, source in zip(found["contexts"], found["sources"]):
-                if str(source.get("source_id")) == str(source_id):
-                    filtered_contexts.append(context)
-                    filtered_sources.append(source)
-            return RAGSearchResult(contexts=filtered_contexts, sources=filtered_sources)
+            # Эмбеддинг запросов — один синхронный HTTP-вызов, уводим его из event loop
+            query_vecs = await asyncio.to_thread(self.pdf_service.embed_texts, [query for _, query, _ in queries])
+            found = await asyncio.gather(*(
+                self._search_section(section, query_vec, top_k, source_id)
+                for (section, _, top_k), query_vec in zip(queries, query_vecs)
+            ))
+            contexts, sources = [], []
+            for result in found:
+                for context, source in zip(result["contexts"], result["sources"]):
+                    if context not in contexts:
+                        contexts.append(context)
+                        sources.append(source)
+            return RAGSearchResult(contexts=contexts, sources=sources)
+
+    async def _search_section(self, section: str | None, query_vec, top_k: int, source_id) -> dict:
+        storage = self.pdf_service.section_storages.get(section)
+        if storage is not None:
+            # Коллекция раздела содержит только его чанки — фильтр section не нужен
+            return await storage.search(query_vector=query_vec, top_k=top_k, source_id=str(source_id))
+        return await self.storage.search(query_vector=query_vec, top_k=top_k, source_id=str(source_id), section=section)
 
     async def _parse_job_requirements_from_url(self, job_url: str) -> str:
         """
@@ -359,5 +652,5 @@ class LetterService():
             return response.output_text
 
         except Exception as e:
-            print(e)
+            logger.error("Failed to parse job requirements from %s", job_url, exc_info=True)
             return f"Ошибка при парсинге URL вакансии: {str(e)}"
\ No newline at end of file
@@ -0,0 +1,178 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Optional
+
+from sqlalchemy import select
+from sqlmodel import Session
+
+from app.core import tracing
+from app.core.config import settings
+from app.core.metrics import LETTER_WRITE_BATCH_SECONDS, LETTER_WRITE_QUEUE, LETTER_WRITES, QUEUE_WAIT_SECONDS
+from app.models.cv import CV
+from app.models.letter import Letter
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class LetterRecord:
+    """Завершённая генерация, ожидающая записи в letters"""
+    source_id: int
+    job_title: str
+    letter_content: str
+    model_used: str
+    job_description: Optional[str] = None
+    job_url: Optional[str] = None
+    job_requirements: Optional[str] = None
+    generation_time: Optional[int] = None
+    time_to_first_token_ms: Optional[int] = None
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    created_at: datetime = field(default_factory=datetime.utcnow)
+    # Момент постановки в очередь (monotonic) — для метрики ожидания записи
+    enqueued_at: float = field(default_factory=time.monotonic)
+    # Span запроса, сгенерировавшего письмо: пачка записи ссылается на него (span link)
+    trace_link: Optional[Any] = field(default_factory=tracing.current_link)
+
+
+class LetterWriter:
+    """
+    Write-behind буфер сгенерированных писем.
+
+    submit() только кладёт запись в очередь и никогда не ждёт БД; фоновая задача
+    забирает записи пачками и вставляет их одной транзакцией в отдельном потоке.
+    При переполнении очереди запись отбрасывается (письмо уже отдано клиенту).
+    """
+
+    def __init__(self, batch_size: int = settings.LETTER_WRITE_BATCH_SIZE,
+                 flush_interval: float = settings.LETTER_WRITE_FLUSH_INTERVAL,
+                 max_queue: int = settings.LETTER_WRITE_QUEUE_SIZE):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: asyncio.Queue[LetterRecord] = asyncio.Queue(maxsize=max_queue)
+        self._task: Optional[asyncio.Task] = None
+        self._inflight: Optional[asyncio.Future] = None
+
+    def submit(self, record: LetterRecord) -> bool:
+        try:
+            self._queue.put_nowait(record)
+        except asyncio.QueueFull:
+            LETTER_WRITES.labels(result="dropped").inc()
+            logger.warning("Letter write-behind queue is full, dropping letter for source %s", record.source_id)
+            return False
+        LETTER_WRITE_QUEUE.set(self._queue.qsize())
+        return True
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="letter-writer")
+
+    async def stop(self) -> None:
+        """Stops the background task and writes everything still buffered."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._inflight is not None:
+            await asyncio.gather(self._inflight, return_exceptions=True)
+            self._inflight = None
+        while not self._queue.empty():
+            await self._write(self._drain())
+
+    async def _run(self) -> None:
+        while True:
+            batch: list[LetterRecord] = []
+            try:
+                batch.append(await self._queue.get())
+                # Небольшое окно, чтобы собрать пачку, а не писать по одной строке
+                deadline = time.monotonic() + self.flush_interval
+                while len(batch) < self.batch_size:
+                    timeout = deadline - time.monotonic()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+            except asyncio.CancelledError:
+                # Записи уже вынуты из очереди — пишем их до выхода
+                await self._write(batch)
+                raise
+            # shield: отмена при остановке не обрывает начатую вставку, stop() её дождётся
+            self._inflight = asyncio.ensure_future(self._write(batch))
+            await asyncio.shield(self._inflight)
+            self._inflight = None
+
+    def _drain(self, limit: Optional[int] = None) -> list[LetterRecord]:
+        limit = self.batch_size if limit is None else limit
+        batch = []
+        while len(batch) < limit and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _write(self, batch: list[LetterRecord]) -> None:
+        if not batch:
+            return
+        LETTER_WRITE_QUEUE.set(self._queue.qsize())
+        started = time.monotonic()
+        queue_wait = QUEUE_WAIT_SECONDS.labels(queue="letter_write")
+        for record in batch:
+            queue_wait.observe(started - record.enqueued_at)
+        links = [record.trace_link for record in batch if record.trace_link is not None]
+        try:
+            with tracing.span("letter_write_batch", {"letters.count": len(batch)}, links=links):
+                written = await asyncio.to_thread(_insert_letters, batch)
+        except Exception:
+            LETTER_WRITES.labels(result="failed").inc(len(batch))
+            logger.error("Failed to write %d buffered letters", len(batch), exc_info=True)
+            return
+        LETTER_WRITE_BATCH_SECONDS.observe(time.monotonic() - started)
+        LETTER_WRITES.labels(result="written").inc(written)
+        if written < len(batch):
+            LETTER_WRITES.labels(result="failed").inc(len(batch) - written)
+
+
+def _insert_letters(batch: list[LetterRecord]) -> int:
+    # Импорт здесь: engine создаётся из DATABASE_URL при импорте app.database
+    from app.database import engine
+
+    with Session(engine) as session:
+        source_ids = {str(record.source_id) for record in batch}
+        cv_ids = dict(session.execute(select(CV.source_id, CV.id).where(CV.source_id.in_(source_ids))).all())
+        letters = []
+        for record in batch:
+            cv_id = cv_ids.get(str(record.source_id))
+            if cv_id is None:
+                logger.warning("CV %s not found, letter is not saved", record.source_id)
+                continue
+            letters.append(Letter(
+                cv_id=cv_id,
+                source_id=record.source_id,
+                job_title=record.job_title[:200],
+                job_description=record.job_description,
+                job_url=record.job_url[:500] if record.job_url else None,
+                letter_content=record.letter_content,
+                job_requirements=record.job_requirements,
+                generation_time=record.generation_time,
+                time_to_first_token_ms=record.time_to_first_token_ms,
+                prompt_tokens=record.prompt_tokens,
+                completion_tokens=record.completion_tokens,
+                model_used=record.model_used[:100],
+                created_at=record.created_at,
+                updated_at=record.created_at,
+            ))
+        session.add_all(letters)
+        session.commit()
+        return len(letters)
+
+
+_letter_writer = None
+
+def get_letter_writer() -> LetterWriter:
+    global _letter_writer
+    if _letter_writer is None:
+        _letter_writer = LetterWriter()
+    return _letter_writer
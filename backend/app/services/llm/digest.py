@@ -0,0 +1,34 @@
+from app.core.config import settings
+from app.schemas.cv import CVDigest
+from app.services.llm.general import GeneralLLMClient
+
+
+class CVDigestClient(GeneralLLMClient):
+    """Извлекает из текста резюме компактный структурированный профиль (CVDigest)."""
+
+    def __init__(self):
+        from langchain_openai import ChatOpenAI
+        model = ChatOpenAI(model=settings.CV_DIGEST_MODEL, temperature=0)
+        super().__init__(model=model)
+        self.set_output(CVDigest)
+
+    @property
+    def prompt_template(self):
+        system = """Ты извлекаешь из резюме компактный профиль кандидата для генерации сопроводительных писем.
+
+        Правила:
+        - Пиши на языке резюме
+        - Только факты из резюме, ничего не придумывай
+        - Для каждой позиции оставь достижения с цифрами и метриками, без перечисления обязанностей
+        - Навыки и технологии — короткие термины без повторов
+        """
+        human = """
+        Текст резюме:
+        {cv_text}
+        """
+
+        from langchain_core.prompts import ChatPromptTemplate
+        return ChatPromptTemplate.from_messages([
+            ("system", system),
+            ("human", human),
+        ])
@@ -1,14 +1,22 @@
-from typing import AsyncIterator, Optional
-from langchain_core.language_models.chat_models import BaseChatModel
+import asyncio
+import time
+from contextlib import aclosing
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, AsyncIterator, Optional
 from pydantic import BaseModel
-from langchain_core.messages import HumanMessage, SystemMessage
-from langchain_core.messages.base import BaseMessage
-
-from langchain_core.prompts import ChatPromptTemplate
 from abc import ABC, abstractmethod
 
+from app.core import tracing
+from app.core.metrics import LLM_STREAMED_CHUNKS, LLM_TIME_TO_FIRST_TOKEN, LLM_USAGE_TOKENS, STAGE_SECONDS, STREAM_WASTED_CHUNKS, stage_timer
+
 import traceback
 
+# Только для аннотаций: langchain_core.language_models тянет langsmith (~0.6 с импорта)
+if TYPE_CHECKING:
+    from langchain_core.language_models.chat_models import BaseChatModel
+    from langchain_core.messages.base import BaseMessage
+    from langchain_core.prompts import ChatPromptTemplate
+
 '''
 @property
     def prompt_template(self) -> ChatPromptTemplate:
@@ -19,19 +27,54 @@ import traceback
 
 '''
 
+@dataclass
+class GenerationStats:
+    """Тайминги и расход токенов одной стриминговой генерации"""
+    model: str = "unknown"
+    started_at: float = field(default_factory=time.monotonic)
+    first_token_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+
+    @property
+    def time_to_first_token_ms(self) -> Optional[int]:
+        if self.first_token_at is None:
+            return None
+        return int((self.first_token_at - self.started_at) * 1000)
+
+    @property
+    def generation_time(self) -> Optional[int]:
+        """Seconds, as stored in Letter.generation_time"""
+        if self.finished_at is None:
+            return None
+        return int(self.finished_at - self.started_at)
+
+    def add_usage(self, usage: Optional[dict]) -> None:
+        # Провайдеры отдают usage одним или несколькими чанками — суммируем
+        if not usage:
+            return
+        self.prompt_tokens = (self.prompt_tokens or 0) + usage.get("input_tokens", 0)
+        self.completion_tokens = (self.completion_tokens or 0) + usage.get("output_tokens", 0)
+
+
 class GeneralLLMClient(ABC):
-    model:BaseChatModel = None
-    def __init__(self,model:BaseChatModel):
+    model: "BaseChatModel" = None
+    def __init__(self,model: "BaseChatModel"):
         self.model = model
     
     
+    @property
+    def model_name(self) -> str:
+        return getattr(self.model, "model", None) or getattr(self.model, "model_name", "unknown")
+
     @property
     @abstractmethod
-    def prompt_template(self) -> ChatPromptTemplate:
+    def prompt_template(self) -> "ChatPromptTemplate":
         """Наследники возвращают ChatPromptTemplate"""
         ...
     
-    def get_prompt(self, body: dict) -> list[BaseMessage]:
+    def get_prompt(self, body: dict) -> list["BaseMessage"]:
         # Подставляем переменные из body в шаблон
         return self.prompt_template.format_messages(**body)
     
@@ -39,11 +82,57 @@ class GeneralLLMClient(ABC):
         if schema is not None:
             self.model = self.model.with_structured_output(schema=schema)
     
-    async def get_stream_response(self,body:dict={})-> AsyncIterator[str]:
+    async def get_response(self, body: dict = {}):
+        messages = self.get_prompt(body)
+        with stage_timer("llm_invoke", {"llm.model": self.model_name}):
+            return await self.model.ainvoke(messages)
+
+    async def get_stream_response(self,body:dict={}, stats: Optional[GenerationStats] = None)-> AsyncIterator[str]:
+        """
+        Стримит текст ответа; если передан stats, заполняет TTFT, usage и время окончания.
+        TTFT, число чанков и usage пишутся в метрики в любом случае.
+        """
         messages = self.get_prompt(body)
-        async for chunk in self.model.astream(messages):
-                if chunk.content:
-                    yield chunk.content
+        if stats is None:
+            stats = GenerationStats()
+        stats.model = self.model_name
+        stats.started_at = time.monotonic()
+        chunks = LLM_STREAMED_CHUNKS.labels(model=stats.model)
+        pulled = 0
+        # Не текущий span: между yield тело генератора выполняется в контексте потребителя
+        span = tracing.start_span("llm_stream", {"llm.model": stats.model})
+        try:
+            # aclosing: при отмене потребителя сразу закрываем HTTP-стрим к модели
+            with STAGE_SECONDS.labels(stage="llm_stream").time():
+                async with aclosing(self.model.astream(messages)) as stream:
+                    async for chunk in stream:
+                        stats.add_usage(getattr(chunk, "usage_metadata", None))
+                        if chunk.content:
+                            if stats.first_token_at is None:
+                                stats.first_token_at = time.monotonic()
+                                LLM_TIME_TO_FIRST_TOKEN.labels(model=stats.model).observe(stats.first_token_at - stats.started_at)
+                                span.add_event("first_token")
+                            chunks.inc()
+                            pulled += 1
+                            yield chunk.content
+        except (GeneratorExit, asyncio.CancelledError):
+            # Потребитель закрыл или отменил стрим (клиент отключился) — сколько текста модель сгенерировала впустую
+            STREAM_WASTED_CHUNKS.labels(model=stats.model).observe(pulled)
+            raise
+        except Exception as e:
+            span.record_exception(e)
+            raise
+        finally:
+            span.set_attributes({
+                "llm.prompt_tokens": stats.prompt_tokens or 0,
+                "llm.completion_tokens": stats.completion_tokens or 0,
+            })
+            span.end()
+        stats.finished_at = time.monotonic()
+        if stats.prompt_tokens:
+            LLM_USAGE_TOKENS.labels(model=stats.model, kind="prompt").inc(stats.prompt_tokens)
+        if stats.completion_tokens:
+            LLM_USAGE_TOKENS.labels(model=stats.model, kind="completion").inc(stats.completion_tokens)
     
     
         
\ No newline at end of file
@@ -1,36 +1,51 @@
-import os
-from langchain_ollama import ChatOllama
+from app.core.config import settings
 from app.services.llm.general import GeneralLLMClient
-from langchain_core.prompts import ChatPromptTemplate
 
 
 class MistralClient(GeneralLLMClient):
     def __init__(self):
-        base_url = os.getenv("OLLAMA_HOST", "http://localhost:11434")
-        
-        model = ChatOllama(model="mistral:7b", temperature=0.7, base_url=base_url)
+        from langchain_ollama import ChatOllama
+        # keep_alive держит модель в памяти между запросами, num_ctx покрывает
+        # весь промпт (инструкции + резюме + вакансия) и ответ без обрезки
+        model = ChatOllama(
+            model=settings.OLLAMA_MODEL,
+            temperature=0.7,
+            base_url=settings.OLLAMA_HOST,
+            keep_alive=settings.OLLAMA_KEEP_ALIVE,
+            num_ctx=settings.OLLAMA_NUM_CTX,
+            num_predict=settings.OLLAMA_NUM_PREDICT,
+        )
         
         super().__init__(model=model)
 
     @property
     def prompt_template(self):
-        human = """
-        У тебя есть:
-        1. Требования к вакансии: {job_requirements}
-        2. Данные из резюме кандидата: {resume_context}
+        # Порядок важен для переиспользования KV-кэша Ollama: сначала статичные
+        # инструкции, затем резюме (одно на CV), и только в конце вакансия.
+        system = """You are a professional HR specialist. Write the cover letter in the language of the job requirements.
 
         Напиши профессиональное сопроводительное письмо разработчика (Backend/Fullstack/Frontend — подставь по контексту).
         Отклик должен показывать конкурентные преимущества и метрики из предыдущих проектов.
 
         Ограничения:
-        - Пиши про достижения, не про 
+        - Пиши про достижения, не про обязанности
         - Используй keywords из вакансии (под ATS)
         - Не используй эмодзи
         - Избегай общих фраз и клише
-        - {language_instruction} Объём 200-300 слов.
+        - Объём 200-300 слов.
+        """
+        human = """
+        Данные из резюме кандидата:
+        {resume_context}
+
+        Требования к вакансии:
+        {job_requirements}
+
+        {language_instruction}
         """
 
+        from langchain_core.prompts import ChatPromptTemplate
         return ChatPromptTemplate.from_messages([
-            ("system", "You are a professional HR specialist. Write the cover letter in the language of the job requirements."),
+            ("system", system),
             ("human", human),
         ])
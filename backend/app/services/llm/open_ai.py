@@ -1,19 +1,17 @@
-from langchain_openai import ChatOpenAI
 from app.services.llm.general import GeneralLLMClient
-from langchain_core.prompts import ChatPromptTemplate
 
 
 class OpenAiClient(GeneralLLMClient):
     def __init__(self):
-        model = ChatOpenAI(model="gpt-4o", temperature=0.7, max_completion_tokens=2000)
+        from langchain_openai import ChatOpenAI
+        # stream_usage: usage приходит последним чанком стрима (GenerationStats)
+        model = ChatOpenAI(model="gpt-4o", temperature=0.7, max_completion_tokens=2000, stream_usage=True)
         super().__init__(model=model)
 
     @property
     def prompt_template(self):
-        human = """
-        У тебя есть:
-        1. Требования к вакансии: {job_requirements}
-        2. Данные из резюме кандидата: {resume_context}
+        # Стабильный префикс (инструкции, затем резюме) попадает в prompt cache OpenAI
+        system = """Ты — профессиональный HR-специалист. Пиши сопроводительное письмо строго на языке вакансии.
 
         Напиши профессиональное сопроводительное письмо разработчика (Backend/Fullstack/Frontend — подставь по контексту).
         Отклик должен показывать конкурентные преимущества и метрики из предыдущих проектов.
@@ -22,11 +20,20 @@ class OpenAiClient(GeneralLLMClient):
         - Используй keywords из вакансии (под ATS)
         - Не используй эмодзи
         - Избегай общих фраз и клише
-        - {language_instruction} Объём 200-300 слов.
+        - Объём 200-300 слов.
+        """
+        human = """
+        Данные из резюме кандидата:
+        {resume_context}
+
+        Требования к вакансии:
+        {job_requirements}
+
+        {language_instruction}
         """
 
+        from langchain_core.prompts import ChatPromptTemplate
         return ChatPromptTemplate.from_messages([
-            ("system", "Ты — профессиональный HR-специалист. Пиши сопроводительное письмо строго на языке вакансии."),
+            ("system", system),
             ("human", human),
         ])
-    
\ No newline at end of file
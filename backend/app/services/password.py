@@ -1,15 +1,74 @@
-# from app.models.user import User
-from sqlalchemy.ext.asyncio import AsyncSession
-from fastapi.security import OAuth2PasswordBearer
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
 
 from passlib.context import CryptContext
 
-pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
+from app.core.config import settings
+from app.core.metrics import QUEUE_WAIT_SECONDS, stage_timer
+
+# min_rounds == max_rounds: любой хэш с другим числом раундов считается устаревшим
+# и перехэшируется при следующем логине (needs_update / verify_and_update)
+pwd_context = CryptContext(
+    schemes=["pbkdf2_sha256"],
+    deprecated="auto",
+    pbkdf2_sha256__default_rounds=settings.PASSWORD_HASH_ROUNDS,
+    pbkdf2_sha256__min_rounds=settings.PASSWORD_HASH_ROUNDS,
+    pbkdf2_sha256__max_rounds=settings.PASSWORD_HASH_ROUNDS,
+)
+
+# Отдельный пул под хэширование, чтобы всплеск логинов не занимал
+# общий threadpool, в котором крутятся sync-эндпоинты
+_hash_executor: Optional[ThreadPoolExecutor] = None
+
+
+def get_hash_executor() -> ThreadPoolExecutor:
+    global _hash_executor
+    if _hash_executor is None:
+        _hash_executor = ThreadPoolExecutor(
+            max_workers=settings.PASSWORD_HASH_WORKERS,
+            thread_name_prefix="password-hash",
+        )
+    return _hash_executor
+
+
+def _run_in_hash_pool(func, *args):
+    """Runs func in the hashing pool; records the wait for a free worker and the hashing time."""
+    submitted = time.monotonic()
+
+    def _call():
+        QUEUE_WAIT_SECONDS.labels(queue="password_hash").observe(time.monotonic() - submitted)
+        with stage_timer("password_hash"):
+            return func(*args)
+
+    return asyncio.get_running_loop().run_in_executor(get_hash_executor(), _call)
+
+
+def shutdown_hash_executor() -> None:
+    global _hash_executor
+    if _hash_executor is not None:
+        _hash_executor.shutdown(wait=False, cancel_futures=True)
+        _hash_executor = None
 
 
 class PasswordService:
     def hash_password(self, password: str) -> str:
         return pwd_context.hash(password)
-    
+
     def verify_password(self, password: str, hashed_password: str) -> bool:
-        return pwd_context.verify(password, hashed_password)
\ No newline at end of file
+        return pwd_context.verify(password, hashed_password)
+
+    def needs_rehash(self, hashed_password: str) -> bool:
+        return pwd_context.needs_update(hashed_password)
+
+    async def hash_password_async(self, password: str) -> str:
+        return await _run_in_hash_pool(pwd_context.hash, password)
+
+    async def verify_and_update(self, password: str, hashed_password: str) -> tuple[bool, Optional[str]]:
+        """
+        Verify password in the hashing pool.
+        Returns (verified, new_hash); new_hash is set when the stored hash
+        was made with outdated parameters and should be replaced.
+        """
+        return await _run_in_hash_pool(pwd_context.verify_and_update, password, hashed_password)
@@ -1,81 +1,329 @@
+import asyncio
+import hashlib
+import logging
 import time
-from llama_index.readers.file import PDFReader
-from llama_index.core.node_parser import SentenceSplitter
+from datetime import datetime
+from uuid import NAMESPACE_URL, uuid4, uuid5
 from dotenv import load_dotenv
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.storage.repository.qdrant import QdrantStorage
+from app.core.config import settings
+from app.core.metrics import CV_UPLOAD_DEDUP, CV_UPLOAD_DEDUP_CHUNKS, stage_timer
+from app.models.cv import CV
+from app.schemas.cv import CVDigest
+from app.storage.repository.qdrant import get_async_vector_storage
 from app.repository.cv_repository import CVRepository
-from app.services.embeddings import BaseEmbedder, OpenAIEmbedder
+from app.services.chunking import PROJECTS, SKILLS, Chunk, get_chunking_config, make_chunker
+from app.services.embeddings import BaseEmbedder, get_embedder
+from app.services.llm.digest import CVDigestClient
+from app.services.unit_of_work import UnitOfWork
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+_pdf_reader = None
+
+
+def get_pdf_reader():
+    """
+    llama_index PDFReader; llama_index импортируется при первой загрузке PDF (долгий импорт).
+    Вызывается только из build_points, который работает в потоке: первый импорт
+    не блокирует event loop.
+    """
+    global _pdf_reader
+    if _pdf_reader is None:
+        from llama_index.readers.file import PDFReader
+        _pdf_reader = PDFReader()
+    return _pdf_reader
+
+
 class PdfService():
     def __init__(self, session: AsyncSession = None, embedder: BaseEmbedder = None):
-        self.reader = PDFReader()
-        self.embedder: BaseEmbedder = embedder or OpenAIEmbedder()
-        self.storage = QdrantStorage()
-        self.skill_storage = QdrantStorage(collection_name="skills")
-        self.project_storage = QdrantStorage(collection_name="projects")
-        self.splitter = SentenceSplitter(chunk_size=1000, chunk_overlap=0)
+        self.embedder: BaseEmbedder = embedder or get_embedder()
+        self.storage = get_async_vector_storage()
+        self.skill_storage = get_async_vector_storage("skills")
+        self.project_storage = get_async_vector_storage("projects")
+        self.digest_storage = get_async_vector_storage("digests")
+        # Чанки этих разделов дополнительно пишутся в отдельные коллекции
+        self.section_storages = {SKILLS: self.skill_storage, PROJECTS: self.project_storage}
+        # Чанкинг настраивается по коллекциям (settings.CHUNKING)
+        self.chunking = {
+            storage.collection: get_chunking_config(storage.collection)
+            for storage in (self.storage, *self.section_storages.values())
+        }
         self.session = session
         self.cv_repository = CVRepository(session) if session else None
 
-    def upsert_vectors(self,pdf_path:str,original_filename: str,source_id:str,user_id:int,storage = None):
-        """Embedding pdf файла и upsert в векторную БД."""
-        if storage is None:
-            storage = self.storage
-        text_chunks = self._load_and_chunk_pdf(pdf_path)
-        vectors = self.embed_texts(text_chunks)
-        ids = [abs(hash(f"{original_filename}_{source_id}_{i+1}")) for i in range(len(text_chunks))]
-        payloads = [
-            {
-                "user_id":user_id,
-                "text": chunk,
-                "source": pdf_path,
-                "source_id": source_id,
-                "chunk_index": i
-            }
-            for i, chunk in enumerate(text_chunks)
-        ]
-        storage.upsert(ids=ids, vectors=vectors, payloads=payloads)
-    
+    def build_points(self, pdf_path: str, source_id: str, user_id: int, cv_version: str):
+        """
+        Чанкинг и embedding pdf файла.
+        Возвращает тексты и векторы чанков cvs (для профиля) и точки по коллекциям:
+        список (storage, ids, vectors, payloads).
+        """
+        chunks_by_collection = self.chunk_text(self._load_pdf_text(pdf_path))
+        # Одинаковые чанки разных коллекций эмбеддятся один раз
+        texts = list(dict.fromkeys(chunk.text for chunks in chunks_by_collection.values() for chunk in chunks))
+        vector_by_text = dict(zip(texts, self.embed_texts(texts))) if texts else {}
+
+        points = []
+        for storage in (self.storage, *self.section_storages.values()):
+            chunks = chunks_by_collection[storage.collection]
+            points.append((
+                storage,
+                [chunk_point_id(source_id, cv_version, i) for i in range(len(chunks))],
+                [vector_by_text[chunk.text] for chunk in chunks],
+                [
+                    {
+                        "user_id":user_id,
+                        "text": chunk.text,
+                        "section": chunk.section,
+                        "source": pdf_path,
+                        "source_id": source_id,
+                        "cv_version": cv_version,
+                        "chunk_index": i
+                    }
+                    for i, chunk in enumerate(chunks)
+                ],
+            ))
+        _, _, vectors, payloads = points[0]
+        return [payload["text"] for payload in payloads], vectors, points
+
+    def chunk_text(self, text: str) -> dict[str, list[Chunk]]:
+        """
+        Чанки текста CV по коллекциям. Коллекция раздела получает только чанки
+        своего раздела; коллекции с одинаковыми настройками делят одно разбиение.
+        """
+        chunks_by_config: dict = {}
+        chunks_by_collection = {}
+        for collection, config in self.chunking.items():
+            if config not in chunks_by_config:
+                with stage_timer("chunking"):
+                    chunks_by_config[config] = make_chunker(config).chunk(text)
+            chunks = chunks_by_config[config]
+            section = next((name for name, storage in self.section_storages.items() if storage.collection == collection), None)
+            chunks_by_collection[collection] = chunks if section is None else [c for c in chunks if c.section == section]
+        return chunks_by_collection
+
+    async def upsert_vectors(self,pdf_path:str,source_id:str,user_id:int,sections_only:bool=False):
+        """
+        Embedding pdf файла и сразу upsert в векторную БД (без БД метаданных).
+        Точки прежних версий source_id удаляются после записи новых.
+        sections_only — писать только в коллекции разделов (skills, projects).
+        """
+        cv_version = new_cv_version()
+        text_chunks, vectors, points = await asyncio.to_thread(self.build_points, pdf_path, source_id, user_id, cv_version)
+        for storage, point_ids, point_vectors, point_payloads in points:
+            if sections_only and storage is self.storage:
+                continue
+            await storage.upsert(ids=point_ids, vectors=point_vectors, payloads=point_payloads)
+            await storage.delete_by_source_id(source_id, keep_version=cv_version)
+        return text_chunks, vectors
+
+    async def stage_vectors(self, uow: UnitOfWork, pdf_path: str, source_id: str, user_id: int, cv_version: str):
+        """
+        Embedding pdf файла; точки новой версии ставятся в unit of work,
+        точки прежних версий этого source_id удаляются после коммита.
+        Парсинг, чанкинг и синхронный вызов эмбеддингов — в потоке, не в event loop.
+        """
+        text_chunks, vectors, points = await asyncio.to_thread(self.build_points, pdf_path, source_id, user_id, cv_version)
+        self.stage_points(uow, source_id, cv_version, points)
+        return text_chunks, vectors
+
+    def stage_points(self, uow: UnitOfWork, source_id: str, cv_version: str, points: list) -> None:
+        """Ставит точки CV (cvs, skills, projects) новой версии и удаление прежних версий."""
+        for storage, ids, vectors, payloads in points:
+            if ids:
+                uow.stage_upsert(storage, ids, vectors, payloads)
+        for storage in (self.storage, *self.section_storages.values()):
+            uow.stage_delete_by_source_id(storage, source_id, keep_version=cv_version)
 
     async def parse_cv(self, user_id: int, pdf_path: str, source_id: str, filename: str = None,
                     original_filename: str = None, file_size: int = 0, content_type: str = "application/pdf",
                     upload_ip: str = None, user_agent: str = None):
-        """Загружает CV в векторную БД и сохраняет метаданные в PostgreSQL"""
-        # skill parsing
-        self.upsert_vectors(pdf_path, original_filename or filename, source_id, user_id,self.skill_storage)
+        """Разбирает CV по разделам и индексирует навыки и проекты в их коллекциях"""
+        await self.upsert_vectors(pdf_path, source_id, user_id, sections_only=True)
 
     async def add_cv(self, user_id: int, pdf_path: str, source_id: str, filename: str = None,
                     original_filename: str = None, file_size: int = 0, content_type: str = "application/pdf",
-                    upload_ip: str = None, user_agent: str = None):
-        """Загружает CV в векторную БД и сохраняет метаданные в PostgreSQL"""
-        self.upsert_vectors(pdf_path, original_filename or filename, source_id, user_id)
-
-        # Save CV metadata to PostgreSQL if repository is available
-        if self.cv_repository:
-            existing_cv = await self.cv_repository.get_cv_by_source_id(source_id=source_id)
-            if existing_cv is None:
-                await self.cv_repository.create_cv(
-                    user_id=user_id,
-                    source_id=source_id,
-                    filename=filename or pdf_path.split('/')[-1],
-                    original_filename=original_filename or filename,
-                    file_path=pdf_path,
-                    file_size=file_size,
-                    content_type=content_type,
-                    upload_ip=upload_ip,
-                    user_agent=user_agent
-                )
-
-    def _load_and_chunk_pdf(self,path:str):
-        docs = self.reader.load_data(file=path)
-        texts = [d.text for d in docs if getattr(d,"text",None)]
-        chunks = []
-        for t in texts:
-            chunks.extend(self.splitter.split_text(t))
-        return chunks
+                    upload_ip: str = None, user_agent: str = None, content_hash: str = None) -> bool:
+        """
+        Загружает CV в векторную БД и сохраняет метаданные в PostgreSQL.
+        Если пользователь уже загружал файл с тем же content_hash, векторы копируются
+        из существующего CV без парсинга и эмбеддингов. Возвращает True в этом случае.
+        """
+        cv_data = dict(
+            user_id=user_id,
+            source_id=source_id,
+            filename=filename or pdf_path.split('/')[-1],
+            original_filename=original_filename or filename,
+            file_path=pdf_path,
+            file_size=file_size,
+            content_type=content_type,
+            upload_ip=upload_ip,
+            user_agent=user_agent,
+            content_hash=content_hash,
+        )
+
+        if not self.cv_repository:
+            await self.upsert_vectors(pdf_path, source_id, user_id)
+            return False
+
+        # source_id чужого CV не перезаписываем — проверка до записи векторов (и до копирования дубликата)
+        existing = await self.cv_repository.get_cv_by_source_id(source_id=source_id)
+        if existing is not None and existing.user_id != user_id:
+            raise PermissionError(f"source_id {source_id} belongs to another user")
+
+        if content_hash:
+            duplicate = await self.cv_repository.get_cv_by_content_hash(user_id, content_hash)
+            if duplicate is not None and await self._clone_cv(duplicate, cv_data):
+                CV_UPLOAD_DEDUP.labels(result="hit").inc()
+                return True
+            CV_UPLOAD_DEDUP.labels(result="miss").inc()
+
+        cv_version = new_cv_version()
+        async with UnitOfWork(self.session) as uow:
+            text_chunks, vectors = await self.stage_vectors(uow, pdf_path, source_id, user_id, cv_version)
+            cv = await self._get_or_create_cv(cv_data)
+            await self.refresh_digest(uow, cv, text_chunks, vectors, cv_version)
+            await uow.commit()
+        return False
+
+    async def _get_or_create_cv(self, cv_data: dict) -> CV:
+        cv = await self.cv_repository.get_cv_by_source_id(source_id=cv_data["source_id"])
+        if cv is None:
+            cv = await self.cv_repository.create_cv(**cv_data)
+        else:
+            # Новый файл под существующим source_id: метаданные и content_hash должны описывать
+            # то, что сейчас в индексе, иначе дедупликация примет его за прежний файл.
+            # Владелец не меняется. Коммит — в unit of work вызывающей стороны
+            data = {key: value for key, value in cv_data.items() if key not in ("user_id", "source_id")}
+            await self.cv_repository.update_cv(cv, {**data, "updated_at": datetime.now()})
+        return cv
+
+    async def _clone_cv(self, duplicate: CV, cv_data: dict) -> bool:
+        """
+        Копирует точки идентичного CV под новый source_id (и профиль, если он есть).
+        False — копировать нечего, нужна полная загрузка.
+        """
+        source_id = cv_data["source_id"]
+        if duplicate.source_id == source_id:
+            # Тот же файл под тем же source_id: всё уже в индексе
+            return True
+
+        cv_version = new_cv_version()
+        points = []
+        for storage in (self.storage, *self.section_storages.values()):
+            stored = sorted(
+                await storage.get_points_by_source_id(duplicate.source_id),
+                key=lambda point: point.payload.get("chunk_index", 0),
+            )
+            points.append((
+                storage,
+                [chunk_point_id(source_id, cv_version, i) for i in range(len(stored))],
+                [point.vector for point in stored],
+                [
+                    {
+                        **point.payload,
+                        "user_id": cv_data["user_id"],
+                        "source": cv_data["file_path"],
+                        "source_id": source_id,
+                        "cv_version": cv_version,
+                        "chunk_index": i,
+                    }
+                    for i, point in enumerate(stored)
+                ],
+            ))
+        _, chunk_ids, vectors, payloads = points[0]
+        if not chunk_ids:
+            return False
+
+        text_chunks = [payload.get("text", "") for payload in payloads]
+        async with UnitOfWork(self.session) as uow:
+            self.stage_points(uow, source_id, cv_version, points)
+
+            cv = await self._get_or_create_cv(cv_data)
+            # Профиль переносится вместе с хэшем текста — refresh_digest не пойдёт в LLM
+            if duplicate.digest:
+                await self.cv_repository.update_cv(cv, {"digest": duplicate.digest, "digest_hash": duplicate.digest_hash})
+            await self.refresh_digest(uow, cv, text_chunks, vectors, cv_version)
+            await uow.commit()
+
+        CV_UPLOAD_DEDUP_CHUNKS.inc(len(chunk_ids))
+        logger.info("CV %s reuses %d vectors of identical CV %s", source_id, len(chunk_ids), duplicate.source_id)
+        return True
+
+    async def refresh_digest(self, uow: UnitOfWork, cv: CV, text_chunks: list[str],
+                             vectors: list[list[float]], cv_version: str) -> None:
+        """
+        Строит компактный профиль CV (навыки, роли с метриками, технологии),
+        если текст резюме изменился, кладёт его в строку CV и ставит точку профиля
+        в unit of work. Коммит — на вызывающей стороне. Ошибки не прерывают загрузку
+        CV: без профиля генерация работает через поиск по чанкам.
+        """
+        # Профили прежних версий удаляются в любом случае — устаревший профиль хуже, чем никакого
+        uow.stage_delete_by_source_id(self.digest_storage, cv.source_id, keep_version=cv_version)
+        digest_hash = hashlib.sha256("\n".join(text_chunks).encode("utf-8")).hexdigest() if text_chunks else None
+        if cv.digest_hash != digest_hash:
+            # Профиль прежнего текста сбрасываем до перестроения: если оно упадёт,
+            # письма пойдут через поиск по чанкам, а не по профилю старого резюме
+            await self.cv_repository.update_cv(cv, {"digest": None, "digest_hash": None})
+        if not text_chunks:
+            return
+        try:
+            if cv.digest and cv.digest_hash == digest_hash:
+                digest = CVDigest.model_validate_json(cv.digest)
+            else:
+                started = time.monotonic()
+                digest = await self._build_digest(text_chunks)
+                logger.info("Built digest for CV %s in %.2fs", cv.source_id, time.monotonic() - started)
+                await self.cv_repository.update_cv(cv, {"digest": digest.model_dump_json(), "digest_hash": digest_hash})
+            self._stage_digest_point(uow, cv, digest, vectors, cv_version)
+        except Exception:
+            logger.warning("Failed to build digest for CV %s", cv.source_id, exc_info=True)
+
+    async def _build_digest(self, text_chunks: list[str]) -> CVDigest:
+        cv_text = "\n".join(text_chunks)[:settings.CV_DIGEST_MAX_INPUT_CHARS]
+        with stage_timer("digest"):
+            return await CVDigestClient().get_response({"cv_text": cv_text})
+
+    def _stage_digest_point(self, uow: UnitOfWork, cv: CV, digest: CVDigest,
+                            vectors: list[list[float]], cv_version: str) -> None:
+        # Вектор профиля — среднее векторов чанков: без лишнего вызова эмбеддингов
+        dims = len(vectors[0])
+        mean_vector = [sum(vector[i] for vector in vectors) / len(vectors) for i in range(dims)]
+        uow.stage_upsert(
+            self.digest_storage,
+            ids=[digest_point_id(cv.source_id, cv_version)],
+            vectors=[mean_vector],
+            payloads=[{
+                "user_id": cv.user_id,
+                "source_id": cv.source_id,
+                "cv_version": cv_version,
+                "text": digest.to_context(),
+                "digest": digest.model_dump(),
+                "digest_hash": cv.digest_hash,
+            }],
+        )
+
+    def _load_pdf_text(self,path:str) -> str:
+        with stage_timer("pdf_parse"):
+            docs = get_pdf_reader().load_data(file=path)
+        # Страницы склеиваются: раздел резюме может продолжаться на следующей странице
+        return "\n".join(d.text for d in docs if getattr(d,"text",None))
     
     def embed_texts(self, texts: list[str]) -> list[list[float]]:
-        return self.embedder.embed_texts(texts)
\ No newline at end of file
+        return self.embedder.embed_texts(texts)
+
+
+def new_cv_version() -> str:
+    """Версия набора точек CV: каждая загрузка пишет точки под новой версией."""
+    return uuid4().hex
+
+
+def chunk_point_id(source_id, cv_version: str, chunk_index: int) -> str:
+    return str(uuid5(NAMESPACE_URL, f"cv-chunk:{source_id}:{cv_version}:{chunk_index}"))
+
+
+def digest_point_id(source_id, cv_version: str) -> str:
+    """Один профиль на версию CV: id точки в коллекции digests выводится из source_id и версии."""
+    return str(uuid5(NAMESPACE_URL, f"cv-digest:{source_id}:{cv_version}"))
@@ -0,0 +1,91 @@
+import logging
+from typing import Optional
+
+from sqlmodel import Session
+
+from app.storage.repository.qdrant import AsyncQdrantStorage
+
+logger = logging.getLogger(__name__)
+
+
+class UnitOfWork:
+    """
+    Согласованное изменение CV в PostgreSQL и Qdrant с одной точкой коммита.
+
+    Изменения векторов только накапливаются, а применяются в commit():
+      1. новые точки пишутся одним upsert на коллекцию (id точек версионированы,
+         старые версии при этом не затрагиваются);
+      2. коммит сессии БД;
+      3. удаление старых точек — только после успешного коммита.
+    Если upsert или коммит падает, выполняются компенсации (удаление только что
+    записанных точек) и откат сессии — копировать старые векторы не нужно.
+
+        async with UnitOfWork(session) as uow:
+            uow.stage_upsert(storage, ids, vectors, payloads)
+            uow.stage_delete_by_source_id(storage, old_source_id)
+            await uow.commit()
+    """
+
+    def __init__(self, session: Session):
+        self.session = session
+        self._upserts: dict[str, tuple[AsyncQdrantStorage, list, list, list]] = {}
+        self._deletes: dict[str, tuple[AsyncQdrantStorage, list[tuple[int, Optional[str]]]]] = {}
+        self._committed = False
+
+    async def __aenter__(self) -> "UnitOfWork":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> bool:
+        if exc_type is not None and not self._committed:
+            self.rollback()
+        return False
+
+    def stage_upsert(self, storage: AsyncQdrantStorage, ids: list, vectors: list, payloads: list) -> None:
+        _, staged_ids, staged_vectors, staged_payloads = self._upserts.setdefault(
+            storage.collection, (storage, [], [], [])
+        )
+        staged_ids.extend(ids)
+        staged_vectors.extend(vectors)
+        staged_payloads.extend(payloads)
+
+    def stage_delete_by_source_id(self, storage: AsyncQdrantStorage, source_id, keep_version: Optional[str] = None) -> None:
+        """After commit, delete points of source_id except those of keep_version."""
+        _, selectors = self._deletes.setdefault(storage.collection, (storage, []))
+        selectors.append((source_id, keep_version))
+
+    async def commit(self) -> None:
+        written: list[tuple[AsyncQdrantStorage, list]] = []
+        try:
+            for storage, ids, vectors, payloads in self._upserts.values():
+                # Компенсацию регистрируем до вызова: upsert мог записать часть точек и упасть
+                written.append((storage, ids))
+                await storage.upsert(ids=ids, vectors=vectors, payloads=payloads)
+            self.session.commit()
+        except Exception:
+            await self._compensate(written)
+            self.rollback()
+            raise
+        self._committed = True
+        self._upserts.clear()
+        await self._apply_deletes()
+
+    def rollback(self) -> None:
+        self.session.rollback()
+        self._upserts.clear()
+        self._deletes.clear()
+
+    async def _compensate(self, written: list[tuple[AsyncQdrantStorage, list]]) -> None:
+        for storage, ids in written:
+            try:
+                await storage.delete_points(ids)
+            except Exception:
+                logger.error("Failed to remove %d staged points from %s", len(ids), storage.collection, exc_info=True)
+
+    async def _apply_deletes(self) -> None:
+        # БД уже закоммичена: неудачное удаление оставляет лишь устаревшие точки, не ломая данные
+        for storage, selectors in self._deletes.values():
+            try:
+                await storage.delete_by_source_ids(selectors)
+            except Exception:
+                logger.error("Failed to delete outdated points from %s: %s", storage.collection, selectors, exc_info=True)
+        self._deletes.clear()
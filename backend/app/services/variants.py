@@ -0,0 +1,60 @@
+import asyncio
+from typing import Optional
+from uuid import uuid4
+
+
+class VariantRun:
+    """
+    Набор параллельных генераций одного письма (варианты).
+
+    Каждый вариант — отдельная asyncio-задача; после выбора клиентом
+    одного варианта остальные задачи отменяются.
+    """
+
+    def __init__(self, owner: str, count: int):
+        self.id = uuid4().hex
+        self.owner = owner
+        self.count = count
+        self.tasks: dict[int, asyncio.Task] = {}
+        self.selected: Optional[int] = None
+
+    def select(self, variant_id: int) -> None:
+        """Keep variant_id running and cancel every other variant."""
+        if variant_id not in range(self.count):
+            raise ValueError(f"Unknown variant id: {variant_id}")
+        self.selected = variant_id
+        for vid, task in self.tasks.items():
+            if vid != variant_id:
+                task.cancel()
+
+    def cancel(self) -> None:
+        """Cancel all variants that are still running."""
+        for task in self.tasks.values():
+            task.cancel()
+
+
+class VariantRegistry:
+    """In-process registry of running variant generations (per worker)."""
+
+    def __init__(self):
+        self._runs: dict[str, VariantRun] = {}
+
+    def add(self, run: VariantRun) -> VariantRun:
+        """Registers a run for the lifetime of its stream; the stream discards it when it ends."""
+        self._runs[run.id] = run
+        return run
+
+    def get(self, run_id: str) -> Optional[VariantRun]:
+        return self._runs.get(run_id)
+
+    def discard(self, run_id: str) -> None:
+        self._runs.pop(run_id, None)
+
+
+_variant_registry = None
+
+def get_variant_registry() -> VariantRegistry:
+    global _variant_registry
+    if _variant_registry is None:
+        _variant_registry = VariantRegistry()
+    return _variant_registry
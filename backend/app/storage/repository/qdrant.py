@@ -1,74 +1,171 @@
-from qdrant_client import QdrantClient
-from qdrant_client.models import VectorParams, Distance,PointStruct
+import asyncio
+import logging
+from typing import TYPE_CHECKING, Optional, Sequence
 from app.core.config import settings
+from app.core.metrics import stage_timer
+
+# qdrant_client импортируется при первом использовании: импорт пакета занимает
+# больше секунды и не должен замедлять старт процесса (benchmarks/import_time.py)
+if TYPE_CHECKING:
+    from qdrant_client import AsyncQdrantClient, QdrantClient
+    from qdrant_client.models import Filter
+
+logger = logging.getLogger(__name__)
+
+# Коллекции CV: чанки резюме, навыки, проекты и профили (digest)
+CV_COLLECTIONS = ("cvs", "skills", "projects", "digests")
+
+# Payload-индексы для фильтров: выборка по source_id и разделу, фильтр по пользователю и версии
+# Значения — PayloadSchemaType
+PAYLOAD_INDEXES = {
+    "source_id": "keyword",
+    "user_id": "integer",
+    "cv_version": "keyword",
+    "section": "keyword",
+}
+
+
+def _client_options() -> dict:
+    return {
+        "api_key": settings.QDRANT_API_KEY or None,
+        "prefer_grpc": settings.QDRANT_PREFER_GRPC,
+        "grpc_port": settings.QDRANT_GRPC_PORT,
+    }
+
+
+def _source_filter(source_id) -> "Filter":
+    from qdrant_client.models import FieldCondition, Filter, MatchValue
+    return Filter(must=[FieldCondition(key="source_id", match=MatchValue(value=source_id))])
+
+
+def _search_filter(source_id=None, section: Optional[str] = None) -> Optional["Filter"]:
+    from qdrant_client.models import FieldCondition, Filter, MatchValue
+    conditions = []
+    if source_id is not None:
+        conditions.append(FieldCondition(key="source_id", match=MatchValue(value=source_id)))
+    if section is not None:
+        conditions.append(FieldCondition(key="section", match=MatchValue(value=section)))
+    return Filter(must=conditions) if conditions else None
+
+
+def _source_selectors_filter(selectors: list[tuple[int, Optional[str]]]) -> "Filter":
+    from qdrant_client.models import FieldCondition, Filter, MatchValue
+    return Filter(
+        should=[
+            Filter(
+                must=[FieldCondition(key="source_id", match=MatchValue(value=source_id))],
+                must_not=[FieldCondition(key="cv_version", match=MatchValue(value=keep_version))]
+                if keep_version else None,
+            )
+            for source_id, keep_version in selectors
+        ]
+    )
+
+
+def _search_result(points) -> dict:
+    contexts = []
+    sources = []
+    for r in points:
+        payload = getattr(r,"payload",None) or {}
+        text = payload.get("text","")
+        if text:
+            contexts.append(text)
+            sources.append(payload)
+    return {"contexts":contexts, "sources":sources}
+
+
+def _as_list(vectors) -> list:
+    # numpy-массив (n, dim) конвертируется одним вызовом, без поточечных объектов
+    return vectors.tolist() if hasattr(vectors, "tolist") else list(vectors)
 
 
 class QdrantStorage():
-    def __init__(self,url=settings.QDRANT_URL, collection_name:str = "cvs",dim=3072):
-        print("qdrant init")
-        self.client = QdrantClient(url=url)
+    """
+    Синхронный handle коллекции (скрипты, переиндексация). Конструктор не ходит
+    в сеть: коллекции и индексы создаются один раз в ensure_collections().
+    """
+    def __init__(self,url=settings.QDRANT_URL, collection_name:str = "cvs", client: Optional["QdrantClient"] = None):
+        if client is None:
+            from qdrant_client import QdrantClient
+            client = QdrantClient(url=url, **_client_options())
+        self.client = client
         self.collection = collection_name
-        if not self.client.collection_exists(collection_name=collection_name):
-            self.client.create_collection(
-                collection_name=collection_name,
-                vectors_config=VectorParams(size=dim, distance=Distance.COSINE),
+
+    def upsert(self, ids: Sequence, vectors, payloads: Sequence[dict], wait: bool = True):
+        """
+        Bulk upsert. vectors — список векторов или numpy-массив (n, dim).
+        Небольшие наборы уходят одним columnar-запросом (Batch), большие —
+        через upload_collection пачками QDRANT_UPSERT_BATCH_SIZE.
+        wait=False — не ждать индексации (eventual consistency).
+        """
+        if len(ids) == 0:
+            return
+        from qdrant_client.models import Batch
+        batch_size = settings.QDRANT_UPSERT_BATCH_SIZE
+        with stage_timer("vector_upsert", {"qdrant.collection": self.collection}):
+            if len(ids) <= batch_size:
+                self.client.upsert(
+                    collection_name=self.collection,
+                    points=Batch(ids=list(ids), vectors=_as_list(vectors), payloads=list(payloads)),
+                    wait=wait,
+                )
+                return
+            self.client.upload_collection(
+                collection_name=self.collection,
+                vectors=vectors,
+                payload=payloads,
+                ids=ids,
+                batch_size=batch_size,
+                parallel=settings.QDRANT_UPSERT_PARALLEL,
+                wait=wait,
             )
-    def upsert(self,ids,vectors,payloads):
-        points = [PointStruct(id=ids[i],vector=vectors[i],payload=payloads[i]) for i in range(len(ids))]
-        self.client.upsert(collection_name=self.collection,points=points)
-    def search(self,query_vector,top_k:int=5):
-        results = self.client.query_points(
-            collection_name=self.collection,
-            query=query_vector,
-            with_payload=True,
-            limit=top_k
-        ).points
-
-        contexts = []
-        sources = []
-
-        for r in results:
-            payload = getattr(r,"payload",None) or {}
-            text = payload.get("text","")
-            if text:
-                contexts.append(text)
-                sources.append(payload)
-        return {"contexts":contexts, "sources":sources}
+
+    def search(self,query_vector,top_k:int=5,source_id=None,section:Optional[str]=None):
+        """Top-k по вектору; source_id/section фильтруются на стороне Qdrant"""
+        with stage_timer("vector_search", {"qdrant.collection": self.collection}):
+            results = self.client.query_points(
+                collection_name=self.collection,
+                query=query_vector,
+                query_filter=_search_filter(source_id, section),
+                with_payload=True,
+                limit=top_k
+            ).points
+        return _search_result(results)
     
-    def delete_by_source_id(self, source_id: int):
-        """Delete all points with given source_id"""
-        from qdrant_client.models import Filter, FieldCondition, MatchValue
-        
-        self.client.delete(
-            collection_name=self.collection,
-            points_selector=Filter(
-                must=[
-                    FieldCondition(
-                        key="source_id",
-                        match=MatchValue(value=source_id)
-                    )
-                ]
+    def delete_by_source_id(self, source_id: int, keep_version: Optional[str] = None):
+        """Delete all points with given source_id (except points of keep_version)"""
+        self.delete_by_source_ids([(source_id, keep_version)])
+
+    def delete_by_source_ids(self, selectors: list[tuple[int, Optional[str]]]):
+        """
+        Delete points of several sources in one request.
+        selectors — пары (source_id, keep_version); точки keep_version не удаляются.
+        """
+        if not selectors:
+            return
+        with stage_timer("vector_delete", {"qdrant.collection": self.collection}):
+            self.client.delete(
+                collection_name=self.collection,
+                points_selector=_source_selectors_filter(selectors),
             )
-        )
+
+    def delete_points(self, ids: list):
+        """Delete points by id"""
+        if ids:
+            from qdrant_client.models import PointIdsList
+            with stage_timer("vector_delete", {"qdrant.collection": self.collection}):
+                self.client.delete(collection_name=self.collection, points_selector=PointIdsList(points=ids))
 
     def get_points_by_source_id(self, source_id: int):
-        """Get all points for potential rollback"""
-        from qdrant_client.models import Filter, FieldCondition, MatchValue
-        
-        results = self.client.scroll(
-            collection_name=self.collection,
-            scroll_filter=Filter(
-                must=[
-                    FieldCondition(
-                        key="source_id",
-                        match=MatchValue(value=source_id)
-                    )
-                ]
-            ),
-            limit=10000,
-            with_payload=True,
-            with_vectors=True
-        )
+        """Get all points (with vectors) of a source"""
+        with stage_timer("vector_scroll", {"qdrant.collection": self.collection}):
+            results = self.client.scroll(
+                collection_name=self.collection,
+                scroll_filter=_source_filter(source_id),
+                limit=10000,
+                with_payload=True,
+                with_vectors=True
+            )
         return results[0] 
 
 
@@ -79,3 +176,152 @@ def get_vector_storage() -> QdrantStorage:
     if _vector_storage is None:
         _vector_storage = QdrantStorage()
     return _vector_storage
+
+
+class AsyncQdrantStorage():
+    """
+    Асинхронный вариант QdrantStorage для кода, работающего в event loop
+    (эндпоинты, стриминг писем, unit of work): те же методы, но корутины.
+    Все экземпляры делят один AsyncQdrantClient с пулом соединений;
+    конструктор сетевых вызовов не делает (схема — в ensure_collections).
+    """
+
+    def __init__(self, collection_name: str = "cvs", client: Optional["AsyncQdrantClient"] = None):
+        self.client = client or get_async_qdrant_client()
+        self.collection = collection_name
+
+    async def upsert(self, ids: Sequence, vectors, payloads: Sequence[dict], wait: bool = True):
+        """
+        Bulk upsert: пачки QDRANT_UPSERT_BATCH_SIZE отправляются параллельно
+        (до QDRANT_ASYNC_UPSERT_CONCURRENCY). wait=False — не ждать индексации.
+        """
+        if len(ids) == 0:
+            return
+        from qdrant_client.models import Batch
+        batch_size = settings.QDRANT_UPSERT_BATCH_SIZE
+        slots = asyncio.Semaphore(settings.QDRANT_ASYNC_UPSERT_CONCURRENCY)
+        vectors = _as_list(vectors)
+
+        async def _send(start: int) -> None:
+            async with slots:
+                await self.client.upsert(
+                    collection_name=self.collection,
+                    points=Batch(
+                        ids=list(ids[start:start + batch_size]),
+                        vectors=vectors[start:start + batch_size],
+                        payloads=list(payloads[start:start + batch_size]),
+                    ),
+                    wait=wait,
+                )
+
+        with stage_timer("vector_upsert", {"qdrant.collection": self.collection}):
+            await asyncio.gather(*(_send(start) for start in range(0, len(ids), batch_size)))
+
+    async def search(self, query_vector, top_k: int = 5, source_id=None, section: Optional[str] = None):
+        """Top-k по вектору; source_id/section фильтруются на стороне Qdrant"""
+        with stage_timer("vector_search", {"qdrant.collection": self.collection}):
+            response = await self.client.query_points(
+                collection_name=self.collection,
+                query=query_vector,
+                query_filter=_search_filter(source_id, section),
+                with_payload=True,
+                limit=top_k,
+            )
+        return _search_result(response.points)
+
+    async def delete_by_source_id(self, source_id: int, keep_version: Optional[str] = None):
+        """Delete all points with given source_id (except points of keep_version)"""
+        await self.delete_by_source_ids([(source_id, keep_version)])
+
+    async def delete_by_source_ids(self, selectors: list[tuple[int, Optional[str]]]):
+        """Delete points of several sources in one request, see QdrantStorage.delete_by_source_ids"""
+        if not selectors:
+            return
+        with stage_timer("vector_delete", {"qdrant.collection": self.collection}):
+            await self.client.delete(
+                collection_name=self.collection,
+                points_selector=_source_selectors_filter(selectors),
+            )
+
+    async def delete_points(self, ids: list):
+        """Delete points by id"""
+        if ids:
+            from qdrant_client.models import PointIdsList
+            with stage_timer("vector_delete", {"qdrant.collection": self.collection}):
+                await self.client.delete(collection_name=self.collection, points_selector=PointIdsList(points=ids))
+
+    async def get_points_by_source_id(self, source_id: int):
+        """Get all points (with vectors) of a source"""
+        with stage_timer("vector_scroll", {"qdrant.collection": self.collection}):
+            points, _ = await self.client.scroll(
+                collection_name=self.collection,
+                scroll_filter=_source_filter(source_id),
+                limit=10000,
+                with_payload=True,
+                with_vectors=True,
+            )
+        return points
+
+
+_async_client: Optional["AsyncQdrantClient"] = None
+_async_storages: dict[str, AsyncQdrantStorage] = {}
+
+def get_async_qdrant_client() -> "AsyncQdrantClient":
+    global _async_client
+    if _async_client is None:
+        from qdrant_client import AsyncQdrantClient
+        _async_client = AsyncQdrantClient(
+            url=settings.QDRANT_URL,
+            pool_size=settings.QDRANT_POOL_SIZE,
+            timeout=settings.QDRANT_TIMEOUT,
+            **_client_options(),
+        )
+    return _async_client
+
+
+def get_async_vector_storage(collection_name: str = "cvs") -> AsyncQdrantStorage:
+    storage = _async_storages.get(collection_name)
+    if storage is None:
+        storage = _async_storages[collection_name] = AsyncQdrantStorage(collection_name=collection_name)
+    return storage
+
+
+async def close_async_qdrant_client() -> None:
+    global _async_client
+    if _async_client is not None:
+        await _async_client.close()
+        _async_client = None
+    _async_storages.clear()
+
+
+async def ensure_collections(dim: int, collections: Sequence[str] = CV_COLLECTIONS,
+                             client: Optional["AsyncQdrantClient"] = None) -> None:
+    """
+    Bootstrap схемы при старте приложения: создаёт недостающие коллекции
+    и payload-индексы. Размер векторов существующей коллекции сверяется с
+    размерностью эмбеддера — при расхождении RuntimeError (приложение не стартует,
+    вместо ошибок upsert/search в рантайме).
+    """
+    from qdrant_client.models import Distance, PayloadSchemaType, VectorParams
+    client = client or get_async_qdrant_client()
+    for name in collections:
+        if not await client.collection_exists(collection_name=name):
+            await client.create_collection(
+                collection_name=name,
+                vectors_config=VectorParams(size=dim, distance=Distance.COSINE),
+            )
+            logger.info("Created Qdrant collection %s (dim=%d)", name, dim)
+        info = await client.get_collection(collection_name=name)
+        vectors = info.config.params.vectors
+        size = vectors.size if isinstance(vectors, VectorParams) else None
+        if size != dim:
+            raise RuntimeError(
+                f"Qdrant collection {name!r} has vector size {size}, but the embedder produces {dim}. "
+                f"Recreate the collection or switch EMBEDDING_PROVIDER."
+            )
+        existing = info.payload_schema or {}
+        for field_name, schema in PAYLOAD_INDEXES.items():
+            if field_name not in existing:
+                await client.create_payload_index(
+                    collection_name=name, field_name=field_name, field_schema=PayloadSchemaType(schema), wait=True,
+                )
@@ -0,0 +1,160 @@
+"""
+Retrieval quality vs. cost of chunking settings (size, overlap, strategy).
+
+For every chunking config the sample CVs from benchmarks/data/cvs are chunked,
+embedded and upserted into a fresh Qdrant collection. Then each job description
+from benchmarks/data/jobs.json is used as a query against its CV (source_id filter,
+as in LetterService). Reported per config:
+
+  recall@k      share of the job's relevant CV facts found in the top-k chunks
+  prompt tok    tokens of job + retrieved resume context, i.e. prompt size per letter
+  points        vectors in the index, bytes  ≈ vectors + payload size
+  ingest s      chunking + embedding + upsert time for the whole corpus
+
+By default everything runs offline: HashingEmbedder and in-memory Qdrant.
+Use --embedder openai|ollama and --qdrant-url for real numbers.
+
+    python -m benchmarks.chunking
+    python -m benchmarks.chunking --configs sentence:1000:0 section:400:40 section:200:20 --k 3 5
+    python -m benchmarks.chunking --embedder openai --qdrant-url http://localhost:6333 --json
+"""
+import argparse
+import json
+import time
+from pathlib import Path
+
+from qdrant_client import QdrantClient
+from qdrant_client.models import Distance, VectorParams
+
+from app.services.chunking import ChunkingConfig, make_chunker
+from app.storage.repository.qdrant import QdrantStorage
+from benchmarks.fakes import HashingEmbedder
+
+DATA_DIR = Path(__file__).parent / "data"
+COLLECTION = "bench_chunking"
+
+DEFAULT_CONFIGS = [
+    "sentence:1000:0",
+    "sentence:400:40",
+    "section:800:80",
+    "section:400:40",
+    "section:200:20",
+    "section:128:0",
+]
+
+
+def load_corpus() -> tuple[dict[str, str], list[dict]]:
+    cvs = {path.stem: path.read_text(encoding="utf-8") for path in sorted((DATA_DIR / "cvs").glob("*.txt"))}
+    jobs = json.loads((DATA_DIR / "jobs.json").read_text(encoding="utf-8"))
+    return cvs, jobs
+
+
+def make_embedder(name: str):
+    if name == "hashing":
+        return HashingEmbedder()
+    if name == "openai":
+        from app.services.embeddings import OpenAIEmbedder
+        return OpenAIEmbedder()
+    from app.services.embeddings import LocalMistralEmbedder
+    return LocalMistralEmbedder()
+
+
+def token_counter():
+    """tiktoken cl100k_base when available, otherwise ~4 characters per token."""
+    try:
+        import tiktoken
+        encoding = tiktoken.get_encoding("cl100k_base")
+        return (lambda text: len(encoding.encode(text))), "cl100k_base"
+    except Exception:
+        return (lambda text: max(1, len(text) // 4)), "chars/4"
+
+
+def run_config(config: ChunkingConfig, cvs: dict[str, str], jobs: list[dict], embedder,
+               client: QdrantClient, ks: list[int], count_tokens) -> dict:
+    if client.collection_exists(COLLECTION):
+        client.delete_collection(COLLECTION)
+    client.create_collection(COLLECTION, vectors_config=VectorParams(size=embedder.dimensions, distance=Distance.COSINE))
+    storage = QdrantStorage(collection_name=COLLECTION, client=client)
+    chunker = make_chunker(config)
+
+    started = time.perf_counter()
+    points = 0
+    payload_bytes = 0
+    for source_id, text in cvs.items():
+        chunks = chunker.chunk(text)
+        payloads = [
+            {"source_id": source_id, "text": chunk.text, "section": chunk.section, "chunk_index": i}
+            for i, chunk in enumerate(chunks)
+        ]
+        storage.upsert(
+            ids=list(range(points, points + len(chunks))),
+            vectors=embedder.embed_texts([chunk.text for chunk in chunks]),
+            payloads=payloads,
+        )
+        points += len(chunks)
+        payload_bytes += sum(len(json.dumps(payload, ensure_ascii=False).encode("utf-8")) for payload in payloads)
+    ingest_s = time.perf_counter() - started
+
+    result = {
+        "config": str(config),
+        "points": points,
+        "points_per_cv": round(points / len(cvs), 1),
+        "index_kb": round((points * embedder.dimensions * 4 + payload_bytes) / 1024, 1),
+        "ingest_s": round(ingest_s, 3),
+    }
+    for k in ks:
+        recalls, prompt_tokens = [], []
+        for job in jobs:
+            query = embedder.embed_texts([job["job"]])[0]
+            contexts = storage.search(query_vector=query, top_k=k, source_id=job["cv"])["contexts"]
+            retrieved = "\n".join(contexts).lower()
+            found = sum(1 for fact in job["relevant"] if fact.lower() in retrieved)
+            recalls.append(found / len(job["relevant"]))
+            # Контекст резюме в промпте письма — маркированный список чанков (LetterService)
+            resume_context = "\n\n".join(f"- {c}" for c in contexts)
+            prompt_tokens.append(count_tokens(job["job"]) + count_tokens(resume_context))
+        result[f"recall@{k}"] = round(sum(recalls) / len(recalls), 3)
+        result[f"prompt_tokens@{k}"] = round(sum(prompt_tokens) / len(prompt_tokens))
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--configs", nargs="+", default=DEFAULT_CONFIGS, help="chunking specs strategy:size:overlap")
+    parser.add_argument("--k", type=int, nargs="+", default=[3, 5])
+    parser.add_argument("--embedder", choices=["hashing", "openai", "ollama"], default="hashing")
+    parser.add_argument("--qdrant-url", help="Qdrant server; in-memory Qdrant when omitted")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    cvs, jobs = load_corpus()
+    embedder = make_embedder(args.embedder)
+    client = QdrantClient(url=args.qdrant_url) if args.qdrant_url else QdrantClient(":memory:")
+    count_tokens, tokenizer = token_counter()
+
+    results = [
+        run_config(ChunkingConfig.parse(spec), cvs, jobs, embedder, client, args.k, count_tokens)
+        for spec in args.configs
+    ]
+    if args.qdrant_url:
+        client.delete_collection(COLLECTION)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{len(cvs)} CVs, {len(jobs)} jobs, embedder={args.embedder}, tokens={tokenizer}\n")
+    header = f"{'config':<18} {'points':>6} {'per CV':>6} {'index KB':>9} {'ingest s':>8}"
+    for k in args.k:
+        header += f" {f'recall@{k}':>9} {f'prompt tok@{k}':>14}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        line = f"{r['config']:<18} {r['points']:>6} {r['points_per_cv']:>6} {r['index_kb']:>9} {r['ingest_s']:>8}"
+        for k in args.k:
+            line += f" {r[f'recall@{k}']:>9} {r[f'prompt_tokens@{k}']:>14}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+"""
+End-to-end latency of the streaming letter endpoints.
+
+Boots the real FastAPI app (lifespan, auth middleware, write-behind writer)
+under uvicorn in-process, with deterministic local stand-ins: FakeLLM with a
+configurable time to first token and token rate, HashingEmbedder, in-memory
+Qdrant and SQLite. A seeded user with a JWT drives the SSE endpoint with N
+requests at concurrency C from a separate thread (own event loop), while the
+server loop is sampled for lag. Reported:
+
+  ttft ms       request start → first delta event, p50/p95/p99
+  total ms      request start → [DONE], p50/p95/p99
+  tokens/s      per-stream delivery rate after the first token (mean)
+  loop lag ms   event loop lag of the server loop, p99/max
+
+    python -m benchmarks.e2e_latency
+    python -m benchmarks.e2e_latency --endpoint url --requests 200 --concurrency 50 --ttft-ms 500
+    python -m benchmarks.e2e_latency --json --output before.json   # diff JSON between commits
+"""
+import os
+import tempfile
+
+# Настройки читаются при импорте app — окружение бенчмарка выставляем до него
+_TMP_DIR = tempfile.mkdtemp(prefix="bench-e2e-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_TMP_DIR}/bench.db"
+os.environ["QDRANT_BOOTSTRAP_ON_STARTUP"] = "false"
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+
+import argparse
+import asyncio
+import json
+import logging
+import socket
+import statistics
+import subprocess
+import time
+import warnings
+from pathlib import Path
+
+import httpx
+import uvicorn
+from fastapi import Depends
+from qdrant_client import AsyncQdrantClient
+from sqlmodel import Session
+
+from app.database import engine, get_db, init_db
+from app.main import app
+from app.api.v1.endpoints.letter import get_letter_service
+from app.core.preload import wait_preloaded
+from app.models.cv import CV
+from app.models.user import User
+from app.services.jwt import JwtService
+from app.services.letter import LetterService
+from app.services.pdf import PdfService
+import app.storage.repository.qdrant as qdrant_repository
+from app.storage.repository.qdrant import AsyncQdrantStorage, ensure_collections
+from benchmarks.fakes import FakeLLM, HashingEmbedder
+from benchmarks.password_hashing import _loop_lag, _percentile
+
+DATA_DIR = Path(__file__).parent / "data"
+SOURCE_ID = 1
+JOB_TITLE = "Senior Python Backend Engineer"
+JOB_DESCRIPTION = (
+    "You will design high-load payment APIs with FastAPI, work with PostgreSQL and Kafka, "
+    "care about latency and idempotency, and take part in on-call."
+)
+
+
+class BenchLetterService(LetterService):
+    """LetterService, у которого разбор вакансии по URL — задержка вместо web search"""
+    parse_delay_ms: float = 0.0
+
+    async def _extract_job_requirements(self, job_url: str) -> str:
+        await asyncio.sleep(self.parse_delay_ms / 1000)
+        return f"{JOB_TITLE}\n{JOB_DESCRIPTION}"
+
+
+async def seed(embedder: HashingEmbedder, client: AsyncQdrantClient) -> str:
+    """User, CV row and CV vectors; returns the user's access token."""
+    init_db()
+    with Session(engine) as session:
+        user = User(email="bench@example.com", password_hash="-", first_name="Bench", last_name="User")
+        session.add(user)
+        session.commit()
+        session.refresh(user)
+        session.add(CV(
+            user_id=user.id, source_id=str(SOURCE_ID), filename="cv.pdf", original_filename="cv.pdf",
+            file_size=0, content_type="application/pdf",
+        ))
+        session.commit()
+        user_id, email = user.id, user.email
+
+    await ensure_collections(embedder.dimensions, client=client)
+    text = (DATA_DIR / "cvs" / "backend_en.txt").read_text(encoding="utf-8")
+    # cvs и коллекции разделов (skills, projects), как при загрузке CV
+    for collection, chunks in PdfService(embedder=embedder).chunk_text(text).items():
+        if not chunks:
+            continue
+        await AsyncQdrantStorage(collection_name=collection, client=client).upsert(
+            ids=list(range(len(chunks))),
+            vectors=embedder.embed_texts([chunk.text for chunk in chunks]),
+            payloads=[
+                {"user_id": user_id, "source_id": str(SOURCE_ID), "text": chunk.text, "section": chunk.section, "chunk_index": i}
+                for i, chunk in enumerate(chunks)
+            ],
+        )
+    return JwtService().create_access_token(email, user_id)
+
+
+def _request(endpoint: str) -> tuple[str, dict]:
+    if endpoint == "url":
+        return "/api/v1/letter/url/stream", {"url": "https://jobs.example.com/backend", "source_id": SOURCE_ID}
+    return "/api/v1/letter/text/stream", {"name": JOB_TITLE, "description": JOB_DESCRIPTION, "source_id": SOURCE_ID}
+
+
+async def _stream_once(client: httpx.AsyncClient, path: str, form: dict) -> dict:
+    started = time.perf_counter()
+    ttft = None
+    tokens = 0
+    error = None
+    async with client.stream("POST", path, data=form) as response:
+        if response.status_code != 200:
+            error = f"HTTP {response.status_code}"
+        async for line in response.aiter_lines():
+            if not line.startswith("data: "):
+                continue
+            payload = line[len("data: "):]
+            if payload == "[DONE]":
+                break
+            event = json.loads(payload)
+            if "delta" in event:
+                tokens += 1
+                if ttft is None:
+                    ttft = time.perf_counter() - started
+            elif "error" in event:
+                error = event["error"]
+    total = time.perf_counter() - started
+    return {"ttft": ttft, "total": total, "tokens": tokens, "error": error}
+
+
+async def _drive(base_url: str, token: str, endpoint: str, requests: int, concurrency: int, warmup: int) -> list[dict]:
+    path, form = _request(endpoint)
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, headers={"Authorization": f"Bearer {token}"},
+                                 limits=limits, timeout=None) as client:
+        for _ in range(warmup):
+            await _stream_once(client, path, form)
+
+        async def one() -> dict:
+            async with semaphore:
+                return await _stream_once(client, path, form)
+
+        return await asyncio.gather(*(one() for _ in range(requests)))
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True, cwd=Path(__file__).parent).stdout.strip()
+    except Exception:
+        return None
+
+
+def _summary(values: list[float]) -> dict:
+    if not values:
+        return {"p50": None, "p95": None, "p99": None}
+    return {
+        "p50": round(statistics.median(values), 1),
+        "p95": round(_percentile(values, 95), 1),
+        "p99": round(_percentile(values, 99), 1),
+    }
+
+
+async def run(args) -> dict:
+    embedder = HashingEmbedder()
+    qdrant = AsyncQdrantClient(":memory:")
+    # Общий клиент приложения — тоже in-memory: через него работают коллекции разделов PdfService
+    qdrant_repository._async_client = qdrant
+    storage = AsyncQdrantStorage(client=qdrant)
+    llm = FakeLLM(tokens=args.tokens, tokens_per_s=args.tokens_per_s, ttft_ms=args.ttft_ms)
+    BenchLetterService.parse_delay_ms = args.parse_delay_ms
+    token = await seed(embedder, qdrant)
+
+    async def letter_service(db: Session = Depends(get_db)) -> LetterService:
+        await wait_preloaded()
+        return BenchLetterService(db, llm=llm, storage=storage, pdf_service=PdfService(db, embedder=embedder))
+
+    app.dependency_overrides[get_letter_service] = letter_service
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="on"))
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+
+    lag: list[float] = []
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(_loop_lag(stop, lag))
+    started = time.perf_counter()
+    # Клиент в отдельном потоке со своим loop: лаг меряется только для loop сервера
+    results = await asyncio.to_thread(
+        lambda: asyncio.run(_drive(f"http://127.0.0.1:{port}", token, args.endpoint,
+                                   args.requests, args.concurrency, args.warmup))
+    )
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await lag_task
+
+    server.should_exit = True
+    await server_task
+    app.dependency_overrides.clear()
+    await qdrant.close()
+
+    ok = [r for r in results if r["error"] is None and r["ttft"] is not None]
+    rates = [(r["tokens"] - 1) / (r["total"] - r["ttft"]) for r in ok if r["tokens"] > 1 and r["total"] > r["ttft"]]
+    return {
+        "commit": _commit(),
+        "endpoint": args.endpoint,
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "llm": {"tokens": args.tokens, "tokens_per_s": args.tokens_per_s, "ttft_ms": args.ttft_ms},
+        "errors": len(results) - len(ok),
+        "requests_per_s": round(len(results) / elapsed, 2),
+        "ttft_ms": _summary([r["ttft"] * 1000 for r in ok]),
+        "total_ms": _summary([r["total"] * 1000 for r in ok]),
+        "tokens_per_s": round(statistics.mean(rates), 1) if rates else None,
+        "loop_lag_ms": {
+            "p99": round(_percentile(lag, 99), 1) if lag else 0.0,
+            "max": round(max(lag), 1) if lag else 0.0,
+        },
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--endpoint", choices=["text", "url"], default="text")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--tokens", type=int, default=200, help="tokens per letter")
+    parser.add_argument("--tokens-per-s", type=float, default=50.0, help="fake LLM token rate per stream")
+    parser.add_argument("--ttft-ms", type=float, default=300.0, help="fake LLM time to first token")
+    parser.add_argument("--parse-delay-ms", type=float, default=1000.0, help="job URL parsing time (--endpoint url)")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    parser.add_argument("--output", help="also write JSON results to this file")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    # Локальный Qdrant предупреждает о payload-индексах и проверке версии сервера — для замеров не важно
+    warnings.filterwarnings("ignore", category=UserWarning, module="qdrant_client")
+    warnings.filterwarnings("ignore", category=UserWarning, module="app.storage.repository.qdrant")
+    result = asyncio.run(run(args))
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(result, indent=2) + "\n", encoding="utf-8")
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+
+    print(f"{result['endpoint']} stream, {result['requests']} requests at concurrency {result['concurrency']}, "
+          f"commit {result['commit']}, errors {result['errors']}, {result['requests_per_s']} req/s\n")
+    print(f"{'':<12} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for name in ("ttft_ms", "total_ms"):
+        summary = result[name]
+        print(f"{name:<12} {summary['p50']!s:>8} {summary['p95']!s:>8} {summary['p99']!s:>8}")
+    print(f"\ntokens/s per stream: {result['tokens_per_s']}")
+    print(f"loop lag ms: p99 {result['loop_lag_ms']['p99']}, max {result['loop_lag_ms']['max']}")
+
+
+if __name__ == "__main__":
+    main()
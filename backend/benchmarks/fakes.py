@@ -0,0 +1,97 @@
+"""
+Offline stand-ins for external services used by the benchmarks.
+
+FakeLLM streams a fixed number of tokens with a configurable time to first
+token and token rate, so latency numbers reflect the service, not the model.
+
+HashingEmbedder maps text to a fixed-size vector with the hashing trick over
+word unigrams and character trigrams: deterministic, no network, no model, and
+lexical overlap between a job description and a CV chunk still yields a high
+cosine similarity. Absolute recall differs from a real embedding model, but
+the relative effect of chunking settings is preserved well enough to compare
+configurations.
+"""
+import asyncio
+import hashlib
+import math
+import re
+import time
+from typing import AsyncIterator, Optional
+
+from app.services.embeddings import BaseEmbedder
+from app.services.llm.general import GeneralLLMClient, GenerationStats
+from app.services.llm.mistral import MistralClient
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+class HashingEmbedder(BaseEmbedder):
+    def __init__(self, dimensions: int = 512):
+        self._dimensions = dimensions
+
+    @property
+    def dimensions(self) -> int:
+        return self._dimensions
+
+    def embed_texts(self, texts: list[str]) -> list[list[float]]:
+        return [self._embed(text) for text in texts]
+
+    def _embed(self, text: str) -> list[float]:
+        vector = [0.0] * self._dimensions
+        for feature in self._features(text.lower()):
+            digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+            value = int.from_bytes(digest, "little")
+            # Знак из старшего бита: коллизии хэшей в среднем гасят друг друга
+            vector[value % self._dimensions] += 1.0 if value >> 63 else -1.0
+        norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+        return [x / norm for x in vector]
+
+    @staticmethod
+    def _features(text: str):
+        for word in _WORD.findall(text):
+            yield f"w:{word}"
+            padded = f"#{word}#"
+            for i in range(len(padded) - 2):
+                yield f"c:{padded[i:i + 3]}"
+
+
+class FakeLLM(GeneralLLMClient):
+    """
+    Streaming LLM stand-in: waits ttft_ms, then emits `tokens` words at
+    tokens_per_s. The prompt is rendered with the real letter template, and
+    GenerationStats is filled the same way the real client fills it.
+    """
+
+    prompt_template = MistralClient.prompt_template
+
+    def __init__(self, tokens: int = 200, tokens_per_s: float = 50.0, ttft_ms: float = 300.0,
+                 model_name: str = "fake-llm"):
+        super().__init__(model=None)
+        self.tokens = tokens
+        self.tokens_per_s = tokens_per_s
+        self.ttft_ms = ttft_ms
+        self._model_name = model_name
+
+    @property
+    def model_name(self) -> str:
+        return self._model_name
+
+    async def get_response(self, body: dict = {}):
+        return "".join([delta async for delta in self.get_stream_response(body)])
+
+    async def get_stream_response(self, body: dict = {}, stats: Optional[GenerationStats] = None) -> AsyncIterator[str]:
+        prompt = "".join(str(message.content) for message in self.get_prompt(body))
+        if stats is not None:
+            stats.model = self.model_name
+            stats.started_at = time.monotonic()
+        await asyncio.sleep(self.ttft_ms / 1000)
+        interval = 1 / self.tokens_per_s if self.tokens_per_s > 0 else 0
+        for i in range(self.tokens):
+            if i and interval:
+                await asyncio.sleep(interval)
+            if stats is not None and stats.first_token_at is None:
+                stats.first_token_at = time.monotonic()
+            yield f"word{i} "
+        if stats is not None:
+            stats.add_usage({"input_tokens": len(prompt) // 4, "output_tokens": self.tokens})
+            stats.finished_at = time.monotonic()
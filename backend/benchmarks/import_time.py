@@ -0,0 +1,147 @@
+"""
+Cold start of an API worker: import time of app.main and memory per process.
+
+Every run is a fresh interpreter with `-X importtime -c "import app.main"`
+(no lifespan, no requests), best of --runs is reported:
+
+  import ms       cumulative import time of app.main
+  rss MB          max RSS right after the import
+  preload         time and RSS after PRELOAD_MODULES, i.e. a worker ready to
+                  generate letters (llama_index for CV ingestion is not included)
+  lazy at start   heavy AI/ingestion packages imported by app.main — must be
+                  empty, they are loaded on first use or by the preload thread
+  slowest         modules with the largest cumulative import time
+
+The exit code is 1 when the import or RSS budget is exceeded or a lazy package
+is imported at startup, so the check can run in CI.
+
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --budget-ms 1500 --rss-budget-mb 120 --runs 5
+    python -m benchmarks.import_time --json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# Пакеты, которые не должны импортироваться при старте процесса
+LAZY_PACKAGES = (
+    "llama_index",
+    "langchain_core.language_models",
+    "langchain_ollama",
+    "langchain_openai",
+    "langsmith",
+    "openai",
+    "qdrant_client",
+)
+
+_CHILD = """
+import json, resource, sys, time
+started = time.perf_counter()
+import app.main
+import_ms = (time.perf_counter() - started) * 1000
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+from app.core.config import settings
+from app.core.preload import preload_modules
+started = time.perf_counter()
+preload_modules(settings.PRELOAD_MODULES)
+preload_ms = (time.perf_counter() - started) * 1000
+rss_preload = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({"import_ms": import_ms, "rss": rss, "preload_ms": preload_ms, "rss_preload": rss_preload}))
+"""
+
+
+def _rss_mb(value: int) -> float:
+    # ru_maxrss: килобайты в Linux, байты в macOS
+    return round(value / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _parse_importtime(stderr: str) -> list[tuple[str, int]]:
+    """(module, cumulative µs) for every `import time:` line."""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        modules.append((name.strip(), int(cumulative)))
+    return modules
+
+
+def measure_once(env: dict) -> dict:
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _CHILD],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=False,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Importing app.main failed:\n{completed.stderr[-4000:]}")
+    stats = json.loads(completed.stdout.strip().splitlines()[-1])
+    modules = _parse_importtime(completed.stderr)
+    # Строки importtime идут по завершении импорта: всё до app.main — это импорт app.main
+    main_index = next(i for i, (name, _) in enumerate(modules) if name == "app.main")
+    startup = modules[:main_index + 1]
+    return {
+        "import_ms": round(modules[main_index][1] / 1000, 1),
+        "rss_mb": _rss_mb(stats["rss"]),
+        "preload_ms": round(stats["preload_ms"], 1),
+        "rss_after_preload_mb": _rss_mb(stats["rss_preload"]),
+        "lazy_at_start": sorted({
+            package for name, _ in startup for package in LAZY_PACKAGES
+            if name == package or name.startswith(f"{package}.")
+        }),
+        "slowest": sorted(startup, key=lambda item: item[1], reverse=True),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3, help="fresh interpreters, the fastest run is reported")
+    parser.add_argument("--budget-ms", type=float, default=1500.0, help="max import time of app.main")
+    parser.add_argument("--rss-budget-mb", type=float, default=120.0, help="max RSS after importing app.main")
+    parser.add_argument("--top", type=int, default=15, help="slowest modules to show")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    env = {
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{tempfile.mkdtemp(prefix='bench-import-')}/bench.db",
+        "OPENAI_API_KEY": os.environ.get("OPENAI_API_KEY", "bench"),
+        "PYTHONPATH": str(BACKEND_DIR),
+    }
+    # Первый запуск прогревает .pyc — в замер не входит
+    measure_once(env)
+    result = min((measure_once(env) for _ in range(args.runs)), key=lambda run: run["import_ms"])
+    result["slowest"] = [
+        {"module": name, "cumulative_ms": round(cumulative / 1000, 1)}
+        for name, cumulative in result["slowest"][1:args.top + 1]
+    ]
+    failures = []
+    if result["import_ms"] > args.budget_ms:
+        failures.append(f"import of app.main took {result['import_ms']} ms, budget {args.budget_ms} ms")
+    if result["rss_mb"] > args.rss_budget_mb:
+        failures.append(f"RSS after import is {result['rss_mb']} MB, budget {args.rss_budget_mb} MB")
+    if result["lazy_at_start"]:
+        failures.append(f"imported at startup, must be lazy: {', '.join(result['lazy_at_start'])}")
+    result["budget"] = {"import_ms": args.budget_ms, "rss_mb": args.rss_budget_mb, "failures": failures}
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print(f"import app.main: {result['import_ms']} ms (budget {args.budget_ms}), "
+              f"RSS {result['rss_mb']} MB (budget {args.rss_budget_mb})")
+        print(f"+ preload:       {result['preload_ms']} ms, RSS {result['rss_after_preload_mb']} MB")
+        print(f"lazy at start:   {', '.join(result['lazy_at_start']) or 'none'}\n")
+        print(f"{'module':<50} {'cumulative ms':>14}")
+        for item in result["slowest"]:
+            print(f"{item['module']:<50} {item['cumulative_ms']:>14}")
+        for failure in failures:
+            print(f"\nFAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Login throughput of PasswordService for different pbkdf2 round counts.
+
+For each round count the benchmark verifies a stored hash N times through the
+dedicated hashing pool with C concurrent "logins" and reports logins/s, logins/s
+per worker thread (≈ per core, pbkdf2 releases the GIL) and latency percentiles.
+It also measures event loop lag while the storm is running, to confirm that
+hashing no longer blocks the loop.
+
+    python -m benchmarks.password_hashing
+    python -m benchmarks.password_hashing --rounds 29000 100000 --logins 400 --concurrency 64
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def _loop_lag(stop: asyncio.Event, samples: list[float], interval: float = 0.01) -> None:
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append((time.perf_counter() - started - interval) * 1000)
+
+
+async def run_storm(rounds: int, logins: int, concurrency: int, workers: int) -> dict:
+    # Настройки читаются при импорте модуля — выставляем до него
+    os.environ["PASSWORD_HASH_ROUNDS"] = str(rounds)
+    os.environ["PASSWORD_HASH_WORKERS"] = str(workers)
+    import importlib
+    import app.core.config as config
+    import app.services.password as password
+    importlib.reload(config)
+    importlib.reload(password)
+
+    service = password.PasswordService()
+    stored_hash = service.hash_password("correct horse battery staple")
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+
+    async def login() -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            verified, _ = await service.verify_and_update("correct horse battery staple", stored_hash)
+            latencies.append((time.perf_counter() - started) * 1000)
+            assert verified
+
+    lag: list[float] = []
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(_loop_lag(stop, lag))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await lag_task
+    password.shutdown_hash_executor()
+
+    throughput = logins / elapsed
+    return {
+        "rounds": rounds,
+        "workers": workers,
+        "logins": logins,
+        "concurrency": concurrency,
+        "logins_per_s": round(throughput, 1),
+        "logins_per_s_per_worker": round(throughput / workers, 1),
+        "latency_ms_p50": round(statistics.median(latencies), 1),
+        "latency_ms_p95": round(_percentile(latencies, 95), 1),
+        "latency_ms_p99": round(_percentile(latencies, 99), 1),
+        "loop_lag_ms_max": round(max(lag), 1) if lag else 0.0,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, nargs="+", default=[29000, 100000, 290000])
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, min(4, os.cpu_count() or 1)])
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    results = [
+        asyncio.run(run_storm(rounds, args.logins, args.concurrency, workers))
+        for rounds in args.rounds
+        for workers in sorted(set(args.workers))
+    ]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    header = f"{'rounds':>8} {'workers':>7} {'logins/s':>9} {'per worker':>10} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'lag max':>8}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(
+            f"{r['rounds']:>8} {r['workers']:>7} {r['logins_per_s']:>9} {r['logins_per_s_per_worker']:>10} "
+            f"{r['latency_ms_p50']:>8} {r['latency_ms_p95']:>8} {r['latency_ms_p99']:>8} {r['loop_lag_ms_max']:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,59 @@
+import asyncio
+import hashlib
+import os
+import tempfile
 
+from fastapi import HTTPException, UploadFile
 
-from http.client import HTTPException
+from app.core.config import settings
+
+PDF_MAGIC = b"%PDF-"
+
+
+def _size_error() -> HTTPException:
+    limit_mb = round(settings.CV_MAX_UPLOAD_BYTES / (1024 * 1024), 1)
+    return HTTPException(status_code=400, detail=f"File size must be less than {limit_mb:g}MB")
+
+
+def remove_temp_file(path: str) -> None:
+    if path and os.path.exists(path):
+        os.unlink(path)
 
-from fastapi import UploadFile
 
 async def validate_pdf_and_get_path(file: UploadFile) -> dict:
-    if not file.filename.lower().endswith('.pdf'):
+    """
+    Stream the upload into a temp file chunk by chunk.
+
+    The whole file is never held in memory: size is enforced while copying,
+    the PDF signature is checked on the first chunk and the SHA-256 of the
+    content is computed on the way. The caller owns the returned temp file
+    and must remove it (remove_temp_file).
+    """
+    if not file.filename or not file.filename.lower().endswith('.pdf'):
         raise HTTPException(status_code=400, detail="Only PDF files are allowed")
 
-    # Validate file size (max 10MB)
-    file_content = await file.read()
-    if len(file_content) > 10 * 1024 * 1024:
-        raise HTTPException(status_code=400, detail="File size must be less than 10MB")
+    # Starlette уже знает размер части multipart — отсекаем сразу, без копирования
+    if file.size is not None and file.size > settings.CV_MAX_UPLOAD_BYTES:
+        raise _size_error()
+
+    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.pdf')
+    file_size = 0
+    digest = hashlib.sha256()
+    try:
+        with temp_file:
+            while chunk := await file.read(settings.CV_UPLOAD_CHUNK_SIZE):
+                if file_size == 0 and not chunk.startswith(PDF_MAGIC):
+                    raise HTTPException(status_code=400, detail="File is not a valid PDF")
+                file_size += len(chunk)
+                if file_size > settings.CV_MAX_UPLOAD_BYTES:
+                    raise _size_error()
+                digest.update(chunk)
+                await asyncio.to_thread(temp_file.write, chunk)
 
-    # Save file temporarily
-    import tempfile
-    import os
+        if file_size == 0:
+            raise HTTPException(status_code=400, detail="File is empty")
+    except BaseException:
+        remove_temp_file(temp_file.name)
+        raise
 
-    with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_file:
-        temp_file.write(file_content)
-        temp_file_path = temp_file.name
-    return {"temp_file_path": temp_file_path, "file_content": file_content}
\ No newline at end of file
+    return {"temp_file_path": temp_file.name, "file_size": file_size, "content_hash": digest.hexdigest()}
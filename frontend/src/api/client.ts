@@ -80,5 +80,19 @@ export async function apiRequest<T>(
 // Authenticated API request function (uses axios with auth headers)
 export const authenticatedApiRequest = authApi;
 
+// Cursor-paginated list endpoints return `{ [key]: T[], next_cursor }`:
+// follows next_cursor until the last page and returns all items
+export async function fetchAllPages<T>(endpoint: string, key: string, limit: number): Promise<T[]> {
+  const items: T[] = [];
+  let cursor: string | null = null;
+  do {
+    const params: Record<string, string | number> = cursor ? { limit, cursor } : { limit };
+    const response = await authApi.get(endpoint, { params });
+    items.push(...response.data.data[key]);
+    cursor = response.data.data.next_cursor ?? null;
+  } while (cursor);
+  return items;
+}
+
 // Export authApi for direct use
 export { authApi };
@@ -1,12 +1,13 @@
 import { useMutation, useQuery } from '@tanstack/react-query';
-import { authApi } from '@/api/client';
+import { authApi, fetchAllPages } from '@/api/client';
 import type { 
   LetterFromUrlRequest, 
   LetterFromTextRequest, 
   LetterResponse, 
   CVUploadRequest, 
   CVUploadResponse,
-  CVOptionsResponse
+  CVOptionsResponse,
+  GeneralOption
 } from '@/types/letter';
 
 /**
@@ -16,8 +17,9 @@ export const useCVOptions = () => {
   return useQuery<CVOptionsResponse, Error>({
     queryKey: ['cvOptions'],
     queryFn: async () => {
-      const response = await authApi.get('/user/cvs/options');
-      return response.data;
+      // /user/cvs/options is paginated: the picker needs every CV
+      const options = await fetchAllPages<GeneralOption>('/user/cvs/options', 'options', 500);
+      return { data: { options } };
     },
   });
 };
@@ -44,7 +44,7 @@ import {
 } from '@chakra-ui/react';
 import { EditIcon, DeleteIcon } from '@chakra-ui/icons';
 import { useQuery, useMutation, useQueryClient } from '@tanstack/react-query';
-import { authApi } from '@/api/client';
+import { authApi, fetchAllPages } from '@/api/client';
 import { useNavigate } from 'react-router-dom';
 import { useUploadCV } from '@/hooks/useLetter';
 
@@ -84,8 +84,9 @@ const useUserCVs = () => {
   return useQuery<CVListResponse, Error>({
     queryKey: ['userCVs'],
     queryFn: async () => {
-      const response = await authApi.get('/user/cvs');
-      return response.data;
+      // /user/cvs is paginated: load every page so no CV is missing from the table
+      const cvs = await fetchAllPages<CV>('/user/cvs', 'cvs', 200);
+      return { success: true, data: { cvs } };
     },
   });
 };